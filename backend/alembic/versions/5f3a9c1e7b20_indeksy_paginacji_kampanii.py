@@ -0,0 +1,35 @@
+"""Indeksy pod paginację listy kampanii i ładowanie zdjęć/widełek
+
+Revision ID: 5f3a9c1e7b20
+Revises: d942ee726abe
+Create Date: 2026-10-18 10:02:11.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f3a9c1e7b20'
+down_revision: Union[str, None] = 'd942ee726abe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_campaigns_created_at_id', 'campaigns',
+                    ['created_at', 'id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_campaign_images_campaign_id'), 'campaign_images',
+                    ['campaign_id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_campaign_reward_tiers_campaign_id'), 'campaign_reward_tiers',
+                    ['campaign_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_campaign_reward_tiers_campaign_id'), table_name='campaign_reward_tiers')
+    op.drop_index(op.f('ix_campaign_images_campaign_id'), table_name='campaign_images')
+    op.drop_index('ix_campaigns_created_at_id', table_name='campaigns')
@@ -0,0 +1,37 @@
+"""Indeksy list panelu admina
+
+Revision ID: 7d3e1a9b4c58
+Revises: f19c3a7e5b82
+Create Date: 2026-10-18 13:21:05.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3e1a9b4c58'
+down_revision: Union[str, None] = 'f19c3a7e5b82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+    op.create_index('ix_users_email_pattern', 'users', ['email'], unique=False,
+                    postgresql_ops={'email': 'text_pattern_ops'})
+    op.create_index('ix_campaigns_deadline_id', 'campaigns', ['deadline', 'id'], unique=False)
+    op.create_index('ix_investments_created_at_id', 'investments', ['created_at', 'id'], unique=False)
+    op.create_index('ix_transactions_created_at_id', 'transactions', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_created_at_id', table_name='transactions')
+    op.drop_index('ix_investments_created_at_id', table_name='investments')
+    op.drop_index('ix_campaigns_deadline_id', table_name='campaigns')
+    op.drop_index('ix_users_email_pattern', table_name='users')
+    op.drop_index('ix_users_created_at_id', table_name='users')
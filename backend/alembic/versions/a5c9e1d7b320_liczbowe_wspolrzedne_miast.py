@@ -0,0 +1,55 @@
+"""Liczbowe współrzędne miast i indeksy wyszukiwania w promieniu
+
+Revision ID: a5c9e1d7b320
+Revises: f3d7a2c9b614
+Create Date: 2026-10-18 16:57:21.640318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5c9e1d7b320'
+down_revision: Union[str, None] = 'f3d7a2c9b614'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COORDINATE_SQL = "CASE WHEN {column} ~ '^ *-?[0-9]+([.][0-9]+)? *$' THEN {column}::double precision END"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Kolumny generowane - istniejące wiersze są wypełniane przy dodaniu kolumny
+    op.add_column('region_cities', sa.Column(
+        'lat', sa.Float(), sa.Computed(COORDINATE_SQL.format(column='latitude'), persisted=True), nullable=True))
+    op.add_column('region_cities', sa.Column(
+        'lon', sa.Float(), sa.Computed(COORDINATE_SQL.format(column='longitude'), persisted=True), nullable=True))
+    op.create_index('ix_region_cities_lat_lon', 'region_cities', ['lat', 'lon'], unique=False)
+    op.create_index('ix_campaigns_city_id_status', 'campaigns', ['city_id', 'status'], unique=False)
+
+    # Kampanie utworzone z miastem w polu region miały zapisaną tylko nazwę -
+    # wiążemy je z miastem: najpierw miasto przedsiębiorcy o tej nazwie, potem
+    # jedyne miasto o tej nazwie (niejednoznaczne nazwy zostają bez city_id)
+    op.execute(
+        "UPDATE campaigns AS c SET city_id = u.city_id "
+        "FROM users AS u JOIN region_cities AS rc ON rc.id = u.city_id "
+        "WHERE c.city_id IS NULL AND c.entrepreneur_id = u.id "
+        "AND lower(rc.name) = lower(btrim(c.region))"
+    )
+    op.execute(
+        "UPDATE campaigns AS c SET city_id = m.id "
+        "FROM (SELECT lower(name) AS name, (array_agg(id))[1] AS id FROM region_cities "
+        "GROUP BY lower(name) HAVING count(*) = 1) AS m "
+        "WHERE c.city_id IS NULL AND lower(btrim(c.region)) = m.name"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_campaigns_city_id_status', table_name='campaigns')
+    op.drop_index('ix_region_cities_lat_lon', table_name='region_cities')
+    op.drop_column('region_cities', 'lon')
+    op.drop_column('region_cities', 'lat')
@@ -0,0 +1,46 @@
+"""Wyszukiwanie pełnotekstowe kampanii (tsvector + GIN)
+
+Revision ID: a81d4e6f2c93
+Revises: 5f3a9c1e7b20
+Create Date: 2026-10-18 10:41:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81d4e6f2c93'
+down_revision: Union[str, None] = '5f3a9c1e7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Musi odpowiadać models.CAMPAIGN_SEARCH_CONFIG
+SEARCH_CONFIG = 'simple'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('campaigns', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(category, '')), 'B') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_campaigns_search_vector', 'campaigns', ['search_vector'],
+                    unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_campaigns_search_vector', table_name='campaigns',
+                  postgresql_using='gin')
+    op.drop_column('campaigns', 'search_vector')
@@ -0,0 +1,204 @@
+"""Zdarzenia strumienia powiadomień (pg_notify w triggerach liczników)
+
+Revision ID: b7e4c1f9a382
+Revises: d2f6b8a4c157
+Create Date: 2026-10-18 18:02:41.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4c1f9a382'
+down_revision: Union[str, None] = 'd2f6b8a4c157'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Triggery liczników nieprzeczytanych (d2f6b8a4c157) publikują dodatkowo
+# zdarzenia strumienia powiadomień (pg_notify na kanale
+# crud.NOTIFICATION_CHANNEL, dostarczane po commicie): user_id, nowy licznik
+# i id nowych powiadomień, a przy więcej niż NOTIFY_MAX_IDS zamiast nich
+# flagę resync (limit NOTIFY to 8000 bajtów).
+NOTIFICATION_CHANNEL = 'notification_events'
+NOTIFY_MAX_IDS = 100
+
+COUNT_INSERTED_SQL = f"""
+CREATE OR REPLACE FUNCTION notifications_count_inserted() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    _sent bigint;
+BEGIN
+    WITH added AS (
+        SELECT user_id,
+               count(*) FILTER (WHERE read IS NOT true) AS unread,
+               array_agg(id ORDER BY created_at, id) AS ids
+        FROM new_rows
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    ), counters AS (
+        INSERT INTO notification_counters AS c (user_id, unread_count, updated_at)
+        SELECT user_id, unread, timezone('utc', now())
+        FROM added
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+            SET unread_count = c.unread_count + excluded.unread_count,
+                updated_at = excluded.updated_at
+        RETURNING c.user_id, c.unread_count
+    )
+    SELECT count(pg_notify('{NOTIFICATION_CHANNEL}', json_strip_nulls(json_build_object(
+        'user_id', added.user_id,
+        'unread_count', counters.unread_count,
+        'ids', CASE WHEN cardinality(added.ids) <= {NOTIFY_MAX_IDS} THEN to_json(added.ids) END,
+        'resync', CASE WHEN cardinality(added.ids) > {NOTIFY_MAX_IDS} THEN true END
+    ))::text))
+    INTO _sent
+    FROM added JOIN counters USING (user_id);
+    RETURN NULL;
+END
+$$
+"""
+
+COUNT_UPDATED_SQL = f"""
+CREATE OR REPLACE FUNCTION notifications_count_updated() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    _sent bigint;
+BEGIN
+    INSERT INTO notification_counters (user_id, unread_count, updated_at)
+    SELECT DISTINCT user_id, 0, timezone('utc', now())
+    FROM new_rows
+    WHERE user_id IS NOT NULL AND read IS NOT true
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO NOTHING;
+
+    WITH counters AS (
+        UPDATE notification_counters AS c
+        SET unread_count = greatest(c.unread_count + delta.change, 0),
+            updated_at = timezone('utc', now())
+        FROM (
+            SELECT user_id, sum(change) AS change
+            FROM (
+                SELECT user_id, 1 AS change FROM new_rows WHERE read IS NOT true
+                UNION ALL
+                SELECT user_id, -1 FROM old_rows WHERE read IS NOT true
+            ) AS changes
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+            HAVING sum(change) <> 0
+        ) AS delta
+        WHERE c.user_id = delta.user_id
+        RETURNING c.user_id, c.unread_count
+    )
+    SELECT count(pg_notify('{NOTIFICATION_CHANNEL}', json_build_object(
+        'user_id', user_id, 'unread_count', unread_count)::text))
+    INTO _sent
+    FROM counters;
+    RETURN NULL;
+END
+$$
+"""
+
+COUNT_DELETED_SQL = f"""
+CREATE OR REPLACE FUNCTION notifications_count_deleted() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    _sent bigint;
+BEGIN
+    WITH counters AS (
+        UPDATE notification_counters AS c
+        SET unread_count = greatest(c.unread_count - delta.removed, 0),
+            updated_at = timezone('utc', now())
+        FROM (
+            SELECT user_id, count(*) AS removed
+            FROM old_rows
+            WHERE user_id IS NOT NULL AND read IS NOT true
+            GROUP BY user_id
+        ) AS delta
+        WHERE c.user_id = delta.user_id
+        RETURNING c.user_id, c.unread_count
+    )
+    SELECT count(pg_notify('{NOTIFICATION_CHANNEL}', json_build_object(
+        'user_id', user_id, 'unread_count', unread_count)::text))
+    INTO _sent
+    FROM counters;
+    RETURN NULL;
+END
+$$
+"""
+
+# Funkcje z d2f6b8a4c157 (tylko liczniki) - przywracane przy downgrade
+COUNT_INSERTED_PLAIN_SQL = """
+CREATE OR REPLACE FUNCTION notifications_count_inserted() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO notification_counters AS c (user_id, unread_count, updated_at)
+    SELECT user_id, count(*), timezone('utc', now())
+    FROM new_rows
+    WHERE user_id IS NOT NULL AND read IS NOT true
+    GROUP BY user_id
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO UPDATE
+        SET unread_count = c.unread_count + excluded.unread_count,
+            updated_at = excluded.updated_at;
+    RETURN NULL;
+END
+$$
+"""
+
+COUNT_UPDATED_PLAIN_SQL = """
+CREATE OR REPLACE FUNCTION notifications_count_updated() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO notification_counters (user_id, unread_count, updated_at)
+    SELECT DISTINCT user_id, 0, timezone('utc', now())
+    FROM new_rows
+    WHERE user_id IS NOT NULL AND read IS NOT true
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO NOTHING;
+
+    UPDATE notification_counters AS c
+    SET unread_count = greatest(c.unread_count + delta.change, 0),
+        updated_at = timezone('utc', now())
+    FROM (
+        SELECT user_id, sum(change) AS change
+        FROM (
+            SELECT user_id, 1 AS change FROM new_rows WHERE read IS NOT true
+            UNION ALL
+            SELECT user_id, -1 FROM old_rows WHERE read IS NOT true
+        ) AS changes
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        HAVING sum(change) <> 0
+    ) AS delta
+    WHERE c.user_id = delta.user_id;
+    RETURN NULL;
+END
+$$
+"""
+
+COUNT_DELETED_PLAIN_SQL = """
+CREATE OR REPLACE FUNCTION notifications_count_deleted() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE notification_counters AS c
+    SET unread_count = greatest(c.unread_count - delta.removed, 0),
+        updated_at = timezone('utc', now())
+    FROM (
+        SELECT user_id, count(*) AS removed
+        FROM old_rows
+        WHERE user_id IS NOT NULL AND read IS NOT true
+        GROUP BY user_id
+    ) AS delta
+    WHERE c.user_id = delta.user_id;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for function_sql in (COUNT_INSERTED_SQL, COUNT_UPDATED_SQL, COUNT_DELETED_SQL):
+        op.execute(function_sql)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for function_sql in (COUNT_INSERTED_PLAIN_SQL, COUNT_UPDATED_PLAIN_SQL, COUNT_DELETED_PLAIN_SQL):
+        op.execute(function_sql)
@@ -0,0 +1,33 @@
+"""Wersje danych referencyjnych (przebudowa indeksu regionów po seedowaniu)
+
+Revision ID: c4e7b2d9a016
+Revises: a81d4e6f2c93
+Create Date: 2026-10-18 11:26:05.113470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7b2d9a016'
+down_revision: Union[str, None] = 'a81d4e6f2c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reference_data_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('reference_data_versions')
@@ -0,0 +1,28 @@
+"""Indeks wypłat po kampanii
+
+Revision ID: c6a1f3d8e275
+Revises: b4d8e2f6a913
+Create Date: 2026-10-18 15:12:47.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6a1f3d8e275'
+down_revision: Union[str, None] = 'b4d8e2f6a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_payouts_campaign_id', 'payouts', ['campaign_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payouts_campaign_id', table_name='payouts')
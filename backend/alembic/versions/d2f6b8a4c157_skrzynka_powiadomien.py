@@ -0,0 +1,133 @@
+"""Skrzynka powiadomień: indeksy i liczniki nieprzeczytanych (triggery)
+
+Revision ID: d2f6b8a4c157
+Revises: a5c9e1d7b320
+Create Date: 2026-10-18 17:38:55.127604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6b8a4c157'
+down_revision: Union[str, None] = 'a5c9e1d7b320'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Liczniki nieprzeczytanych utrzymywane triggerami na notifications (na
+# poziomie instrukcji, z tabelami przejściowymi) - niezależnie od tego,
+# który kod wstawia lub oznacza powiadomienia
+COUNT_INSERTED_SQL = """
+CREATE FUNCTION notifications_count_inserted() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO notification_counters AS c (user_id, unread_count, updated_at)
+    SELECT user_id, count(*), timezone('utc', now())
+    FROM new_rows
+    WHERE user_id IS NOT NULL AND read IS NOT true
+    GROUP BY user_id
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO UPDATE
+        SET unread_count = c.unread_count + excluded.unread_count,
+            updated_at = excluded.updated_at;
+    RETURN NULL;
+END
+$$
+"""
+
+COUNT_UPDATED_SQL = """
+CREATE FUNCTION notifications_count_updated() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO notification_counters (user_id, unread_count, updated_at)
+    SELECT DISTINCT user_id, 0, timezone('utc', now())
+    FROM new_rows
+    WHERE user_id IS NOT NULL AND read IS NOT true
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO NOTHING;
+
+    UPDATE notification_counters AS c
+    SET unread_count = greatest(c.unread_count + delta.change, 0),
+        updated_at = timezone('utc', now())
+    FROM (
+        SELECT user_id, sum(change) AS change
+        FROM (
+            SELECT user_id, 1 AS change FROM new_rows WHERE read IS NOT true
+            UNION ALL
+            SELECT user_id, -1 FROM old_rows WHERE read IS NOT true
+        ) AS changes
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        HAVING sum(change) <> 0
+    ) AS delta
+    WHERE c.user_id = delta.user_id;
+    RETURN NULL;
+END
+$$
+"""
+
+COUNT_DELETED_SQL = """
+CREATE FUNCTION notifications_count_deleted() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE notification_counters AS c
+    SET unread_count = greatest(c.unread_count - delta.removed, 0),
+        updated_at = timezone('utc', now())
+    FROM (
+        SELECT user_id, count(*) AS removed
+        FROM old_rows
+        WHERE user_id IS NOT NULL AND read IS NOT true
+        GROUP BY user_id
+    ) AS delta
+    WHERE c.user_id = delta.user_id;
+    RETURN NULL;
+END
+$$
+"""
+
+TRIGGERS = (
+    ("notifications_count_insert", "INSERT", "REFERENCING NEW TABLE AS new_rows",
+     "notifications_count_inserted"),
+    ("notifications_count_update", "UPDATE", "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+     "notifications_count_updated"),
+    ("notifications_count_delete", "DELETE", "REFERENCING OLD TABLE AS old_rows",
+     "notifications_count_deleted"),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_notifications_user_id_created_at_id', 'notifications',
+                    ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_notifications_user_id_unread', 'notifications',
+                    ['user_id', 'created_at', 'id'], unique=False,
+                    postgresql_where=sa.text('read IS NOT true'))
+    op.create_table('notification_counters',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    for function_sql in (COUNT_INSERTED_SQL, COUNT_UPDATED_SQL, COUNT_DELETED_SQL):
+        op.execute(function_sql)
+    for name, event, referencing, function in TRIGGERS:
+        op.execute(f"CREATE TRIGGER {name} AFTER {event} ON notifications {referencing} "
+                   f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()")
+    # Liczniki dla istniejących powiadomień (wstawiane równolegle czekają na
+    # blokadę triggerów do końca migracji, więc nie zostaną policzone podwójnie)
+    op.execute(
+        "INSERT INTO notification_counters (user_id, unread_count, updated_at) "
+        "SELECT user_id, count(*), timezone('utc', now()) FROM notifications "
+        "WHERE user_id IS NOT NULL AND read IS NOT true GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _event, _referencing, function in TRIGGERS:
+        op.execute(f"DROP TRIGGER {name} ON notifications")
+        op.execute(f"DROP FUNCTION {function}()")
+    op.drop_table('notification_counters')
+    op.drop_index('ix_notifications_user_id_unread', table_name='notifications')
+    op.drop_index('ix_notifications_user_id_created_at_id', table_name='notifications')
@@ -0,0 +1,52 @@
+"""Agregaty finansowania kampanii (campaign_funding_stats)
+
+Revision ID: e2b5f8a3d741
+Revises: c4e7b2d9a016
+Create Date: 2026-10-18 12:08:44.620931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b5f8a3d741'
+down_revision: Union[str, None] = 'c4e7b2d9a016'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('campaign_funding_stats',
+    sa.Column('campaign_id', sa.UUID(), nullable=False),
+    sa.Column('investor_count', sa.Integer(), nullable=False),
+    sa.Column('investment_count', sa.Integer(), nullable=False),
+    sa.Column('total_invested', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('campaign_id')
+    )
+    op.create_index('ix_investments_campaign_id_investor_id', 'investments',
+                    ['campaign_id', 'investor_id'], unique=False)
+
+    # Wypełnienie agregatów z istniejących inwestycji
+    op.execute("""
+        INSERT INTO campaign_funding_stats
+            (campaign_id, investor_count, investment_count, total_invested, updated_at)
+        SELECT i.campaign_id, count(DISTINCT i.investor_id), count(*),
+               coalesce(sum(i.amount), 0), timezone('utc', now())
+        FROM investments i
+        JOIN transactions t ON t.id = i.transaction_id
+        WHERE i.status = 'completed' AND t.status = 'successful'
+          AND i.campaign_id IS NOT NULL
+        GROUP BY i.campaign_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_investments_campaign_id_investor_id', table_name='investments')
+    op.drop_table('campaign_funding_stats')
@@ -0,0 +1,81 @@
+"""Grupowanie błędów w problemy (error_issues)
+
+Revision ID: e8b3c5a1f902
+Revises: c6a1f3d8e275
+Create Date: 2026-10-18 15:48:03.551920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3c5a1f902'
+down_revision: Union[str, None] = 'c6a1f3d8e275'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('error_issues',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('error_type', sa.String(length=100), nullable=False),
+    sa.Column('title', sa.Text(), nullable=False),
+    sa.Column('endpoint', sa.Text(), nullable=True),
+    sa.Column('method', sa.String(length=10), nullable=True),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('occurrences', sa.BigInteger(), nullable=False),
+    sa.Column('first_seen_at', sa.DateTime(), nullable=False),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=False),
+    sa.Column('resolved', sa.Boolean(), nullable=False),
+    sa.Column('resolved_at', sa.DateTime(), nullable=True),
+    sa.Column('resolved_by', sa.UUID(), nullable=True),
+    sa.ForeignKeyConstraint(['resolved_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('fingerprint')
+    )
+    op.create_index('ix_error_issues_last_seen_at_id', 'error_issues', ['last_seen_at', 'id'], unique=False)
+    # Tabela error_logs nie ma własnej migracji (istniejące bazy dostały ją
+    # poza alembikiem) - na świeżej bazie tworzymy ją tutaj
+    if not sa.inspect(op.get_bind()).has_table('error_logs'):
+        op.create_table('error_logs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('error_type', sa.String(length=100), nullable=False),
+        sa.Column('error_message', sa.Text(), nullable=False),
+        sa.Column('error_details', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('endpoint', sa.Text(), nullable=True),
+        sa.Column('method', sa.String(length=10), nullable=True),
+        sa.Column('user_id', sa.UUID(), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('resolved', sa.Boolean(), nullable=True),
+        sa.Column('resolved_at', sa.DateTime(), nullable=True),
+        sa.Column('resolved_by', sa.UUID(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['resolved_by'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.add_column('error_logs', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.add_column('error_logs', sa.Column('issue_id', sa.UUID(), nullable=True))
+    op.create_foreign_key('error_logs_issue_id_fkey', 'error_logs', 'error_issues',
+                          ['issue_id'], ['id'], ondelete='CASCADE')
+    op.create_index('ix_error_logs_issue_id_created_at_id', 'error_logs',
+                    ['issue_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # error_logs zostaje - mogła istnieć przed tą migracją
+    op.drop_index('ix_error_logs_issue_id_created_at_id', table_name='error_logs')
+    op.drop_constraint('error_logs_issue_id_fkey', 'error_logs', type_='foreignkey')
+    op.drop_column('error_logs', 'issue_id')
+    op.drop_column('error_logs', 'fingerprint')
+    op.drop_index('ix_error_issues_last_seen_at_id', table_name='error_issues')
+    op.drop_table('error_issues')
@@ -0,0 +1,29 @@
+"""Indeks historii inwestycji użytkownika
+
+Revision ID: f19c3a7e5b82
+Revises: e2b5f8a3d741
+Create Date: 2026-10-18 12:47:19.384562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19c3a7e5b82'
+down_revision: Union[str, None] = 'e2b5f8a3d741'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_investments_investor_id_created_at_id', 'investments',
+                    ['investor_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_investments_investor_id_created_at_id', table_name='investments')
@@ -0,0 +1,37 @@
+"""Cache danych firm z GUS BIR1
+
+Revision ID: f3d7a2c9b614
+Revises: e8b3c5a1f902
+Create Date: 2026-10-18 16:21:37.092784
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3d7a2c9b614'
+down_revision: Union[str, None] = 'e8b3c5a1f902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('gus_company_cache',
+    sa.Column('nip', sa.String(length=10), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('nip')
+    )
+    op.create_index(op.f('ix_gus_company_cache_expires_at'), 'gus_company_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_gus_company_cache_expires_at'), table_name='gus_company_cache')
+    op.drop_table('gus_company_cache')
@@ -39,6 +39,90 @@ class Settings(BaseSettings):
     db_username: Optional[str] = None
     db_password: Optional[str] = None
 
+    # Pula połączeń z bazą danych (osobno dla silnika synchronicznego i asynchronicznego)
+    db_echo: bool = False  # logowanie każdego zapytania SQL (tylko do debugowania)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30  # sekundy oczekiwania na wolne połączenie
+    db_pool_recycle: int = 1800  # sekundy, po których połączenie jest odtwarzane
+    db_pool_pre_ping: bool = True  # sprawdza połączenie przed użyciem (np. po zerwaniu tunelu SSH)
+    db_statement_timeout_ms: int = 30000  # 0 = bez limitu
+
+    # Czy zatwierdzanie płatności przechodzi przez crud.approve_investment_payment
+    # (utrzymuje campaign_funding_stats); False = statystyki kampanii liczone na bieżąco
+    campaign_funding_stats_maintained: bool = False
+
+    # Paginacja list (kursor keyset)
+    pagination_default_limit: int = 20
+    pagination_max_limit: int = 100
+
+    # Wyszukiwanie w feedzie kampanii: po ilu dniach "świeżość" kampanii
+    # obniża wynik trafności o połowę
+    search_recency_half_life_days: int = 30
+
+    # Co ile sekund indeks regionów w pamięci sprawdza wersję danych w bazie
+    region_index_refresh_seconds: int = 60
+
+    # Snapshoty danych referencyjnych (kategorie, regiony)
+    reference_data_refresh_seconds: int = 60
+    reference_data_max_age_seconds: int = 300
+
+    # Ważność tokenu resetowania hasła
+    password_reset_token_expire_minutes: int = 60
+
+    # Cache uwierzytelnionych użytkowników (utils.get_current_user)
+    principal_cache_ttl_seconds: int = 60
+    principal_cache_max_size: int = 10000
+    # Na ile sekund przed wygaśnięciem tokenu odpowiedź podpowiada jego odświeżenie
+    token_refresh_hint_seconds: int = 300
+
+    # Haszowanie haseł (bcrypt): koszt nowych hashy, liczba wątków puli
+    # i maksymalna liczba oczekujących operacji (powyżej - 503)
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_max_queue: int = 64
+
+    # Kolejka wiadomości email (email_outbox) i wątek wysyłki
+    email_outbox_enabled: bool = True  # czy ten proces uruchamia wątek wysyłki
+    email_outbox_batch_size: int = 50
+    email_outbox_poll_seconds: int = 5
+    email_smtp_pool_size: int = 2  # liczba równoległych połączeń SMTP
+    email_smtp_idle_seconds: int = 60  # po tylu sekundach bezczynności połączenie jest sprawdzane (NOOP)
+    email_max_attempts: int = 8
+    email_retry_base_seconds: int = 30
+    email_retry_max_seconds: int = 3600
+
+    # Liczba wątków puli, na której działają synchroniczne endpointy (def) i zależności
+    sync_threadpool_size: int = 40
+
+    # Kampanie w pobliżu (GET /campaigns/nearby): maksymalny promień wyszukiwania
+    nearby_max_radius_km: float = 200.0
+
+    # GUS BIR1 (dane firm po NIP): klucz użytkownika, cache WSDL i wyników, sesja (SID)
+    gus_bir1_wsdl: str = "https://wyszukiwarkaregontest.stat.gov.pl/wsBIR/wsdl/UslugaBIRzewnPubl.xsd"
+    gus_bir1_service_url: str = "https://wyszukiwarkaregontest.stat.gov.pl/wsBIR/UslugaBIRzewnPubl.svc"
+    gus_bir1_user_key: str = "abcde12345abcde12345"  # testowy klucz
+    gus_wsdl_cache_path: Optional[str] = None  # plik SQLite z WSDL/XSD; None = domyślny katalog zeep
+    gus_wsdl_cache_seconds: int = 7 * 24 * 3600
+    gus_session_renew_seconds: int = 50 * 60  # GUS kończy sesję po 60 min bezczynności
+    gus_request_timeout_seconds: int = 10
+    gus_company_cache_ttl_seconds: int = 7 * 24 * 3600
+    gus_not_found_cache_ttl_seconds: int = 3600
+
+    # Logi błędów: bufor w pamięci zapisywany do bazy paczkami (multi-row INSERT)
+    error_log_buffer_size: int = 2000
+    error_log_batch_size: int = 200  # zapis od razu po uzbieraniu tylu wpisów
+    error_log_flush_seconds: float = 2.0  # ... albo najpóźniej po tym czasie
+    error_log_sampling_threshold: float = 0.5  # od tego zapełnienia bufora wpisy są próbkowane (1 = bez próbkowania)
+    error_issue_full_samples: int = 10  # k pierwszych wystąpień problemu zapisywanych w całości, n-te dalej z p-stwem k/n
+
+    # Strumień powiadomień na żywo (SSE, GET /notifications/stream) i LISTEN/NOTIFY
+    notification_stream_enabled: bool = True
+    notification_stream_heartbeat_seconds: float = 15.0  # komentarz podtrzymujący połączenie i kontrola połączenia LISTEN
+    notification_stream_queue_size: int = 100  # zdarzenia czekające na wolnego klienta (powyżej - resync)
+    notification_stream_backlog_limit: int = 100  # maks. zaległość wysyłana po wznowieniu (powyżej - resync)
+    notification_stream_retry_ms: int = 3000  # opóźnienie ponownego połączenia EventSource
+
     model_config = ConfigDict(
         env_file=".env",
         extra="ignore"  # Ignoruj dodatkowe pola z .env (np. stare zmienne TPay)
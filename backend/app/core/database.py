@@ -2,10 +2,12 @@ import atexit
 
 from sqlalchemy import create_engine
 from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sshtunnel import SSHTunnelForwarder
 
 from app.core.config import settings
+from app.core.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
 # Import psycopg2 dla bezpośredniego użycia parametrów połączenia
 try:
@@ -94,6 +96,19 @@ def setup_ssh_tunnel():
         raise
 
 
+# Parametry puli połączeń (wspólne dla silnika synchronicznego i asynchronicznego)
+POOL_OPTIONS = {
+    "echo": settings.db_echo,
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_recycle": settings.db_pool_recycle,
+    "pool_pre_ping": settings.db_pool_pre_ping,
+}
+
+# statement_timeout ustawiany przy otwieraniu połączenia (0 = bez limitu)
+STATEMENT_TIMEOUT_OPTION = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+
 # Tworzymy engine z obsługą kodowania UTF-8
 db_url = settings.database_url
 
@@ -144,7 +159,8 @@ if "postgresql" in db_url and PSYCOPG2_AVAILABLE:
             conn_kwargs = {
                 'host': host_clean,
                 'port': port,
-                'client_encoding': 'utf8'
+                'client_encoding': 'utf8',
+                'options': STATEMENT_TIMEOUT_OPTION,
             }
             
             if username_clean:
@@ -160,31 +176,45 @@ if "postgresql" in db_url and PSYCOPG2_AVAILABLE:
         # Używamy create_engine z creator zamiast connection stringu
         engine = create_engine(
             "postgresql://",
-            echo=True,
             creator=create_connection,
+            poolclass=InstrumentedQueuePool,
+            **POOL_OPTIONS,
         )
     except Exception:
         # Jeśli użycie creator się nie powiodło, użyj standardowego podejścia
-        connect_args = {"client_encoding": "utf8"}
+        connect_args = {"client_encoding": "utf8", "options": STATEMENT_TIMEOUT_OPTION}
         engine = create_engine(
             db_url,
-            echo=True,
             connect_args=connect_args,
+            poolclass=InstrumentedQueuePool,
+            **POOL_OPTIONS,
         )
 else:
     # Dla innych baz danych lub jeśli psycopg2 nie jest dostępne
     connect_args = {}
     if "postgresql" in db_url:
         connect_args["client_encoding"] = "utf8"
+        connect_args["options"] = STATEMENT_TIMEOUT_OPTION
     
     engine = create_engine(
         db_url,
-        echo=True,
         connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        **POOL_OPTIONS,
     )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Silnik asynchroniczny (asyncpg) dla endpointów, które nie powinny blokować
+# pętli zdarzeń; korzysta z tego samego URL-a (również przez SSH tunnel).
+async_engine = create_async_engine(
+    make_url(db_url).set(drivername="postgresql+asyncpg"),
+    connect_args={"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}},
+    poolclass=InstrumentedAsyncQueuePool,
+    **POOL_OPTIONS,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Funkcja do uzyskania sesji bazy danych
@@ -196,6 +226,12 @@ def get_db():
         db.close()
 
 
+# Asynchroniczna sesja dla endpointów async def (AsyncSession)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # Funkcja do zatrzymania SSH tunnel (do użycia przy shutdown aplikacji)
 def close_ssh_tunnel():
     """Zamyka SSH tunnel, jeśli jest aktywny."""
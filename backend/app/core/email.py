@@ -1,9 +1,12 @@
-import smtplib
-from email.message import EmailMessage
 from email.mime.text import MIMEText
+from typing import Optional
 
+from app import models
 from app.core.config import settings
+from app.core.database import SessionLocal
 from fastapi_mail import ConnectionConfig, FastMail, MessageSchema
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
 
 
 # Konfiguracja maila
@@ -30,29 +33,44 @@ conf = ConnectionConfig(
 fm = FastMail(conf)
 
 
-# Konfiguracja SMTP dla Mailtrap
-
-
-def send_email(subject: str, body: str, to_email: str):
+def build_message(subject: str, body: str, to_email: str) -> MIMEText:
+    msg = MIMEText(body)
+    msg["Subject"] = subject
+    msg["From"] = conf.MAIL_USERNAME
+    msg["To"] = to_email
+    return msg
+
+
+def enqueue_emails(db: Session, messages: list[dict]) -> int:
+    """
+    Dodaje wiadomości ({"subject", "body", "to_email"}) do kolejki email_outbox
+    jednym INSERT-em i zatwierdza transakcję. Wysyłką zajmuje się wątek
+    app.core.email_outbox - endpoint nie czeka na serwer SMTP.
+    """
+    if not messages:
+        return 0
+    db.execute(insert(models.EmailOutbox), [
+        {"subject": m["subject"], "body": m["body"], "to_email": m["to_email"]}
+        for m in messages
+    ])
+    db.commit()
+
+    from app.core.email_outbox import email_outbox_sender
+    email_outbox_sender.wake()
+    return len(messages)
+
+
+def send_email(subject: str, body: str, to_email: str, db: Optional[Session] = None):
+    """Kolejkuje wiadomość email (bez sesji - we własnej sesji bazy danych)."""
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
     try:
-        msg = MIMEText(body)
-        msg["Subject"] = subject
-        msg["From"] = conf.MAIL_USERNAME
-        msg["To"] = to_email
-
-        if conf.MAIL_STARTTLS:
-            server = smtplib.SMTP(conf.MAIL_SERVER, conf.MAIL_PORT)
-            server.starttls()
-        else:
-            server = smtplib.SMTP_SSL(conf.MAIL_SERVER, conf.MAIL_PORT)
-
-        server.login(conf.MAIL_USERNAME, conf.MAIL_PASSWORD.get_secret_value())
-        server.sendmail(conf.MAIL_USERNAME, [to_email], msg.as_string())
-        server.quit()
-
-        return {"status": "OK", "message": "Mail wysłany"}
-    except Exception as e:
-        return {"status": "ERROR", "message": str(e)}
+        enqueue_emails(db, [{"subject": subject, "body": body, "to_email": to_email}])
+        return {"status": "OK", "message": "Mail dodany do kolejki wysyłki"}
+    finally:
+        if own_session:
+            db.close()
 
     # sender_email = settings.mail_from
     # smtp_port = 587
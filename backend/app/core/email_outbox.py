@@ -0,0 +1,241 @@
+"""
+Wysyłka wiadomości z kolejki email_outbox w wątku w tle.
+
+Wątek co ``email_outbox_poll_seconds`` (lub od razu po dodaniu wiadomości
+w tym procesie) pobiera paczkę do ``email_outbox_batch_size`` wiadomości
+(``FOR UPDATE SKIP LOCKED`` - kilka workerów nie wyśle tej samej
+wiadomości), wysyła je równolegle przez pulę zalogowanych połączeń SMTP
+i zapisuje wynik. Nieudana wysyłka jest ponawiana z wykładniczo rosnącym
+opóźnieniem, a po ``email_max_attempts`` próbach (lub od razu przy
+odrzuceniu adresata) wiadomość dostaje status 'failed'.
+"""
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import models
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.email import build_message, conf
+
+
+class SmtpConnectionPool:
+    """
+    Pula zalogowanych połączeń SMTP. Połączenie nieużywane dłużej niż
+    ``email_smtp_idle_seconds`` jest sprawdzane komendą NOOP przed użyciem.
+    """
+
+    def __init__(self):
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+
+    def _connect(self) -> smtplib.SMTP:
+        if conf.MAIL_STARTTLS:
+            server = smtplib.SMTP(conf.MAIL_SERVER, conf.MAIL_PORT, timeout=30)
+            server.starttls()
+        else:
+            server = smtplib.SMTP_SSL(conf.MAIL_SERVER, conf.MAIL_PORT, timeout=30)
+        server.login(conf.MAIL_USERNAME, conf.MAIL_PASSWORD.get_secret_value())
+        return server
+
+    def acquire(self) -> smtplib.SMTP:
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < settings.email_smtp_idle_seconds:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(server)
+
+    def release(self, server: smtplib.SMTP, broken: bool = False) -> None:
+        if broken:
+            self._close(server)
+        else:
+            self._idle.put((server, time.monotonic()))
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+class EmailOutboxMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.total_send_ms = 0.0
+        self.last_error = None
+
+    def record(self, sent: int, retried: int, failed: int, send_ms: float, last_error=None) -> None:
+        with self._lock:
+            self.batches += 1
+            self.sent += sent
+            self.retried += retried
+            self.failed += failed
+            self.total_send_ms += send_ms
+            if last_error:
+                self.last_error = last_error
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.sent + self.retried + self.failed
+            return {
+                "batches": self.batches,
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "avg_send_ms": round(self.total_send_ms / attempts, 3) if attempts else 0.0,
+                "last_error": self.last_error,
+            }
+
+
+class PermanentDeliveryError(Exception):
+    """Błąd, którego ponowienie nic nie zmieni (np. odrzucony adresat)."""
+
+
+def retry_delay(attempts: int) -> timedelta:
+    seconds = settings.email_retry_base_seconds * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.email_retry_max_seconds))
+
+
+class EmailOutboxSender:
+    def __init__(self):
+        self.metrics = EmailOutboxMetrics()
+        self._smtp_pool = SmtpConnectionPool()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.email_smtp_pool_size, thread_name_prefix="smtp")
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=30)
+        self._executor.shutdown(wait=True)
+        self._smtp_pool.close_all()
+        self._thread = None
+
+    def wake(self) -> None:
+        """Budzi wątek wysyłki (wiadomość dodana w tym procesie)."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                print(f"[EMAIL OUTBOX] Błąd przetwarzania kolejki: {e}")
+                processed = 0
+            if processed < settings.email_outbox_batch_size:
+                self._wake.wait(settings.email_outbox_poll_seconds)
+                self._wake.clear()
+
+    def _deliver(self, to_email: str, subject: str, body: str) -> None:
+        server = self._smtp_pool.acquire()
+        try:
+            server.sendmail(conf.MAIL_USERNAME, [to_email],
+                            build_message(subject, body, to_email).as_string())
+        except smtplib.SMTPRecipientsRefused as e:
+            self._smtp_pool.release(server)
+            raise PermanentDeliveryError(str(e))
+        except Exception:
+            # Stan sesji SMTP po błędzie jest nieznany - nie używamy jej ponownie
+            self._smtp_pool.release(server, broken=True)
+            raise
+        self._smtp_pool.release(server)
+
+    def process_batch(self) -> int:
+        """Wysyła jedną paczkę wiadomości; zwraca liczbę przetworzonych."""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            messages = (
+                db.query(models.EmailOutbox)
+                .filter(
+                    models.EmailOutbox.status == 'pending',
+                    models.EmailOutbox.next_attempt_at <= now,
+                )
+                .order_by(models.EmailOutbox.next_attempt_at)
+                .limit(settings.email_outbox_batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not messages:
+                db.rollback()
+                return 0
+
+            start = time.perf_counter()
+            futures = [
+                (message, self._executor.submit(self._deliver, message.to_email, message.subject, message.body))
+                for message in messages
+            ]
+            sent = retried = failed = 0
+            last_error = None
+            for message, future in futures:
+                error = future.exception()
+                message.attempts += 1
+                if error is None:
+                    message.status = 'sent'
+                    message.sent_at = datetime.utcnow()
+                    message.last_error = None
+                    sent += 1
+                    continue
+                last_error = message.last_error = f"{type(error).__name__}: {error}"
+                if isinstance(error, PermanentDeliveryError) or message.attempts >= settings.email_max_attempts:
+                    message.status = 'failed'
+                    failed += 1
+                else:
+                    message.next_attempt_at = datetime.utcnow() + retry_delay(message.attempts)
+                    retried += 1
+            db.commit()
+
+            self.metrics.record(sent, retried, failed, (time.perf_counter() - start) * 1000, last_error)
+            return len(messages)
+        finally:
+            db.close()
+
+    def queue_stats(self, db) -> dict:
+        """Liczba wiadomości w kolejce wg statusu."""
+        rows = (
+            db.query(models.EmailOutbox.status, func.count())
+            .group_by(models.EmailOutbox.status)
+            .all()
+        )
+        return {status: count for status, count in rows}
+
+
+email_outbox_sender = EmailOutboxSender()
@@ -0,0 +1,263 @@
+"""
+Zapisywanie błędów aplikacji do tabeli error_logs.
+
+Globalny handler wyjątków nie pisze do bazy sam - buduje rekord w pamięci
+i wkłada go do bufora o pojemności ``error_log_buffer_size`` wpisów. Wątek w tle zapisuje bufor jednym
+wielowierszowym INSERT-em po uzbieraniu ``error_log_batch_size`` wpisów albo
+co ``error_log_flush_seconds``. Czas odpowiedzi handlera nie zależy więc od
+bazy, a lawina błędów to kilka zapytań na sekundę zamiast jednego commita
+na każdy wyjątek.
+
+Wystąpienia są grupowane w problemy (error_issues) po odcisku: typ wyjątku,
+znormalizowany komunikat (liczby, UUID, napisy w cudzysłowach zastąpione
+znacznikami) i ``FINGERPRINT_FRAMES`` najbliższych ramek stosu (plik i
+funkcja, bez numerów linii - odcisk przeżywa zmiany w innych miejscach
+pliku). Problem ma licznik wystąpień i czasy pierwszego/ostatniego
+wystąpienia. Pełny wiersz error_logs jest zapisywany dla pierwszych
+``error_issue_full_samples`` wystąpień, a potem z prawdopodobieństwem
+``error_issue_full_samples / n`` dla n-tego wystąpienia - liczba wierszy
+rośnie logarytmicznie z liczbą wystąpień, a nie liniowo z ruchem.
+
+Gdy bufor jest zapełniony powyżej ``error_log_sampling_threshold``, nowe
+wpisy są przyjmowane z malejącym prawdopodobieństwem (przy pełnym buforze
+już żaden); liczba pominiętych wpisów jest widoczna w metrykach. Próg 1
+wyłącza próbkowanie - pełny bufor nadpisuje wtedy najstarsze wpisy.
+"""
+import hashlib
+import os
+import random
+import re
+import threading
+import traceback
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import insert
+
+from app import crud, models
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+# Ograniczenia długości zapisywanych pól (pojedynczy wpis nie rozdmuchuje paczki)
+MAX_MESSAGE_LENGTH = 2000
+MAX_TRACEBACK_LENGTH = 20000
+
+# Liczba najbliższych miejscu błędu ramek stosu wchodzących do odcisku
+FINGERPRINT_FRAMES = 5
+
+# Zmienne fragmenty komunikatów zastępowane znacznikami (kolejność ma znaczenie)
+MESSAGE_NORMALIZERS = (
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "<str>"),
+    (re.compile(r"\b0x[0-9a-f]+\b", re.IGNORECASE), "<hex>"),
+    (re.compile(r"\d+(?:\.\d+)?"), "<num>"),
+)
+
+
+def normalize_message(message: str) -> str:
+    for pattern, placeholder in MESSAGE_NORMALIZERS:
+        message = pattern.sub(placeholder, message)
+    return message[:MAX_MESSAGE_LENGTH]
+
+
+def error_fingerprint(error: Exception) -> str:
+    """Odcisk błędu: typ + znormalizowany komunikat + najbliższe ramki stosu."""
+    error_class = type(error)
+    parts = [f"{error_class.__module__}.{error_class.__qualname__}", normalize_message(str(error))]
+    for frame in traceback.extract_tb(error.__traceback__)[-FINGERPRINT_FRAMES:]:
+        parts.append(f"{os.path.basename(frame.filename)}:{frame.name}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def build_error_record(error: Exception, request: Optional[Request] = None,
+                       user_id=None, status_code: Optional[int] = None) -> dict:
+    """Buduje wiersz tabeli error_logs dla wyjątku (bez dostępu do bazy)."""
+    details = {
+        "traceback": "".join(
+            traceback.format_exception(type(error), error, error.__traceback__)
+        )[-MAX_TRACEBACK_LENGTH:],
+    }
+    record = {
+        "id": uuid.uuid4(),
+        "error_type": type(error).__name__[:100],
+        "error_message": (str(error) or repr(error))[:MAX_MESSAGE_LENGTH],
+        "error_details": details,
+        "status_code": status_code,
+        "endpoint": None,
+        "method": None,
+        "user_id": user_id,
+        "ip_address": None,
+        "user_agent": None,
+        "resolved": False,
+        "created_at": datetime.utcnow(),
+        "fingerprint": error_fingerprint(error),
+    }
+    if request is not None:
+        details["query_params"] = dict(request.query_params)
+        details["path_params"] = {key: str(value) for key, value in request.path_params.items()}
+        record["endpoint"] = request.url.path
+        record["method"] = request.method
+        record["ip_address"] = request.client.host if request.client else None
+        record["user_agent"] = request.headers.get("user-agent")
+    return record
+
+
+class ErrorLogMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.sampled_out = 0  # odrzucone przez próbkowanie
+        self.overwritten = 0  # nadpisane w pełnym buforze
+        self.written = 0
+        self.stored = 0  # zapisane jako pełne wiersze error_logs
+        self.failed = 0  # utracone przez błąd zapisu
+        self.flushes = 0
+        self.last_error = None
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "accepted": self.accepted,
+                "sampled_out": self.sampled_out,
+                "overwritten": self.overwritten,
+                "written": self.written,
+                "stored": self.stored,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "last_error": self.last_error,
+            }
+
+
+class ErrorLogWriter:
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        self.metrics = ErrorLogMetrics()
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="error-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Zatrzymuje wątek i zapisuje to, co zostało w buforze."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=30)
+        self._thread = None
+        self.flush()
+
+    def submit(self, record: dict) -> bool:
+        """Dodaje wpis do bufora (bez blokowania na bazie); False, jeśli pominięty."""
+        with self._lock:
+            fill = len(self._buffer) / self.buffer_size
+            threshold = settings.error_log_sampling_threshold
+            if threshold < 1 and fill >= threshold and random.random() >= (1 - fill) / (1 - threshold):
+                self.metrics.add(sampled_out=1)
+                return False
+            overwritten = len(self._buffer) == self.buffer_size
+            self._buffer.append(record)
+            pending = len(self._buffer)
+        self.metrics.add(accepted=1, overwritten=int(overwritten))
+        if pending >= settings.error_log_batch_size:
+            self._wake.set()
+        return True
+
+    def _take_batch(self) -> list:
+        with self._lock:
+            count = min(len(self._buffer), settings.error_log_batch_size)
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(settings.error_log_flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Zapisuje zawartość bufora paczkami; zwraca liczbę zapisanych wpisów."""
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            db = SessionLocal()
+            try:
+                stored = self._write_batch(db, batch)
+                db.commit()
+            except Exception as e:
+                # Nie ponawiamy - przy niedostępnej bazie bufor i tak by się przepełnił
+                db.rollback()
+                self.metrics.add(failed=len(batch))
+                self.metrics.last_error = f"{type(e).__name__}: {e}"
+                print(f"CRITICAL: Nie udało się zapisać {len(batch)} logów błędów: {e}")
+                return written
+            finally:
+                db.close()
+            written += len(batch)
+            self.metrics.add(written=len(batch), stored=stored, flushes=1)
+
+    @staticmethod
+    def _write_batch(db, batch: list) -> int:
+        """Aktualizuje problemy i zapisuje próbkę pełnych wystąpień; zwraca liczbę zapisanych wierszy."""
+        groups = {}
+        for record in batch:
+            groups.setdefault(record["fingerprint"], []).append(record)
+        issues = crud.upsert_error_issues(db, [
+            {
+                "fingerprint": fingerprint,
+                "error_type": records[0]["error_type"],
+                "title": normalize_message(records[0]["error_message"]),
+                "endpoint": records[0]["endpoint"],
+                "method": records[0]["method"],
+                "status_code": records[0]["status_code"],
+                "occurrences": len(records),
+                "first_seen_at": records[0]["created_at"],
+                "last_seen_at": records[-1]["created_at"],
+            }
+            for fingerprint, records in groups.items()
+        ])
+
+        keep = settings.error_issue_full_samples
+        samples = []
+        for fingerprint, records in groups.items():
+            issue_id, total = issues[fingerprint]
+            # Numer wystąpienia (od 1) pierwszego rekordu z tej paczki
+            first_number = total - len(records) + 1
+            for offset, record in enumerate(records):
+                number = first_number + offset
+                if number <= keep or random.random() < keep / number:
+                    samples.append({**record, "issue_id": issue_id})
+        if samples:
+            db.execute(insert(models.ErrorLog).values(samples))
+        return len(samples)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {"buffered": buffered, "buffer_size": self.buffer_size, **self.metrics.snapshot()}
+
+
+error_log_writer = ErrorLogWriter(buffer_size=settings.error_log_buffer_size)
+
+
+def log_error(error: Exception, request: Optional[Request] = None,
+              user_id=None, status_code: Optional[int] = None) -> bool:
+    """Kolejkuje zapis błędu do error_logs (zapis nastąpi w tle)."""
+    return error_log_writer.submit(build_error_record(error, request, user_id, status_code))
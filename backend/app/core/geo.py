@@ -0,0 +1,48 @@
+"""
+Obliczenia na współrzędnych geograficznych (stopnie, WGS84 jako kula).
+
+Wyszukiwanie "w promieniu" działa w dwóch krokach: prostokąt ograniczający
+(``bounding_box``) zawęża wiersze po indeksie B-tree (lat, lon), a dokładna
+odległość po okręgu wielkim (``haversine_km``) odfiltrowuje narożniki
+prostokąta i służy do sortowania.
+"""
+import math
+
+from sqlalchemy import func
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def bounding_box(lat: float, lon: float, radius_km: float):
+    """
+    Prostokąt zawierający okrąg o promieniu ``radius_km``: zwraca
+    (lat_min, lat_max, [(lon_min, lon_max), ...]). Zakres długości jest
+    dzielony na dwa przy przekroczeniu południka 180°; przy biegunie
+    obejmuje wszystkie długości.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    lat_min, lat_max = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    if lat_min <= -90.0 or lat_max >= 90.0 or cos_lat <= 1e-9:
+        return lat_min, lat_max, [(-180.0, 180.0)]
+    delta_lon = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    if delta_lon >= 180.0:
+        return lat_min, lat_max, [(-180.0, 180.0)]
+    lon_min, lon_max = lon - delta_lon, lon + delta_lon
+    if lon_min < -180.0:
+        return lat_min, lat_max, [(lon_min + 360.0, 180.0), (-180.0, lon_max)]
+    if lon_max > 180.0:
+        return lat_min, lat_max, [(lon_min, 180.0), (-180.0, lon_max - 360.0)]
+    return lat_min, lat_max, [(lon_min, lon_max)]
+
+
+def haversine_km(lat: float, lon: float, lat_column, lon_column):
+    """Wyrażenie SQL: odległość (km) od punktu (lat, lon) do punktu z kolumn."""
+    lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+    half_dlat = (func.radians(lat_column) - lat_rad) * 0.5
+    half_dlon = (func.radians(lon_column) - lon_rad) * 0.5
+    a = (func.power(func.sin(half_dlat), 2)
+         + math.cos(lat_rad) * func.cos(func.radians(lat_column)) * func.power(func.sin(half_dlon), 2))
+    # least() chroni asin przed wartością minimalnie > 1 z błędów zaokrągleń
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(a, 1.0)))
@@ -0,0 +1,177 @@
+"""
+Odwrotne geokodowanie w pamięci procesu (/regions/reverse): najbliższe miasta
+dla współrzędnych.
+
+Miasta z region_cities (z liczbowymi lat/lon) są zamieniane na punkty na
+sferze jednostkowej (x, y, z) i układane w niejawne drzewo k-d: tablica
+``array('d')`` współrzędnych w kolejności drzewa, gdzie środek każdego
+zakresu jest węzłem, a lewa/prawa połowa jego poddrzewami (oś podziału to
+głębokość mod 3). Odległość cięciwy w 3D rośnie razem z odległością po
+okręgu wielkim, więc wyszukiwanie nie ma problemów z południkiem 180° ani
+biegunami; dla kilku najbliższych miast odwiedza kilkadziesiąt węzłów.
+
+Indeks jest budowany przy starcie aplikacji i przebudowywany, gdy zmieni
+się wersja zbioru REGIONS_DATASET (jak indeks autouzupełniania).
+"""
+import heapq
+import math
+import threading
+import time
+from array import array
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.core.config import settings
+from app.core.geo import EARTH_RADIUS_KM
+from app.core.region_index import REGIONS_DATASET
+
+
+def _unit_vector(lat: float, lon: float) -> tuple:
+    lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+    cos_lat = math.cos(lat_rad)
+    return cos_lat * math.cos(lon_rad), cos_lat * math.sin(lon_rad), math.sin(lat_rad)
+
+
+class _KdTree:
+    """Niejawne drzewo k-d punktów 3D; ``items[i]`` to numer punktu w węźle i."""
+
+    def __init__(self, points: list):
+        order = list(range(len(points)))
+        self._partition(order, points)
+        self.items = array("i", order)
+        self.coords = array("d")
+        for i in order:
+            self.coords.extend(points[i])
+
+    @staticmethod
+    def _partition(order: list, points: list) -> None:
+        """Porządkuje ``order`` tak, by mediana każdego zakresu była węzłem drzewa."""
+        # Stos zamiast rekurencji: (lo, hi, głębokość)
+        stack = [(0, len(order), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= 1:
+                continue
+            axis = depth % 3
+            order[lo:hi] = sorted(order[lo:hi], key=lambda i: points[i][axis])
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+
+    def __len__(self):
+        return len(self.items)
+
+    def nearest(self, point: tuple, k: int) -> list:
+        """Zwraca [(kwadrat odległości cięciwy, numer punktu)] k najbliższych, rosnąco."""
+        coords = self.coords
+        heap = []  # max-kopiec po odległości: (-d2, numer punktu)
+        stack = [(0, len(self.items), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            base = 3 * mid
+            dx = point[0] - coords[base]
+            dy = point[1] - coords[base + 1]
+            dz = point[2] - coords[base + 2]
+            d2 = dx * dx + dy * dy + dz * dz
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, self.items[mid]))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, self.items[mid]))
+
+            diff = (dx, dy, dz)[depth % 3]
+            if diff < 0:
+                near, far = (lo, mid), (mid + 1, hi)
+            else:
+                near, far = (mid + 1, hi), (lo, mid)
+            # Dalsze poddrzewo tylko, gdy płaszczyzna podziału jest bliżej niż najgorszy wynik
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                stack.append((far[0], far[1], depth + 1))
+            stack.append((near[0], near[1], depth + 1))
+        return sorted((-neg_d2, item) for neg_d2, item in heap)
+
+
+class CityLocator:
+    """Najbliższe miasta dla współrzędnych, z kontrolą wersji danych."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (drzewo, miasta, województwa, kraje) - podmieniane jednym przypisaniem;
+        # miasto: (id, nazwa, numer województwa, numer kraju) wg numeru punktu,
+        # województwo/kraj: (id, nazwa)
+        self._data: Optional[tuple] = None
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+
+    @property
+    def is_built(self) -> bool:
+        return self.version is not None
+
+    def build(self, db: Session) -> None:
+        """Buduje drzewo od nowa i podmienia je atomowo."""
+        version = crud.get_reference_data_version(db, REGIONS_DATASET)
+        states, state_positions = [], {}
+        for state_id, name in db.query(models.RegionState.id, models.RegionState.name):
+            state_positions[state_id] = len(states)
+            states.append((str(state_id), name))
+        countries, country_positions = [], {}
+        for country_id, name in db.query(models.RegionCountry.id, models.RegionCountry.name):
+            country_positions[country_id] = len(countries)
+            countries.append((str(country_id), name))
+
+        cities, points = [], []
+        rows = db.query(
+            models.RegionCity.id, models.RegionCity.name, models.RegionCity.lat,
+            models.RegionCity.lon, models.RegionCity.state_id, models.RegionCity.country_id,
+        ).filter(models.RegionCity.lat.isnot(None), models.RegionCity.lon.isnot(None))
+        for city_id, name, lat, lon, state_id, country_id in rows:
+            cities.append((str(city_id), name, state_positions.get(state_id), country_positions.get(country_id)))
+            points.append(_unit_vector(lat, lon))
+
+        tree = _KdTree(points)
+        self._data = (tree, cities, states, countries)
+        self.version = version
+        self._checked_at = time.monotonic()
+        print(f"[CITY LOCATOR] Zbudowano drzewo k-d miast (wersja {version}): {len(tree)} miast")
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Buduje drzewo, jeśli go nie ma lub jeśli wersja danych w bazie się zmieniła."""
+        now = time.monotonic()
+        if self.is_built and now - self._checked_at < settings.region_index_refresh_seconds:
+            return
+        with self._lock:
+            if self.is_built and time.monotonic() - self._checked_at < settings.region_index_refresh_seconds:
+                return
+            if not self.is_built or crud.get_reference_data_version(db, REGIONS_DATASET) != self.version:
+                self.build(db)
+            else:
+                self._checked_at = time.monotonic()
+
+    def nearest(self, lat: float, lon: float, limit: int) -> list:
+        if self._data is None:
+            return []
+        tree, cities, states, countries = self._data
+        if not len(tree):
+            return []
+        results = []
+        for d2, item in tree.nearest(_unit_vector(lat, lon), limit):
+            city_id, name, state_position, country_position = cities[item]
+            state = states[state_position] if state_position is not None else None
+            country = countries[country_position] if country_position is not None else None
+            results.append({
+                "id": city_id,
+                "name": name,
+                "type": "city",
+                "state": {"id": state[0], "name": state[1]} if state else None,
+                "country": {"id": country[0], "name": country[1]} if country else None,
+                # Cięciwa -> odległość po okręgu wielkim
+                "distance_km": round(2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(d2) / 2, 1.0)), 3),
+            })
+        return results
+
+
+city_locator = CityLocator()
@@ -0,0 +1,196 @@
+"""
+Klient GUS BIR1 (wyszukiwarka REGON) - dane firmy po NIP.
+
+Jeden klient zeep na proces: WSDL/XSD są pobierane i parsowane raz
+(dodatkowo trzymane w cache SQLite zeep przez ``gus_wsdl_cache_seconds``,
+więc restart ich nie pobiera), a połączenia HTTP są utrzymywane przez
+wspólną sesję requests. Sesja BIR1 (SID z ``Zaloguj``) jest współdzielona
+przez wszystkie zapytania i odnawiana po ``gus_session_renew_seconds``
+bezczynności (GUS kończy ją po 60 min) albo gdy GUS zgłosi ją jako
+nieważną.
+
+Wyniki (także "brak firmy") są zapisywane w tabeli gus_company_cache na
+``gus_company_cache_ttl_seconds`` (``gus_not_found_cache_ttl_seconds`` dla
+braku firmy). Równoczesne zapytania o ten sam NIP czekają na jedno
+zapytanie do GUS.
+"""
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Optional
+
+import requests
+import zeep
+import zeep.helpers
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from zeep.cache import SqliteCache
+from zeep.transports import Transport
+
+from app import models
+from app.core.config import settings
+
+# Wagi cyfr kontrolnych NIP
+NIP_WEIGHTS = (6, 5, 7, 2, 3, 4, 5, 6, 7)
+
+
+def normalize_nip(nip: str) -> Optional[str]:
+    """NIP jako 10 cyfr (bez kresek, spacji i prefiksu PL) albo None, jeśli suma kontrolna się nie zgadza."""
+    digits = nip.strip().upper().removeprefix("PL").replace("-", "").replace(" ", "")
+    if len(digits) != 10 or not digits.isdigit():
+        return None
+    checksum = sum(int(digit) * weight for digit, weight in zip(digits, NIP_WEIGHTS)) % 11
+    return digits if checksum == int(digits[9]) else None
+
+
+def parse_company(result, nip: str) -> Optional[dict]:
+    """Dane firmy z odpowiedzi DaneSzukaj (XML lub obiekt zeep); None, jeśli brak firmy."""
+    if not result:
+        return None
+    # Jeśli result to string (XML), parsujemy ręcznie
+    if isinstance(result, str):
+        dane_elem = ET.fromstring(result).find('dane')
+        if dane_elem is None:
+            return None
+        dane = {child.tag: child.text for child in dane_elem}
+    else:
+        # fallback: serializacja obiektu zeep
+        result_dict = zeep.helpers.serialize_object(result)
+        dane_list = result_dict.get('dane') or result_dict.get('Dane')
+        if not dane_list:
+            return None
+        dane = dane_list[0] if isinstance(dane_list, list) else dane_list
+    if "ErrorCode" in dane:
+        # Odpowiedź z kodem błędu zamiast danych (np. 4 - nie znaleziono)
+        return None
+    return {
+        "company_name": dane.get("Nazwa", ""),
+        "street": dane.get("Ulica", ""),
+        "building_number": dane.get("NrNieruchomosci", ""),
+        "apartment_number": dane.get("NrLokalu", ""),
+        "postal_code": dane.get("KodPocztowy", ""),
+        "city": dane.get("Miejscowosc", ""),
+        "nip": dane.get("Nip", nip),
+        "regon": dane.get("Regon", ""),
+        "krs": dane.get("Krs", ""),
+        "country": "Polska"
+    }
+
+
+class GusBir1Client:
+    def __init__(self):
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._session_lock = threading.Lock()
+        self._sid = None
+        self._sid_used_at = 0.0  # time.monotonic()
+        self._inflight: dict = {}  # NIP -> Future wyniku zapytania w toku
+        self._inflight_lock = threading.Lock()
+
+    def _get_client(self) -> zeep.Client:
+        with self._client_lock:
+            if self._client is None:
+                transport = Transport(
+                    session=requests.Session(),
+                    cache=SqliteCache(path=settings.gus_wsdl_cache_path,
+                                      timeout=settings.gus_wsdl_cache_seconds),
+                    timeout=settings.gus_request_timeout_seconds,
+                    operation_timeout=settings.gus_request_timeout_seconds,
+                )
+                client = zeep.Client(wsdl=settings.gus_bir1_wsdl, transport=transport)
+                client.service._binding_options["address"] = settings.gus_bir1_service_url
+                self._client = client
+            return self._client
+
+    def _session(self, client: zeep.Client, renew: bool = False) -> str:
+        """Zwraca ważny SID, logując się ponownie po długiej bezczynności lub na żądanie."""
+        with self._session_lock:
+            idle = time.monotonic() - self._sid_used_at
+            if renew or self._sid is None or idle >= settings.gus_session_renew_seconds:
+                self._logout(client)
+                sid = client.service.Zaloguj(settings.gus_bir1_user_key)
+                if not sid:
+                    raise RuntimeError("GUS BIR1 odrzucił logowanie (pusty SID)")
+                # SID jako nagłówek HTTP (zgodnie z instrukcją GUS BIR1)
+                client.transport.session.headers["sid"] = sid
+                self._sid = sid
+            self._sid_used_at = time.monotonic()
+            return self._sid
+
+    def _logout(self, client: zeep.Client) -> None:
+        if self._sid is None:
+            return
+        try:
+            client.service.Wyloguj(self._sid)
+        except Exception as e:
+            print(f"[GUS] Błąd podczas wylogowania: {e}")
+        self._sid = None
+
+    def search_nip(self, nip: str) -> Optional[dict]:
+        """Zapytanie DaneSzukaj do GUS (bez cache)."""
+        client = self._get_client()
+        search_params = {"Nip": nip, "Regon": None, "Krs": None}
+        self._session(client)
+        result = client.service.DaneSzukaj(search_params)
+        if not result and str(client.service.GetValue("StatusSesji")) != "1":
+            # Pusty wynik przy nieważnej sesji (np. zakończonej po stronie GUS) - ponów po zalogowaniu
+            self._session(client, renew=True)
+            result = client.service.DaneSzukaj(search_params)
+        return parse_company(result, nip)
+
+    def get_company(self, db: Session, nip: str) -> Optional[dict]:
+        """Dane firmy po (znormalizowanym) NIP: z cache w bazie albo z GUS."""
+        cached = db.get(models.GusCompanyCache, nip)
+        if cached is not None and cached.expires_at > datetime.utcnow():
+            return cached.data
+
+        with self._inflight_lock:
+            future = self._inflight.get(nip)
+            leader = future is None
+            if leader:
+                future = self._inflight[nip] = Future()
+        if not leader:
+            return future.result(timeout=settings.gus_request_timeout_seconds * 3)
+
+        try:
+            company = self.search_nip(nip)
+            # Zapis w cache przed zwolnieniem wpisu - zapytanie, które przyjdzie
+            # po zwolnieniu, znajdzie już wynik w bazie zamiast pytać GUS ponownie
+            self._store(db, nip, company)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(company)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(nip, None)
+        return company
+
+    @staticmethod
+    def _store(db: Session, nip: str, company: Optional[dict]) -> None:
+        now = datetime.utcnow()
+        ttl = settings.gus_company_cache_ttl_seconds if company is not None else settings.gus_not_found_cache_ttl_seconds
+        values = {"nip": nip, "data": company, "fetched_at": now, "expires_at": now + timedelta(seconds=ttl)}
+        stmt = insert(models.GusCompanyCache).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.GusCompanyCache.nip],
+            set_={key: stmt.excluded[key] for key in ("data", "fetched_at", "expires_at")},
+        )
+        try:
+            db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            # Brak zapisu w cache nie psuje odpowiedzi - kolejne zapytanie pójdzie do GUS
+            db.rollback()
+            print(f"[GUS] Nie udało się zapisać wyniku w cache: {e}")
+
+    def close(self) -> None:
+        with self._client_lock, self._session_lock:
+            if self._client is not None:
+                self._logout(self._client)
+
+
+gus_client = GusBir1Client()
@@ -0,0 +1,338 @@
+"""
+Strumień powiadomień na żywo (Server-Sent Events, GET /notifications/stream).
+
+Zmiany powiadomień są publikowane przez triggery na tabeli notifications
+(niezależnie od tego, który kod wstawia lub oznacza powiadomienia) przez
+``pg_notify`` na kanale crud.NOTIFICATION_CHANNEL w tej samej transakcji co
+zapis, więc dostają je wszystkie workery i tylko po commicie. Każdy
+proces ma jedno dedykowane połączenie asyncpg z ``LISTEN`` i broker
+rozsyłający zdarzenia do kolejek otwartych strumieni swoich użytkowników. Zdarzenia dla użytkowników bez strumienia w tym
+procesie są pomijane bez zapytania do bazy; nowe powiadomienia z paczki
+zdarzeń są pobierane jednym zapytaniem na proces, a nie na połączenie.
+
+Strumień wysyła zdarzenia ``notification`` (z ``id`` = kursor keyset
+powiadomienia) i ``unread_count``, a co ``notification_stream_heartbeat_seconds``
+komentarz podtrzymujący połączenie. Po zerwaniu połączenia klient
+(EventSource) wznawia je z nagłówkiem ``Last-Event-ID`` i dostaje
+powiadomienia, których nie zdążył odebrać. Gdy nie da się tego ustalić
+(przepełniona kolejka strumienia, zerwane połączenie LISTEN, zbyt duża
+zaległość), strumień wysyła ``resync`` - klient pobiera wtedy listę przez
+GET /notifications/.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+
+import asyncpg
+from sqlalchemy import select, tuple_
+from sqlalchemy.engine.url import make_url
+
+from app import crud, models, schemas
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, db_url
+from app.core.pagination import encode_cursor
+
+# Znacznik w kolejce strumienia: zdarzenia mogły przepaść, trzeba dociągnąć od kursora
+RESYNC = object()
+
+
+def format_event(event: str, data: str, event_id: Optional[str] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+def notification_cursor(notification) -> str:
+    return encode_cursor(notification.created_at, notification.id)
+
+
+class NotificationStreamMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.closed = 0
+        self.events_received = 0
+        self.notifications_fetched = 0
+        self.delivered = 0
+        self.overflows = 0  # przepełnione kolejki strumieni (zastąpione przez resync)
+        self.listener_connects = 0
+        self.last_error = None
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open_streams": self.opened - self.closed,
+                "opened": self.opened,
+                "events_received": self.events_received,
+                "notifications_fetched": self.notifications_fetched,
+                "delivered": self.delivered,
+                "overflows": self.overflows,
+                "listener_connects": self.listener_connects,
+                "last_error": self.last_error,
+            }
+
+
+class Subscription:
+    """Kolejka zdarzeń jednego strumienia."""
+
+    def __init__(self, user_id: str, broker: "NotificationBroker"):
+        self.user_id = user_id
+        self._broker = broker
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.notification_stream_queue_size)
+
+    def push(self, item) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Wolny klient: porzucamy zaległe zdarzenia, strumień dociągnie je od kursora
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC)
+            self._broker.metrics.add(overflows=1)
+
+    async def get(self, timeout: float):
+        """Następne zdarzenie albo None po ``timeout`` sekundach bez zdarzeń."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class NotificationBroker:
+    def __init__(self):
+        self.metrics = NotificationStreamMetrics()
+        self._subscribers: dict = {}  # str(user_id) -> zbiór Subscription
+        self._incoming: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+        self._listening = False
+
+    # --- subskrypcje (wywoływane w pętli zdarzeń) ---
+    def subscribe(self, user_id) -> Subscription:
+        subscription = Subscription(str(user_id), self)
+        self._subscribers.setdefault(subscription.user_id, set()).add(subscription)
+        self.metrics.add(opened=1)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[subscription.user_id]
+        self.metrics.add(closed=1)
+
+    @property
+    def is_listening(self) -> bool:
+        return self._listening
+
+    # --- cykl życia ---
+    def start(self) -> None:
+        """Uruchamia nasłuch LISTEN i rozsyłanie (w działającej pętli zdarzeń)."""
+        if self._tasks:
+            return
+        self._incoming = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._listen(), name="notification-listener"),
+            asyncio.create_task(self._dispatch(), name="notification-dispatcher"),
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._listening = False
+
+    # --- LISTEN ---
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.metrics.add(events_received=1)
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        if event.get("user_id") in self._subscribers:
+            self._incoming.put_nowait(event)
+
+    async def _listen(self) -> None:
+        """Utrzymuje połączenie LISTEN, odtwarzając je po zerwaniu."""
+        dsn = make_url(db_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = 1
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn, timeout=settings.notification_stream_heartbeat_seconds)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _connection: lost.set())
+                await connection.add_listener(crud.NOTIFICATION_CHANNEL, self._on_notify)
+                if self.metrics.listener_connects:
+                    # Zdarzenia z czasu bez połączenia przepadły
+                    self._resync_all()
+                self.metrics.add(listener_connects=1)
+                self._listening = True
+                delay = 1
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), settings.notification_stream_heartbeat_seconds)
+                    except asyncio.TimeoutError:
+                        # Wykrywa "ciche" zerwanie połączenia (np. tunelu SSH)
+                        await connection.execute("SELECT 1", timeout=settings.notification_stream_heartbeat_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.last_error = f"{type(e).__name__}: {e}"
+                print(f"[NOTIFICATION STREAM] Błąd połączenia LISTEN: {e}")
+            finally:
+                self._listening = False
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _resync_all(self) -> None:
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                subscription.push(RESYNC)
+
+    # --- rozsyłanie ---
+    async def _dispatch(self) -> None:
+        while True:
+            events = [await self._incoming.get()]
+            while not self._incoming.empty():
+                events.append(self._incoming.get_nowait())
+            try:
+                await self._deliver(events)
+            except Exception as e:
+                self.metrics.last_error = f"{type(e).__name__}: {e}"
+                print(f"[NOTIFICATION STREAM] Błąd rozsyłania zdarzeń: {e}")
+                for event in events:
+                    for subscription in self._subscribers.get(event["user_id"], ()):
+                        subscription.push(RESYNC)
+
+    async def _deliver(self, events: list) -> None:
+        """Rozsyła paczkę zdarzeń; nowe powiadomienia pobiera jednym zapytaniem."""
+        ids = [
+            notification_id
+            for event in events if event["user_id"] in self._subscribers
+            for notification_id in event.get("ids", ())
+        ]
+        notifications = {}
+        if ids:
+            async with AsyncSessionLocal() as db:
+                rows = await db.scalars(
+                    select(models.Notification)
+                    .where(models.Notification.id.in_(ids))
+                    .order_by(models.Notification.created_at, models.Notification.id)
+                )
+                for notification in rows:
+                    notifications[str(notification.id)] = schemas.NotificationOut.model_validate(notification)
+            self.metrics.add(notifications_fetched=len(notifications))
+
+        for event in events:
+            subscriptions = self._subscribers.get(event["user_id"])
+            if not subscriptions:
+                continue
+            items = []
+            if event.get("resync"):
+                items.append(RESYNC)
+            items.extend(notifications[i] for i in event.get("ids", ()) if i in notifications)
+            if event.get("unread_count") is not None:
+                items.append(("unread_count", event["unread_count"]))
+            for subscription in subscriptions:
+                for item in items:
+                    subscription.push(item)
+
+    def snapshot(self) -> dict:
+        return {"listening": self._listening, **self.metrics.snapshot()}
+
+
+notification_broker = NotificationBroker()
+
+
+async def _notifications_after(user_id, after: tuple, limit: int) -> list:
+    """Powiadomienia użytkownika nowsze niż kursor ``after``, od najstarszego."""
+    async with AsyncSessionLocal() as db:
+        rows = await db.scalars(
+            select(models.Notification)
+            .where(
+                models.Notification.user_id == user_id,
+                tuple_(models.Notification.created_at, models.Notification.id) > tuple_(*after),
+            )
+            .order_by(models.Notification.created_at, models.Notification.id)
+            .limit(limit)
+        )
+        return [schemas.NotificationOut.model_validate(notification) for notification in rows]
+
+
+async def _unread_count(user_id) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(lambda session: crud.get_unread_notification_count(session, user_id))
+
+
+async def event_stream(user_id, after: Optional[tuple], token_expires_at: Optional[float]):
+    """
+    Generator strumienia SSE dla użytkownika. ``after`` to (created_at, id)
+    z Last-Event-ID - najpierw wysyłane są zaległe powiadomienia, potem
+    zdarzenia na żywo. Strumień kończy się po wygaśnięciu tokenu (zdarzenie
+    ``token_expired``; klient odświeża token i łączy się ponownie).
+    """
+    subscription = notification_broker.subscribe(user_id)
+    heartbeat = settings.notification_stream_heartbeat_seconds
+    # Id wysłanych w ostatnim doładowaniu - te same powiadomienia mogą przyjść z kolejki
+    recently_sent: set = set()
+    try:
+        yield f"retry: {settings.notification_stream_retry_ms}\n\n"
+
+        async def catch_up():
+            nonlocal after, recently_sent
+            if after is None:
+                yield format_event("resync", "{}")
+                return
+            limit = settings.notification_stream_backlog_limit
+            backlog = await _notifications_after(user_id, after, limit + 1)
+            if len(backlog) > limit:
+                # Zbyt duża zaległość - taniej przeładować listę niż ją strumieniować
+                after = None
+                yield format_event("resync", "{}")
+                return
+            recently_sent = {notification.id for notification in backlog}
+            for notification in backlog:
+                after = (notification.created_at, notification.id)
+                yield format_event("notification", notification.model_dump_json(),
+                                   notification_cursor(notification))
+            notification_broker.metrics.add(delivered=len(backlog))
+
+        if after is not None:
+            async for chunk in catch_up():
+                yield chunk
+        yield format_event("unread_count", json.dumps({"unread_count": await _unread_count(user_id)}))
+
+        while True:
+            if token_expires_at is not None and time.time() >= token_expires_at:
+                yield format_event("token_expired", "{}")
+                return
+            item = await subscription.get(heartbeat)
+            if item is None:
+                yield ": ping\n\n"
+            elif item is RESYNC:
+                async for chunk in catch_up():
+                    yield chunk
+                yield format_event("unread_count", json.dumps({"unread_count": await _unread_count(user_id)}))
+            elif isinstance(item, tuple):
+                event, value = item
+                yield format_event(event, json.dumps({event: value}))
+            elif item.id not in recently_sent:
+                after = (item.created_at, item.id)
+                notification_broker.metrics.add(delivered=1)
+                yield format_event("notification", item.model_dump_json(), notification_cursor(item))
+    finally:
+        notification_broker.unsubscribe(subscription)
@@ -0,0 +1,166 @@
+"""
+Paginacja kursorowa (keyset) dla endpointów zwracających listy.
+
+Kursor to zakodowane w base64 wartości kluczy sortowania ostatniego elementu
+strony. Kolejna strona jest pobierana warunkiem ``(k1, k2) > kursor`` (lub ``<``
+przy sortowaniu malejącym), dzięki czemu zapytanie korzysta z indeksu złożonego
+i jego koszt nie rośnie wraz z numerem strony, tak jak przy OFFSET.
+
+Ciało odpowiedzi pozostaje listą (kompatybilność z frontendem), a kursor
+następnej strony jest zwracany w nagłówku ``X-Next-Cursor``.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import InvalidOperation
+from typing import Any, Callable, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Response
+from sqlalchemy import literal, text, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_ESTIMATE_HEADER = "X-Total-Count-Estimate"
+
+# Domyślne klucze sortowania: (created_at, id)
+CREATED_AT_ID = (datetime.fromisoformat, UUID)
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    """Zwraca rozmiar strony ograniczony do ``pagination_max_limit``."""
+    if not limit or limit < 1:
+        return settings.pagination_default_limit
+    return min(limit, settings.pagination_max_limit)
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else str(v) for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, converters: Sequence[Callable[[str], Any]]) -> list:
+    """Dekoduje kursor; nieprawidłowy kursor kończy się błędem 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, list) or len(payload) != len(converters):
+            raise ValueError("cursor arity")
+        return [convert(value) for convert, value in zip(converters, payload)]
+    except (ValueError, TypeError, InvalidOperation, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Nieprawidłowy kursor paginacji")
+
+
+def _keyset(query, columns: Sequence, cursor: Optional[str], page_size: int,
+            descending: bool, converters: Sequence[Callable[[str], Any]]):
+    """Warunek keyset, sortowanie i limit (page_size + 1) - dla Query i select()."""
+    if cursor:
+        values = decode_cursor(cursor, converters)
+        bound = tuple_(*(literal(v, c.type) for v, c in zip(values, columns)))
+        row = tuple_(*columns)
+        query = query.filter(row < bound if descending else row > bound)
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return query.order_by(*order).limit(page_size + 1)
+
+
+def _page(rows: list, page_size: int, key: Callable[[Any], Tuple]):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(*key(rows[-1]))
+    return rows, next_cursor
+
+
+def paginate(
+    query,
+    columns: Sequence,
+    cursor: Optional[str],
+    limit: Optional[int],
+    key: Callable[[Any], Tuple],
+    descending: bool = False,
+    converters: Sequence[Callable[[str], Any]] = CREATED_AT_ID,
+):
+    """
+    Nakłada na zapytanie warunek keyset, sortowanie i limit.
+
+    ``columns`` to kolumny sortowania (muszą jednoznacznie porządkować wiersze,
+    dlatego ostatnią kolumną powinno być ``id``), a ``key`` wyciąga ich wartości
+    z wiersza wyniku. Zwraca ``(rows, next_cursor)``; ``next_cursor`` jest
+    ``None`` na ostatniej stronie.
+    """
+    page_size = clamp_limit(limit)
+    rows = _keyset(query, columns, cursor, page_size, descending, converters).all()
+    return _page(rows, page_size, key)
+
+
+async def paginate_async(
+    db,
+    statement,
+    columns: Sequence,
+    cursor: Optional[str],
+    limit: Optional[int],
+    key: Callable[[Any], Tuple],
+    descending: bool = False,
+    converters: Sequence[Callable[[str], Any]] = CREATED_AT_ID,
+    scalars: bool = False,
+):
+    """
+    Odpowiednik ``paginate`` dla ``select()`` wykonywanego w AsyncSession.
+    ``scalars=True`` zwraca obiekty ORM zamiast wierszy (select jednej encji).
+    """
+    page_size = clamp_limit(limit)
+    result = await db.execute(_keyset(statement, columns, cursor, page_size, descending, converters))
+    rows = list(result.scalars().all() if scalars else result.all())
+    return _page(rows, page_size, key)
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) dla dowolnego zapytania - do szacowania liczby wierszy."""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def estimate_count(db, query, table_name: str, filtered: bool) -> Optional[int]:
+    """
+    Przybliżona liczba wierszy bez COUNT(*): dla listy bez filtrów z
+    pg_class.reltuples, dla listy z filtrami - szacunek planera (EXPLAIN).
+    Zwraca None, gdy statystyki nie są dostępne (tabela nigdy nie analizowana).
+    """
+    try:
+        if not filtered:
+            estimate = db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"),
+                {"table_name": table_name},
+            ).scalar()
+            if estimate is not None and estimate >= 0:
+                return int(estimate)
+        plan = db.execute(Explain(query.statement)).scalar()
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        # Błąd zapytania unieważnia transakcję sesji - wycofujemy ją
+        db.rollback()
+        print(f"[PAGINATION] Nie udało się oszacować liczby wierszy {table_name}: {e}")
+        return None
+
+
+def set_total_estimate(response: Response, estimate: Optional[int]) -> None:
+    if estimate is not None:
+        response.headers[TOTAL_ESTIMATE_HEADER] = str(estimate)
@@ -0,0 +1,144 @@
+"""
+Haszowanie i weryfikacja haseł (bcrypt) na ograniczonej puli wątków.
+
+bcrypt przy domyślnym koszcie zajmuje ~250 ms CPU na wywołanie. Wszystkie
+operacje trafiają do jednej puli ``password_hash_workers`` wątków (bcrypt
+zwalnia GIL, więc wątki liczą równolegle), dzięki czemu seria logowań
+zajmuje najwyżej tyle rdzeni, ile wątków puli, a nie wszystkie wątki
+serwera. Gdy kolejka oczekujących przekroczy ``password_hash_max_queue``,
+żądanie jest od razu odrzucane (503) zamiast czekać w nieskończoność.
+
+Koszt nowych hashy to ``bcrypt_rounds``; hash o innym koszcie jest po
+udanym logowaniu przeliczany (``needs_rehash``).
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+class PasswordHasherMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0  # zadania oczekujące lub liczone
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_queue_ms = 0.0
+        self.total_work_ms = 0.0
+
+    def admit(self, limit: int) -> bool:
+        """Rejestruje nowe zadanie; False, jeśli w puli i kolejce jest już ``limit`` zadań."""
+        with self._lock:
+            if self.in_flight >= limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True
+
+    def finish(self, queue_ms: float, work_ms: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_queue_ms += queue_ms
+            self.total_work_ms += work_ms
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            in_progress = min(self.in_flight, settings.password_hash_workers)
+            return {
+                "workers": settings.password_hash_workers,
+                "in_progress": in_progress,
+                "queue_depth": self.in_flight - in_progress,
+                "max_in_flight": self.max_in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_queue_ms": round(self.total_queue_ms / self.completed, 3) if self.completed else 0.0,
+                "avg_work_ms": round(self.total_work_ms / self.completed, 3) if self.completed else 0.0,
+            }
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_queue: int):
+        self.max_queue = max_queue
+        self.metrics = PasswordHasherMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    def _submit(self, fn, *args) -> Future:
+        metrics = self.metrics
+        if not metrics.admit(settings.password_hash_workers + self.max_queue):
+            raise HTTPException(
+                status_code=503,
+                detail="Serwer jest przeciążony, spróbuj ponownie za chwilę",
+                headers={"Retry-After": "1"},
+            )
+        submitted_at = time.perf_counter()
+
+        def run():
+            started_at = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                metrics.finish(
+                    queue_ms=(started_at - submitted_at) * 1000,
+                    work_ms=(time.perf_counter() - started_at) * 1000,
+                )
+
+        try:
+            return self._executor.submit(run)
+        except RuntimeError:
+            # Pula zamknięta (zamykanie aplikacji)
+            metrics.cancel()
+            raise
+
+    # --- API (endpointy def i skrypty - wywołanie blokuje do wyniku) ---
+
+    def hash(self, password: str) -> str:
+        return self._submit(_hash, password).result()
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._submit(_verify, plain_password, hashed_password).result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _to_bytes(value) -> bytes:
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return value
+
+
+def _hash(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
+    return bcrypt.hashpw(_to_bytes(password), salt).decode("utf-8")
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    if isinstance(hashed_password, str):
+        # Usuń ewentualne białe znaki z hasha (zawiera tylko znaki ASCII)
+        hashed_password = hashed_password.strip()
+    return bcrypt.checkpw(_to_bytes(plain_password), _to_bytes(hashed_password))
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True, jeśli hash ma inny koszt niż ``bcrypt_rounds`` (format $2b$<koszt>$...)."""
+    try:
+        return int(hashed_password.strip().split("$")[2]) != settings.bcrypt_rounds
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+)
@@ -0,0 +1,92 @@
+"""
+Telemetria pul połączeń z bazą danych.
+
+Pule silników (synchronicznego i asynchronicznego) są instancjami klas
+z tego modułu, które mierzą czas pobrania połączenia z puli (łącznie z
+oczekiwaniem na wolne połączenie i otwarciem nowego). Zbierane są:
+histogram czasu pobrania, łączny i maksymalny czas oczekiwania oraz liczba
+przekroczeń ``pool_timeout``. Razem z bieżącym stanem puli (rozmiar,
+wypożyczone połączenia, overflow) pozwala to dobrać liczbę workerów i
+parametry puli do ``max_connections`` Postgresa.
+"""
+import bisect
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Górne granice przedziałów histogramu czasu pobrania połączenia (ms)
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+
+    def observe_checkout(self, elapsed_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_ms += elapsed_ms
+            self.max_wait_ms = max(self.max_wait_ms, elapsed_ms)
+            self.buckets[bisect.bisect_left(CHECKOUT_BUCKETS_MS, elapsed_ms)] += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            # Histogram skumulowany: liczba pobrań trwających <= granica przedziału
+            histogram = {}
+            cumulative = 0
+            for bound, count in zip(CHECKOUT_BUCKETS_MS + ("inf",), self.buckets):
+                cumulative += count
+                histogram[f"le_{bound}ms" if bound != "inf" else "le_inf"] = cumulative
+            observed = self.checkouts + self.timeouts
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / observed, 3) if observed else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "checkout_latency_ms": histogram,
+            }
+
+
+class _InstrumentedPoolMixin:
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.observe_checkout((time.perf_counter() - start) * 1000, timed_out=True)
+            raise
+        self.metrics.observe_checkout((time.perf_counter() - start) * 1000)
+        return connection
+
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    metrics = sync_pool_metrics
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
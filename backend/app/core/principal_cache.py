@@ -0,0 +1,164 @@
+"""
+Cache uwierzytelnionych użytkowników (principali) dla utils.get_current_user
+i utils.get_current_user_async.
+
+Bez cache każde żądanie z tokenem to dekodowanie JWT i zapytanie o
+użytkownika po emailu. Cache (LRU z TTL) trzyma pod skrótem tokenu
+wartości kolumn użytkownika i jego roli; przy trafieniu obiekt User jest
+dołączany do sesji żądania (Session lub AsyncSession) przez
+``merge(load=False)``, bez zapytania do bazy (relacje inne niż rola ładują
+się leniwie, jak dotąd; w AsyncSession trzeba je załadować jawnie).
+
+Wpisy użytkownika są unieważniane po zmianie dowolnej jego kolumny
+(zdarzenie after_update/after_delete modelu User) - obiekt z cache trafia
+do sesji żądania, więc nieaktualna wartość (np. city_id, last_login)
+przesłoniłaby też późniejsze zapytania w tej sesji. Masowe
+``update(User)``/``Query.update()`` nie wywołują after_update: po takiej
+zmianie trzeba wywołać ``principal_cache.invalidate_user`` (lub ``clear``).
+Zmiany wykonane w innym procesie są widoczne najpóźniej po
+``principal_cache_ttl_seconds``.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from app import models
+from app.core.config import settings
+
+@dataclass
+class Principal:
+    user_id: object
+    user_columns: dict
+    role_columns: Optional[dict]
+    expires_at: float  # time.monotonic()
+    token_expires_at: Optional[float]  # "exp" z JWT
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _columns(instance) -> dict:
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+class PrincipalCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # skrót tokenu -> Principal
+        self._keys_by_user: dict = {}  # user_id -> zbiór skrótów tokenów
+
+    def get(self, token: str, db: Session) -> Optional[models.User]:
+        """Zwraca użytkownika dołączonego do sesji ``db`` albo None (brak w cache)."""
+        user = self._detached_user(token)
+        return db.merge(user, load=False) if user is not None else None
+
+    async def get_async(self, token: str, db: AsyncSession) -> Optional[models.User]:
+        """Jak ``get``, dla sesji AsyncSession (endpointy async def)."""
+        user = self._detached_user(token)
+        return await db.merge(user, load=False) if user is not None else None
+
+    def _detached_user(self, token: str) -> Optional[models.User]:
+        key = token_key(token)
+        with self._lock:
+            principal = self._entries.get(key)
+            if principal is not None and principal.expires_at <= time.monotonic():
+                self._remove(key)
+                principal = None
+            if principal is None:
+                return None
+            self._entries.move_to_end(key)
+
+        user = models.User(**principal.user_columns)
+        role = None
+        if principal.role_columns is not None:
+            role = models.Role(**principal.role_columns)
+            make_transient_to_detached(role)
+        set_committed_value(user, "role", role)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, token: str, user: models.User, token_expires_at: Optional[float] = None) -> None:
+        """
+        Zapamiętuje użytkownika dla tokenu. ``token_expires_at`` (timestamp
+        "exp" z JWT) skraca czas życia wpisu, aby nie przeżył tokenu.
+        """
+        ttl = settings.principal_cache_ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        principal = Principal(
+            user_id=user.id,
+            user_columns=_columns(user),
+            role_columns=_columns(user.role) if user.role is not None else None,
+            expires_at=time.monotonic() + ttl,
+            token_expires_at=token_expires_at,
+        )
+        key = token_key(token)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = principal
+            self._keys_by_user.setdefault(principal.user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def token_expires_at(self, token: str) -> Optional[float]:
+        key = token_key(token)
+        with self._lock:
+            principal = self._entries.get(key)
+        return principal.token_expires_at if principal is not None else None
+
+    def user_id_for(self, token: str):
+        """Id użytkownika z cache (bez zapytania do bazy) albo None."""
+        key = token_key(token)
+        with self._lock:
+            principal = self._entries.get(key)
+        if principal is None or principal.expires_at <= time.monotonic():
+            return None
+        return principal.user_id
+
+    def invalidate_user(self, user_id) -> None:
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key: str) -> None:
+        principal = self._entries.pop(key, None)
+        if principal is None:
+            return
+        keys = self._keys_by_user.get(principal.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[principal.user_id]
+
+
+principal_cache = PrincipalCache(max_size=settings.principal_cache_max_size)
+
+
+@event.listens_for(models.User, "after_update")
+def _invalidate_on_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[attr.key].history.has_changes() for attr in mapper.column_attrs):
+        principal_cache.invalidate_user(target.id)
+
+
+@event.listens_for(models.User, "after_delete")
+def _invalidate_on_delete(mapper, connection, target):
+    principal_cache.invalidate_user(target.id)
@@ -0,0 +1,197 @@
+"""
+Snapshoty danych referencyjnych (kategorie, regiony) serwowane z pamięci.
+
+Każdy zbiór jest serializowany do JSON raz na wersję danych i przechowywany
+razem z wersją skompresowaną gzip. Odpowiedzi mają silny ETag (skrót treści)
+i nagłówek Cache-Control, więc klient z aktualną kopią dostaje 304.
+
+Wersja snapshotu to wersja zbioru z tabeli reference_data_versions
+(podbijana przez skrypty seedujące) i jest zwracana w nagłówku
+X-Snapshot-Version. Klient może przesłać ``since_version`` - jeśli proces
+pamięta tę wersję, zwracana jest tylko różnica (dodane/zmienione wiersze
+i id usuniętych) zamiast całej listy, np. wszystkich miast.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+
+CATEGORIES_DATASET = "categories"
+
+SNAPSHOT_VERSION_HEADER = "X-Snapshot-Version"
+SNAPSHOT_DELTA_HEADER = "X-Snapshot-Delta"
+
+# Ile poprzednich wersji (skrótów wierszy) pamiętamy na potrzeby trybu delta
+DELTA_HISTORY_SIZE = 5
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+@dataclass
+class Payload:
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+    @classmethod
+    def from_value(cls, value) -> "Payload":
+        body = _dumps(value)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        return cls(body=body, gzip_body=gzip.compress(body, compresslevel=9, mtime=0), etag=digest)
+
+
+@dataclass
+class Snapshot:
+    version: int
+    full: Payload
+    rows: dict  # sekcja -> {id: wiersz}
+    digests: dict  # sekcja -> {id: skrót wiersza}
+    deltas: dict = field(default_factory=dict)  # wersja bazowa -> Payload
+
+
+class ReferenceDataset:
+    """
+    Zbiór danych referencyjnych. ``loader`` zwraca słownik sekcja -> lista
+    wierszy (każdy z kluczem "id"), a ``render`` składa z sekcji treść pełnej
+    odpowiedzi w formacie dotychczasowego endpointu.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[Session], dict],
+        render: Callable[[dict], object],
+        version_key: Optional[str] = None,
+    ):
+        self.name = name
+        self.loader = loader
+        self.render = render
+        # None = dane statyczne, bez wersji w bazie
+        self.version_key = version_key
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._history: OrderedDict = OrderedDict()  # wersja -> skróty wierszy
+        self._checked_at = 0.0
+
+    def _current_version(self, db: Session) -> int:
+        if self.version_key is None:
+            return 0
+        return crud.get_reference_data_version(db, self.version_key)
+
+    def _build(self, db: Session, version: int) -> Snapshot:
+        sections = self.loader(db)
+        rows = {}
+        digests = {}
+        for section, items in sections.items():
+            rows[section] = {}
+            digests[section] = {}
+            for item in items:
+                if "id" not in item:
+                    continue
+                rows[section][item["id"]] = item
+                digests[section][item["id"]] = hashlib.sha1(_dumps(item)).digest()
+        snapshot = Snapshot(version=version, full=Payload.from_value(self.render(sections)),
+                            rows=rows, digests=digests)
+
+        if self._snapshot is not None and self._snapshot.version != version:
+            self._history[self._snapshot.version] = self._snapshot.digests
+            while len(self._history) > DELTA_HISTORY_SIZE:
+                self._history.popitem(last=False)
+        print(f"[REFERENCE DATA] Zbudowano snapshot '{self.name}' (wersja {version}, {len(snapshot.full.body)} B)")
+        return snapshot
+
+    def get(self, db: Session) -> Snapshot:
+        """Zwraca aktualny snapshot, przebudowując go po zmianie wersji danych."""
+        snapshot = self._snapshot
+        if snapshot is not None and (
+            self.version_key is None
+            or time.monotonic() - self._checked_at < settings.reference_data_refresh_seconds
+        ):
+            return snapshot
+        with self._lock:
+            version = self._current_version(db)
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = self._build(db, version)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def delta(self, snapshot: Snapshot, base_version: int) -> Optional[Payload]:
+        """Różnica między wersją bazową a snapshotem; None jeśli wersji bazowej nie pamiętamy."""
+        if base_version in snapshot.deltas:
+            return snapshot.deltas[base_version]
+        if base_version == snapshot.version:
+            base = snapshot.digests
+        else:
+            base = self._history.get(base_version)
+            if base is None:
+                return None
+
+        sections = {}
+        for section, digests in snapshot.digests.items():
+            old = base.get(section, {})
+            sections[section] = {
+                "upserted": [
+                    snapshot.rows[section][row_id]
+                    for row_id, digest in digests.items()
+                    if old.get(row_id) != digest
+                ],
+                "removed": [row_id for row_id in old if row_id not in digests],
+            }
+        payload = Payload.from_value({
+            "version": snapshot.version,
+            "base_version": base_version,
+            "sections": sections,
+        })
+        snapshot.deltas[base_version] = payload
+        return payload
+
+
+def snapshot_response(
+    request: Request,
+    dataset: ReferenceDataset,
+    db: Session,
+    since_version: Optional[int] = None,
+) -> Response:
+    """Buduje odpowiedź HTTP ze snapshotu (304 / gzip / delta)."""
+    snapshot = dataset.get(db)
+    payload = snapshot.full
+    is_delta = False
+    if since_version is not None:
+        delta = dataset.delta(snapshot, since_version)
+        if delta is not None:
+            payload = delta
+            is_delta = True
+
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+    # Silny ETag musi się różnić między reprezentacjami (kodowaniami treści)
+    etag = f'"{payload.etag}-gz"' if use_gzip else f'"{payload.etag}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.reference_data_max_age_seconds}",
+        "Vary": "Accept-Encoding",
+        SNAPSHOT_VERSION_HEADER: str(snapshot.version),
+        SNAPSHOT_DELTA_HEADER: "true" if is_delta else "false",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in candidates or f'"{payload.etag}"' in candidates or f'"{payload.etag}-gz"' in candidates:
+            return Response(status_code=304, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=payload.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
@@ -0,0 +1,197 @@
+"""
+Indeks w pamięci procesu do autouzupełniania regionów (/regions/search).
+
+Indeks jest budowany przy starcie aplikacji z tabel region_cities,
+region_states i region_countries (pola name, asciiname, alternatenames).
+Wyszukiwanie jest niewrażliwe na wielkość liter i znaki diakrytyczne
+("lodz" znajduje "Łódź") i obsługuje dopasowanie prefiksowe (również od
+początku kolejnych słów nazwy) oraz podciągowe (przez indeks trigramów).
+Wyniki są sortowane po populacji.
+
+Skrypty seedujące podbijają wersję zbioru REGIONS_DATASET w tabeli
+reference_data_versions; indeks co ``region_index_refresh_seconds`` sprawdza
+tę wersję i przebudowuje się, gdy dane się zmieniły.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.core.config import settings
+
+REGIONS_DATASET = "regions"
+
+# Litery, które nie rozkładają się w NFKD na literę bazową + znak diakrytyczny
+_EXTRA_FOLDING = str.maketrans({
+    "ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D",
+    "ß": "ss", "æ": "ae", "Æ": "AE", "œ": "oe", "Œ": "OE",
+})
+_WORD_SPLIT = re.compile(r"[\s\-/]+")
+
+
+def normalize(text: str) -> str:
+    """Sprowadza tekst do małych liter bez znaków diakrytycznych."""
+    decomposed = unicodedata.normalize("NFKD", text.translate(_EXTRA_FOLDING))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _TypeIndex:
+    """
+    Indeks jednego typu regionu. Wpisy są posortowane malejąco po populacji,
+    więc numer wpisu jest jednocześnie jego pozycją w rankingu.
+    """
+
+    def __init__(self, rows):
+        # rows: (id, name, asciiname, alternatenames, population, country_id)
+        rows = sorted(rows, key=lambda r: -(float(r[4]) if r[4] is not None else 0.0))
+        self.ids = []
+        self.names = []
+        self.country_ids = []
+        self.search_keys = []  # pełne znormalizowane nazwy wpisu (dopasowanie podciągowe)
+        prefix_pairs = []
+        trigrams = {}
+
+        for position, (region_id, name, asciiname, alternatenames, _, country_id) in enumerate(rows):
+            self.ids.append(str(region_id))
+            self.names.append(name)
+            self.country_ids.append(str(country_id) if country_id else None)
+
+            variants = [name, asciiname] + (alternatenames.split(",") if alternatenames else [])
+            keys = {normalize(v) for v in variants if v}
+            keys.discard("")
+            self.search_keys.append(tuple(keys))
+
+            for key in keys:
+                prefix_pairs.append((key, position))
+                for word in _WORD_SPLIT.split(key)[1:]:
+                    if word:
+                        prefix_pairs.append((word, position))
+                for trigram in _trigrams(key):
+                    trigrams.setdefault(trigram, set()).add(position)
+
+        prefix_pairs.sort()
+        self.prefix_keys = [key for key, _ in prefix_pairs]
+        self.prefix_positions = [position for _, position in prefix_pairs]
+        self.trigrams = trigrams
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _prefix_matches(self, q: str) -> set:
+        matches = set()
+        i = bisect.bisect_left(self.prefix_keys, q)
+        keys = self.prefix_keys
+        while i < len(keys) and keys[i].startswith(q):
+            matches.add(self.prefix_positions[i])
+            i += 1
+        return matches
+
+    def _substring_matches(self, q: str) -> set:
+        postings = [self.trigrams.get(t) for t in _trigrams(q)]
+        if not postings or any(p is None for p in postings):
+            return set()
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return {
+            position for position in candidates
+            if any(q in key for key in self.search_keys[position])
+        }
+
+    def search(self, q: str, limit: int, country_id: Optional[str] = None) -> list:
+        """
+        Zwraca pozycje wpisów: najpierw dopasowania prefiksowe, potem
+        podciągowe (dla fraz od 3 znaków), w obu grupach wg populacji.
+        """
+        prefix = self._prefix_matches(q)
+        substring = self._substring_matches(q) - prefix if len(q) >= 3 else set()
+        if country_id:
+            prefix = {p for p in prefix if self.country_ids[p] == country_id}
+            substring = {p for p in substring if self.country_ids[p] == country_id}
+
+        result = heapq.nsmallest(limit, prefix)
+        if len(result) < limit:
+            result += heapq.nsmallest(limit - len(result), substring)
+        return result
+
+
+class RegionIndex:
+    """Indeks wszystkich typów regionów z kontrolą wersji danych."""
+
+    TYPES = ("city", "state", "country")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: dict = {}
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+
+    @property
+    def is_built(self) -> bool:
+        return self.version is not None
+
+    def build(self, db: Session) -> None:
+        """Buduje indeks od nowa i podmienia go atomowo."""
+        version = crud.get_reference_data_version(db, REGIONS_DATASET)
+        indexes = {
+            "city": _TypeIndex(db.query(
+                models.RegionCity.id, models.RegionCity.name, models.RegionCity.asciiname,
+                models.RegionCity.alternatenames, models.RegionCity.population,
+                models.RegionCity.country_id,
+            ).all()),
+            "state": _TypeIndex(db.query(
+                models.RegionState.id, models.RegionState.name, models.RegionState.asciiname,
+                models.RegionState.alternatenames, models.RegionState.population,
+                models.RegionState.country_id,
+            ).all()),
+            "country": _TypeIndex(
+                (c.id, c.name, c.asciiname, c.alternatenames, c.population, c.id)
+                for c in db.query(
+                    models.RegionCountry.id, models.RegionCountry.name,
+                    models.RegionCountry.asciiname, models.RegionCountry.alternatenames,
+                    models.RegionCountry.population,
+                ).all()
+            ),
+        }
+        self._indexes = indexes
+        self.version = version
+        self._checked_at = time.monotonic()
+        print(
+            f"[REGION INDEX] Zbudowano indeks regionów (wersja {version}): "
+            + ", ".join(f"{name}={len(index)}" for name, index in indexes.items())
+        )
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Buduje indeks, jeśli go nie ma lub jeśli wersja danych w bazie się zmieniła."""
+        now = time.monotonic()
+        if self.is_built and now - self._checked_at < settings.region_index_refresh_seconds:
+            return
+        with self._lock:
+            if self.is_built and time.monotonic() - self._checked_at < settings.region_index_refresh_seconds:
+                return
+            if not self.is_built or crud.get_reference_data_version(db, REGIONS_DATASET) != self.version:
+                self.build(db)
+            else:
+                self._checked_at = time.monotonic()
+
+    def search(self, q: str, region_type: str, limit: int, country_id: Optional[str] = None) -> list:
+        index = self._indexes.get(region_type)
+        q = normalize(q)
+        if index is None or not q:
+            return []
+        return [
+            {"id": index.ids[p], "name": index.names[p], "type": region_type}
+            for p in index.search(q, limit, country_id if region_type == "city" else None)
+        ]
+
+
+region_index = RegionIndex()
@@ -1,39 +1,36 @@
+import hashlib
+import secrets
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 from uuid import UUID
 
-import bcrypt
+from sqlalchemy import (delete, distinct, exists, func, literal, select, text,
+                        tuple_, update)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app import models, schemas
+from app.core.config import settings
+from app.core.passwords import password_hasher
 from app.schemas import AdminLogCreate
 
+# Klucz blokady doradczej (pg_advisory_xact_lock) generowania wypłat
+PAYOUT_GENERATION_LOCK_ID = 4_711_001
+
+# Kanał LISTEN/NOTIFY zdarzeń powiadomień - publikują je triggery na
+# notifications (migracja b7e4c1f9a382), słucha app.core.notification_stream
+NOTIFICATION_CHANNEL = "notification_events"
+
 
 def hash_password(password: str) -> str:
     """Hashuje hasło używając bcrypt."""
-    # Konwertuj hasło na bytes jeśli jest stringiem
-    if isinstance(password, str):
-        password = password.encode('utf-8')
-    
-    # Generuj salt i hashuj hasło
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password, salt)
-    
-    # Zwróć jako string
-    return hashed.decode('utf-8')
+    return password_hasher.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Weryfikuje hasło przeciwko hashowi."""
-    # Konwertuj na bytes jeśli są stringami
-    if isinstance(plain_password, str):
-        plain_password = plain_password.encode('utf-8')
-    if isinstance(hashed_password, str):
-        hashed_password = hashed_password.encode('utf-8')
-    
-    # Zweryfikuj hasło
-    return bcrypt.checkpw(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
 
 # Tworzenie nowego użytkownika
@@ -89,6 +86,53 @@ def get_user_by_email(db: Session, email: str):
         return None
 
 
+def hash_reset_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def create_password_reset_token(db: Session, user: models.User) -> str:
+    """
+    Tworzy token resetowania hasła (poprzednie tokeny użytkownika są usuwane)
+    i zwraca jego jawną postać - w bazie zostaje tylko skrót.
+    """
+    token = secrets.token_urlsafe(32)
+    db.execute(delete(models.PasswordResetToken).where(
+        models.PasswordResetToken.user_id == user.id))
+    db.add(models.PasswordResetToken(
+        user_id=user.id,
+        token_hash=hash_reset_token(token),
+        expires_at=datetime.utcnow() + timedelta(minutes=settings.password_reset_token_expire_minutes),
+    ))
+    db.commit()
+    return token
+
+
+def get_user_by_reset_token(db: Session, token: str) -> Optional[models.User]:
+    """Zwraca użytkownika dla ważnego (niewygasłego) tokenu resetowania hasła."""
+    return (
+        db.query(models.User)
+        .join(models.PasswordResetToken, models.PasswordResetToken.user_id == models.User.id)
+        .filter(
+            models.PasswordResetToken.token_hash == hash_reset_token(token),
+            models.PasswordResetToken.expires_at > datetime.utcnow(),
+        )
+        .first()
+    )
+
+
+def delete_password_reset_tokens(db: Session, user_id: UUID) -> None:
+    db.execute(delete(models.PasswordResetToken).where(
+        models.PasswordResetToken.user_id == user_id))
+
+
+def purge_expired_password_reset_tokens(db: Session) -> int:
+    """Usuwa jednym zapytaniem wszystkie wygasłe tokeny resetowania hasła."""
+    result = db.execute(delete(models.PasswordResetToken).where(
+        models.PasswordResetToken.expires_at <= datetime.utcnow()))
+    db.commit()
+    return result.rowcount
+
+
 def add_admin_log(db: Session, log: schemas.AdminLogCreate):
     db_log = models.AdminLog(**log.dict())
     db.add(db_log)
@@ -163,3 +207,413 @@ def delete_error_log(db: Session, error_id: uuid.UUID):
     db.delete(db_error_log)
     db.commit()
     return db_error_log
+
+
+def upsert_error_issues(db: Session, issues: list[dict]) -> dict:
+    """
+    Dodaje wystąpienia do problemów (error_issues) jednym INSERT ... ON
+    CONFLICT (fingerprint): nowy odcisk tworzy problem, istniejący zwiększa
+    licznik i last_seen_at, a rozwiązany problem otwiera na nowo.
+    ``issues`` to słowniki z kolumnami problemu, gdzie ``occurrences`` to
+    liczba nowych wystąpień. Nie zatwierdza transakcji.
+
+    Zwraca {fingerprint: (issue_id, łączna liczba wystąpień)}.
+    """
+    if not issues:
+        return {}
+    # Stała kolejność blokowania wierszy - równoległe zapisy się nie zakleszczą
+    rows = sorted(({"id": uuid.uuid4(), **issue} for issue in issues), key=lambda row: row["fingerprint"])
+    table = models.ErrorIssue.__table__
+    stmt = insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.fingerprint],
+        set_={
+            "occurrences": table.c.occurrences + stmt.excluded.occurrences,
+            "last_seen_at": func.greatest(table.c.last_seen_at, stmt.excluded.last_seen_at),
+            "resolved": False,
+            "resolved_at": None,
+            "resolved_by": None,
+        },
+    ).returning(table.c.fingerprint, table.c.id, table.c.occurrences)
+    return {fingerprint: (issue_id, occurrences) for fingerprint, issue_id, occurrences in db.execute(stmt)}
+
+
+def update_error_issue(db: Session, issue_id: uuid.UUID, resolved: bool, admin_id: uuid.UUID):
+    """Oznacza problem jako rozwiązany (lub otwiera go ponownie)."""
+    issue = db.query(models.ErrorIssue).filter(models.ErrorIssue.id == issue_id).first()
+    if not issue:
+        return None
+    if resolved and not issue.resolved:
+        issue.resolved_at = datetime.utcnow()
+        issue.resolved_by = admin_id
+    elif not resolved:
+        issue.resolved_at = None
+        issue.resolved_by = None
+    issue.resolved = resolved
+    db.commit()
+    db.refresh(issue)
+    return issue
+
+
+# Wersje danych referencyjnych
+def get_reference_data_version(db: Session, name: str) -> int:
+    """Zwraca wersję zbioru danych referencyjnych (0 jeśli nigdy nie był seedowany)."""
+    version = db.query(models.ReferenceDataVersion.version).filter(
+        models.ReferenceDataVersion.name == name).scalar()
+    return version or 0
+
+
+def bump_reference_data_version(db: Session, name: str) -> int:
+    """Podbija wersję zbioru danych referencyjnych - wywoływane po zmianie danych przez seedy."""
+    table = models.ReferenceDataVersion.__table__
+    stmt = insert(table).values(name=name, version=1, updated_at=datetime.utcnow())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={"version": table.c.version + 1, "updated_at": datetime.utcnow()},
+    ).returning(table.c.version)
+    version = db.execute(stmt).scalar()
+    db.commit()
+    return version
+
+
+# Agregaty finansowania kampanii
+def _counted_investment_filters():
+    """Inwestycje liczone do postępu kampanii: completed ze zatwierdzoną (successful) płatnością."""
+    return (
+        models.Investment.status == 'completed',
+        models.Transaction.status == 'successful',
+    )
+
+
+def approve_investment_payment(db: Session, investment: models.Investment,
+                               status_description: Optional[str] = None):
+    """
+    Zatwierdza płatność inwestycji (transakcja -> successful, inwestycja ->
+    completed) i w tej samej transakcji bazy aktualizuje agregaty kampanii
+    oraz Campaign.current_amount. Przeznaczone dla webhooka Stripe
+    (app/routes/payments.py, poza tym drzewem) - dopóki on jej nie wywołuje,
+    agregaty nie są utrzymywane i GET /campaigns/{id}/stats liczy je na
+    bieżąco (``campaign_funding_stats_maintained``), a current_amount
+    zmienia wyłącznie dotychczasowa ścieżka zatwierdzania w webhooku. Ponowne
+    (także równoległe) wywołanie dla już zatwierdzonej płatności nie zalicza
+    kwoty drugi raz.
+
+    Liczniki kampanii są zwiększane atomowo w SQL (bez odczytu przez ORM),
+    więc równoległe zatwierdzenia nie gubią aktualizacji, a wiersze kampanii
+    są blokowane dopiero na końcu transakcji - tylko do commita.
+    """
+    transaction = investment.transaction
+    if transaction is None:
+        raise ValueError("Inwestycja nie ma powiązanej transakcji")
+    if investment.status == 'completed' and transaction.status == 'successful':
+        return investment
+
+    # Warunkowa zmiana statusu: z równoległych wywołań dla tej samej płatności
+    # tylko jedno ją przejmuje i zalicza kwotę
+    values = {"status": 'successful'}
+    if status_description is not None:
+        values["status_description"] = status_description
+    claimed = db.execute(
+        update(models.Transaction)
+        .where(models.Transaction.id == transaction.id, models.Transaction.status != 'successful')
+        .values(**values)
+    ).rowcount
+    investment.status = 'completed'
+    if not claimed:
+        db.commit()
+        db.refresh(investment)
+        return investment
+
+    # Czy inwestor ma już zaliczoną inwestycję w tej kampanii (poza bieżącą)
+    has_previous = db.query(exists().where(
+        models.Investment.campaign_id == investment.campaign_id,
+        models.Investment.investor_id == investment.investor_id,
+        models.Investment.id != investment.id,
+        models.Investment.transaction_id == models.Transaction.id,
+        *_counted_investment_filters(),
+    )).scalar()
+    db.flush()
+
+    now = datetime.utcnow()
+    new_investor = 0 if has_previous else 1
+    table = models.CampaignFundingStats.__table__
+    stmt = insert(table).values(
+        campaign_id=investment.campaign_id,
+        investor_count=new_investor,
+        investment_count=1,
+        total_invested=investment.amount,
+        updated_at=now,
+    ).on_conflict_do_update(
+        index_elements=[table.c.campaign_id],
+        set_={
+            "investor_count": table.c.investor_count + new_investor,
+            "investment_count": table.c.investment_count + 1,
+            "total_invested": table.c.total_invested + investment.amount,
+            "updated_at": now,
+        },
+    )
+    db.execute(stmt)
+    db.execute(
+        update(models.Campaign)
+        .where(models.Campaign.id == investment.campaign_id)
+        .values(current_amount=func.coalesce(models.Campaign.current_amount, 0) + investment.amount)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    db.refresh(investment)
+    return investment
+
+
+def get_campaign_funding_stats(db: Session, campaign_id: UUID) -> dict:
+    """
+    Agregaty finansowania kampanii: z tabeli campaign_funding_stats, gdy
+    zatwierdzanie płatności ją utrzymuje (``campaign_funding_stats_maintained``),
+    a w przeciwnym razie liczone na bieżąco.
+    """
+    if not settings.campaign_funding_stats_maintained:
+        return compute_campaign_funding_stats(db, campaign_id)
+    stats = db.query(models.CampaignFundingStats).filter(
+        models.CampaignFundingStats.campaign_id == campaign_id).first()
+    if not stats:
+        return {"investor_count": 0, "total_invested": 0.0, "investment_count": 0}
+    return {
+        "investor_count": stats.investor_count,
+        "total_invested": float(stats.total_invested),
+        "investment_count": stats.investment_count,
+    }
+
+
+def compute_campaign_funding_stats(db: Session, campaign_id: UUID) -> dict:
+    """Agregaty finansowania kampanii liczone na bieżąco jednym zapytaniem agregującym."""
+    investor_count, investment_count, total_invested = (
+        db.query(
+            func.count(distinct(models.Investment.investor_id)),
+            func.count(),
+            func.coalesce(func.sum(models.Investment.amount), 0),
+        )
+        .join(models.Transaction, models.Investment.transaction_id == models.Transaction.id)
+        .filter(models.Investment.campaign_id == campaign_id, *_counted_investment_filters())
+        .one()
+    )
+    return {
+        "investor_count": investor_count,
+        "total_invested": float(total_invested),
+        "investment_count": investment_count,
+    }
+
+
+def recompute_campaign_funding_stats(db: Session, campaign_id: Optional[UUID] = None) -> int:
+    """
+    Przelicza agregaty od zera jednym GROUP BY (dla wszystkich kampanii lub
+    jednej) i zeruje agregaty kampanii bez zaliczonych inwestycji.
+    Zwraca liczbę przeliczonych kampanii.
+    """
+    table = models.CampaignFundingStats.__table__
+    now = datetime.utcnow()
+
+    totals = (
+        select(
+            models.Investment.campaign_id,
+            func.count(distinct(models.Investment.investor_id)),
+            func.count(),
+            func.coalesce(func.sum(models.Investment.amount), 0),
+            func.timezone('utc', func.now()),
+        )
+        .join(models.Transaction, models.Investment.transaction_id == models.Transaction.id)
+        .where(models.Investment.campaign_id.isnot(None), *_counted_investment_filters())
+        .group_by(models.Investment.campaign_id)
+    )
+    if campaign_id is not None:
+        totals = totals.where(models.Investment.campaign_id == campaign_id)
+
+    stmt = insert(table).from_select(
+        ["campaign_id", "investor_count", "investment_count", "total_invested", "updated_at"],
+        totals,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.campaign_id],
+        set_={
+            "investor_count": stmt.excluded.investor_count,
+            "investment_count": stmt.excluded.investment_count,
+            "total_invested": stmt.excluded.total_invested,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    recomputed = db.execute(stmt).rowcount
+
+    has_counted = exists().where(
+        models.Investment.campaign_id == table.c.campaign_id,
+        models.Investment.transaction_id == models.Transaction.id,
+        *_counted_investment_filters(),
+    )
+    reset = update(table).where(~has_counted).values(
+        investor_count=0, investment_count=0, total_invested=0, updated_at=now)
+    if campaign_id is not None:
+        reset = reset.where(table.c.campaign_id == campaign_id)
+    db.execute(reset)
+    db.commit()
+    return recomputed
+
+
+def reconcile_campaign_amounts(db: Session, campaign_id: Optional[UUID] = None,
+                               fix: bool = False) -> list:
+    """
+    Porównuje Campaign.current_amount z sumą zaliczonych inwestycji kampanii
+    (jeden GROUP BY). Zwraca rozbieżności; przy ``fix`` ustawia
+    current_amount na sumę inwestycji.
+    """
+    totals = (
+        select(
+            models.Investment.campaign_id,
+            func.sum(models.Investment.amount).label("total"),
+        )
+        .join(models.Transaction, models.Investment.transaction_id == models.Transaction.id)
+        .where(models.Investment.campaign_id.isnot(None), *_counted_investment_filters())
+        .group_by(models.Investment.campaign_id)
+    )
+    if campaign_id is not None:
+        totals = totals.where(models.Investment.campaign_id == campaign_id)
+    totals = totals.subquery()
+
+    current = func.coalesce(models.Campaign.current_amount, 0)
+    expected = func.coalesce(totals.c.total, 0)
+    query = (
+        select(models.Campaign.id, current.label("current_amount"), expected.label("expected_amount"))
+        .outerjoin(totals, totals.c.campaign_id == models.Campaign.id)
+        .where(current != expected)
+    )
+    if campaign_id is not None:
+        query = query.where(models.Campaign.id == campaign_id)
+    mismatches = db.execute(query).all()
+
+    if fix and mismatches:
+        for row in mismatches:
+            # Przyrost o różnicę zamiast nadpisania - nie gubi zatwierdzeń z czasu sprawdzania
+            db.execute(
+                update(models.Campaign)
+                .where(models.Campaign.id == row.id)
+                .values(current_amount=func.coalesce(models.Campaign.current_amount, 0)
+                        + (row.expected_amount - row.current_amount))
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    return [
+        {
+            "campaign_id": str(row.id),
+            "current_amount": float(row.current_amount),
+            "expected_amount": float(row.expected_amount),
+        }
+        for row in mismatches
+    ]
+
+
+# Powiadomienia i licznik nieprzeczytanych
+def unread_notifications_filter():
+    # Taki sam warunek jak w indeksie częściowym ix_notifications_user_id_unread
+    return models.Notification.read.isnot(True)
+
+
+def mark_notifications_read(db: Session, user_id: UUID, ids: Optional[list] = None,
+                            up_to: Optional[tuple] = None) -> int:
+    """
+    Oznacza jako przeczytane powiadomienia użytkownika jednym UPDATE: o
+    podanych ``ids`` albo to na pozycji ``up_to`` ((created_at, id)) i
+    wszystkie starsze - nowsze, których klient jeszcze nie widział, zostają
+    nieprzeczytane. Licznik zmniejsza trigger o liczbę faktycznie
+    zmienionych wierszy, więc równoległe wywołania nie zdejmą go podwójnie.
+    Zwraca tę liczbę.
+    """
+    stmt = update(models.Notification).where(
+        models.Notification.user_id == user_id, unread_notifications_filter())
+    if ids is not None:
+        stmt = stmt.where(models.Notification.id.in_(ids))
+    if up_to is not None:
+        stmt = stmt.where(tuple_(models.Notification.created_at, models.Notification.id) <= tuple_(*up_to))
+    marked = db.execute(
+        stmt.values(read=True).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return marked
+
+
+def get_unread_notification_count(db: Session, user_id: UUID) -> int:
+    return db.query(models.NotificationCounter.unread_count).filter(
+        models.NotificationCounter.user_id == user_id).scalar() or 0
+
+
+def recompute_notification_counters(db: Session) -> int:
+    """
+    Naprawa liczników nieprzeczytanych - przelicza je od zera jednym
+    GROUP BY i zeruje liczniki użytkowników bez nieprzeczytanych powiadomień.
+    Zwraca liczbę przeliczonych użytkowników.
+    """
+    table = models.NotificationCounter.__table__
+    now = datetime.utcnow()
+    counts = (
+        select(models.Notification.user_id, func.count(), literal(now))
+        .where(models.Notification.user_id.isnot(None), unread_notifications_filter())
+        .group_by(models.Notification.user_id)
+    )
+    stmt = insert(table).from_select(["user_id", "unread_count", "updated_at"], counts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={"unread_count": stmt.excluded.unread_count, "updated_at": stmt.excluded.updated_at},
+    )
+    recomputed = db.execute(stmt).rowcount
+
+    has_unread = exists().where(
+        models.Notification.user_id == table.c.user_id, unread_notifications_filter())
+    db.execute(update(table).where(~has_unread, table.c.unread_count != 0)
+               .values(unread_count=0, updated_at=now))
+    db.commit()
+    return recomputed
+
+
+def generate_campaign_payouts(db: Session, now: datetime) -> list:
+    """
+    Tworzy jednym zapytaniem (INSERT ... SELECT z anty-złączeniem) payouty dla
+    zakończonych kampanii (status 'successful', deadline < now), które jeszcze
+    nie mają wypłaty. Data wypłaty to 10 dzień miesiąca następującego po
+    deadline, kwota = current_amount (kampanie z zerową kwotą są pomijane).
+
+    Nie zatwierdza transakcji. Zwraca utworzone payouty razem z emailem
+    przedsiębiorcy i tytułem kampanii (do powiadomień).
+    """
+    # Równoległe wywołania czekają na siebie, więc nie utworzą podwójnych wypłat
+    db.execute(select(func.pg_advisory_xact_lock(PAYOUT_GENERATION_LOCK_ID)))
+
+    campaigns = models.Campaign.__table__
+    payouts = models.Payout.__table__
+    users = models.User.__table__
+
+    has_payout = exists().where(payouts.c.campaign_id == campaigns.c.id)
+    source = select(
+        func.gen_random_uuid(),
+        campaigns.c.id,
+        campaigns.c.entrepreneur_id,
+        campaigns.c.current_amount,
+        campaigns.c.current_amount,
+        func.date_trunc('month', campaigns.c.deadline) + text("interval '1 month 9 days'"),
+        literal('pending'),
+    ).where(
+        campaigns.c.status == 'successful',
+        campaigns.c.deadline < now,
+        campaigns.c.current_amount > 0,
+        ~has_payout,
+    )
+    inserted = (
+        insert(payouts)
+        .from_select(
+            ['id', 'campaign_id', 'entrepreneur_id', 'total_raised',
+             'payout_amount', 'payout_date', 'status'],
+            source,
+        )
+        .returning(*payouts.c)
+        .cte('inserted_payouts')
+    )
+    return db.execute(
+        select(inserted, users.c.email.label('entrepreneur_email'),
+               campaigns.c.title.label('campaign_title'))
+        .join(campaigns, campaigns.c.id == inserted.c.campaign_id)
+        .outerjoin(users, users.c.id == inserted.c.entrepreneur_id)
+    ).all()
@@ -16,34 +16,84 @@ from app.routes.user import router as user_router
 app = FastAPI()
 
 
+# Event handler dla startu aplikacji
+@app.on_event("startup")
+async def startup_event():
+    """
+    Ustawia rozmiar puli wątków dla synchronicznych endpointów, uruchamia
+    wysyłkę kolejki email, zapis logów błędów i nasłuch zdarzeń powiadomień oraz buduje indeks regionów w pamięci
+    (autouzupełnianie /regions/search) i drzewo miast (/regions/reverse).
+    """
+    from anyio import to_thread
+
+    from app.core.config import settings
+    from app.core.database import SessionLocal
+    from app.core.geo_index import city_locator
+    from app.core.region_index import region_index
+    to_thread.current_default_thread_limiter().total_tokens = settings.sync_threadpool_size
+
+    if settings.email_outbox_enabled:
+        from app.core.email_outbox import email_outbox_sender
+        email_outbox_sender.start()
+
+    from app.core.error_logging import error_log_writer
+    error_log_writer.start()
+
+    if settings.notification_stream_enabled:
+        from app.core.notification_stream import notification_broker
+        notification_broker.start()
+
+    db = SessionLocal()
+    try:
+        region_index.build(db)
+    except Exception as e:
+        # Indeks zostanie zbudowany przy pierwszym wyszukiwaniu
+        db.rollback()
+        print(f"Nie udało się zbudować indeksu regionów przy starcie: {e}")
+    try:
+        city_locator.build(db)
+    except Exception as e:
+        # Drzewo zostanie zbudowane przy pierwszym zapytaniu /regions/reverse
+        print(f"Nie udało się zbudować drzewa miast przy starcie: {e}")
+    finally:
+        db.close()
+
+
 # Event handler dla zamykania aplikacji
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Zamyka SSH tunnel przy zamykaniu aplikacji."""
-    from app.core.database import close_ssh_tunnel
+    """Zatrzymuje wysyłkę emaili i nasłuch zdarzeń powiadomień, zapisuje zbuforowane logi błędów, kończy sesję GUS BIR1, zamyka połączenia silnika asynchronicznego, pulę haszowania haseł i SSH tunnel."""
+    from app.core.database import async_engine, close_ssh_tunnel
+    from app.core.email_outbox import email_outbox_sender
+    from app.core.error_logging import error_log_writer
+    from app.core.gus import gus_client
+    from app.core.notification_stream import notification_broker
+    from app.core.passwords import password_hasher
+    email_outbox_sender.stop()
+    await notification_broker.stop()
+    error_log_writer.stop()
+    gus_client.close()
+    await async_engine.dispose()
+    password_hasher.shutdown()
     close_ssh_tunnel()
 
 
 # Middleware do logowania błędów
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    """Globalny handler błędów - loguje wszystkie błędy do bazy danych."""
-    from app.core.database import get_db
-    from app.core.error_logging import log_error_to_db
-    
-    db = next(get_db())
-    
-    # Pobierz user_id z tokenu jeśli dostępny
+    """
+    Globalny handler błędów - loguje wszystkie błędy do bazy danych.
+    Wpis trafia do bufora zapisywanego w tle (app.core.error_logging), więc
+    handler nie czeka na bazę.
+    """
+    from app.core.error_logging import log_error
+    from app.core.principal_cache import principal_cache
+
+    # Użytkownik z cache principali (bez zapytania do bazy); nieznany -> None
     user_id = None
-    try:
-        from app import utils
-        token = request.headers.get('authorization', '').replace('Bearer ', '')
-        if token:
-            current_user = utils.get_current_user(token=token, db=db)
-            if current_user:
-                user_id = current_user.id
-    except Exception:
-        pass
+    token = request.headers.get('authorization', '').replace('Bearer ', '')
+    if token:
+        user_id = principal_cache.user_id_for(token)
     
     # Określ kod statusu
     status_code = 500
@@ -52,15 +102,14 @@ async def global_exception_handler(request: Request, exc: Exception):
     
     # Zaloguj błąd
     try:
-        log_error_to_db(
-            db=db,
+        log_error(
             error=exc,
             request=request,
             user_id=user_id,
             status_code=status_code
         )
-    except Exception as log_error:
-        print(f"CRITICAL: Nie udało się zalogować błędu: {log_error}")
+    except Exception as e:
+        print(f"CRITICAL: Nie udało się zalogować błędu: {e}")
     
     # Zwróć odpowiedź błędu
     if hasattr(exc, 'status_code') and hasattr(exc, 'detail'):
@@ -82,6 +131,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Kursor paginacji musi być czytelny dla klientów przeglądarkowych
+    expose_headers=["X-Next-Cursor", "X-Total-Count-Estimate", "X-Token-Refresh", "X-Snapshot-Version", "X-Snapshot-Delta"],
 )
 
 app.include_router(auth_routes.router, prefix="/auth", tags=["auth"])
@@ -2,10 +2,11 @@ import uuid
 from datetime import datetime
 
 from app.core.database import Base
-from sqlalchemy import (Boolean, CheckConstraint, Column, DateTime, ForeignKey,
-                        Integer, Numeric, String, Table, Text)
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB, NUMERIC, UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import (BigInteger, Boolean, CheckConstraint, Column, Computed,
+                        DateTime, Float, ForeignKey, Index, Integer, Numeric,
+                        String, Table, Text, text)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, NUMERIC, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
 
 role_permission = Table(
     'role_permission', Base.metadata,
@@ -45,6 +46,28 @@ class User(Base):
     city = relationship('RegionCity', foreign_keys=[city_id])
     company = relationship('Company', uselist=False, back_populates='user', cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Listy admina (keyset po created_at, id) i filtr po prefiksie emaila (LIKE 'abc%')
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+        Index('ix_users_email_pattern', 'email', postgresql_ops={'email': 'text_pattern_ops'}),
+    )
+
+
+class PasswordResetToken(Base):
+    """
+    Token resetowania hasła. W bazie przechowywany jest tylko skrót SHA-256
+    tokenu (unikalny indeks), więc wykorzystanie tokenu to jedno wyszukiwanie
+    po indeksie, a wyciek tabeli nie ujawnia działających tokenów.
+    """
+    __tablename__ = 'password_reset_tokens'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey(
+        'users.id', ondelete='CASCADE'), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 
 class Profile(Base):
     __tablename__ = 'profiles'
@@ -73,6 +96,13 @@ class Category(Base):
     # campaigns = relationship('Campaign', back_populates='category_rel')
 
 
+# Konfiguracja wyszukiwania pełnotekstowego kampanii. Ta sama wartość musi być
+# użyta w wyrażeniu kolumny search_vector i w to_tsquery przy wyszukiwaniu.
+# 'simple' nie wymaga słowników - po instalacji słownika polskiego (ispell)
+# można przełączyć na 'polish' nową migracją.
+CAMPAIGN_SEARCH_CONFIG = 'simple'
+
+
 class Campaign(Base):
     __tablename__ = 'campaigns'
 
@@ -91,6 +121,13 @@ class Campaign(Base):
     status = Column(String, CheckConstraint(
         "status IN ('draft', 'active', 'successful', 'failed')"), default='draft')
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Utrzymywany przez bazę (kolumna generowana) wektor do wyszukiwania w feedzie
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        f"setweight(to_tsvector('{CAMPAIGN_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{CAMPAIGN_SEARCH_CONFIG}', coalesce(category, '')), 'B') || "
+        f"setweight(to_tsvector('{CAMPAIGN_SEARCH_CONFIG}', coalesce(description, '')), 'C')",
+        persisted=True,
+    )))
 
     entrepreneur = relationship('User', back_populates='campaigns')
     # category_rel = relationship('Category', back_populates='campaigns')
@@ -104,6 +141,15 @@ class Campaign(Base):
                                  cascade="all, delete-orphan", order_by='CampaignRewardTier.min_percentage')
     city = relationship('RegionCity', foreign_keys=[city_id])
 
+    __table_args__ = (
+        # Paginacja keyset listy kampanii (GET /campaigns/)
+        Index('ix_campaigns_created_at_id', 'created_at', 'id'),
+        Index('ix_campaigns_deadline_id', 'deadline', 'id'),
+        Index('ix_campaigns_search_vector', 'search_vector', postgresql_using='gin'),
+        # Kampanie w pobliżu (złączenie z miastami w prostokącie ograniczającym)
+        Index('ix_campaigns_city_id_status', 'city_id', 'status'),
+    )
+
 
 class Transaction(Base):
     __tablename__ = 'transactions'
@@ -123,6 +169,11 @@ class Transaction(Base):
     investment = relationship('Investment', back_populates='transaction', uselist=False)
     payout = relationship('Payout', back_populates='transaction', uselist=False)
 
+    __table_args__ = (
+        # Lista transakcji admina (keyset po created_at, id)
+        Index('ix_transactions_created_at_id', 'created_at', 'id'),
+    )
+
 
 class Investment(Base):
     __tablename__ = 'investments'
@@ -143,6 +194,33 @@ class Investment(Base):
     campaign = relationship('Campaign', back_populates='investments')
     transaction = relationship('Transaction', back_populates='investment')
 
+    __table_args__ = (
+        Index('ix_investments_campaign_id_investor_id', 'campaign_id', 'investor_id'),
+        # Historia inwestycji użytkownika (keyset po created_at DESC, id DESC)
+        Index('ix_investments_investor_id_created_at_id', 'investor_id', 'created_at', 'id'),
+        # Lista inwestycji admina
+        Index('ix_investments_created_at_id', 'created_at', 'id'),
+    )
+
+
+class CampaignFundingStats(Base):
+    """
+    Agregaty finansowania kampanii (tylko zatwierdzone płatności).
+    Aktualizowane przyrostowo w transakcji zatwierdzającej płatność
+    (crud.approve_investment_payment), naprawiane przez
+    crud.recompute_campaign_funding_stats. Odczytywane tylko przy
+    ``campaign_funding_stats_maintained`` - zob. crud.get_campaign_funding_stats.
+    """
+    __tablename__ = 'campaign_funding_stats'
+
+    campaign_id = Column(UUID(as_uuid=True), ForeignKey(
+        'campaigns.id', ondelete='CASCADE'), primary_key=True)
+    investor_count = Column(Integer, nullable=False, default=0)
+    investment_count = Column(Integer, nullable=False, default=0)
+    total_invested = Column(Numeric(14, 2), nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
 
 class Payout(Base):
     __tablename__ = 'payouts'
@@ -157,6 +235,11 @@ class Payout(Base):
     payout_date = Column(DateTime)
     status = Column(String, CheckConstraint(
         "status IN ('pending', 'paid', 'failed')"), default='pending')
+
+    __table_args__ = (
+        # Anty-złączenie "kampania bez wypłaty" w generowaniu wypłat
+        Index('ix_payouts_campaign_id', 'campaign_id'),
+    )
     
     entrepreneur = relationship('User', back_populates='payouts')
     campaign = relationship('Campaign', back_populates='payouts')
@@ -174,9 +257,57 @@ class Notification(Base):
     read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Skrzynka użytkownika (keyset po created_at DESC, id DESC), także tylko nieprzeczytane
+        Index('ix_notifications_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('ix_notifications_user_id_unread', 'user_id', 'created_at', 'id',
+              postgresql_where=text('read IS NOT true')),
+    )
+
     user = relationship('User', back_populates='notifications')
 
 
+class NotificationCounter(Base):
+    """
+    Liczba nieprzeczytanych powiadomień użytkownika (odczyt licznika na
+    ikonce to jeden wiersz). Aktualizowana przez triggery na notifications
+    (INSERT/UPDATE/DELETE, migracja d2f6b8a4c157) w transakcji zmieniającej
+    powiadomienia - niezależnie od tego, który kod je zapisuje. Naprawiana
+    przez crud.recompute_notification_counters.
+    """
+    __tablename__ = 'notification_counters'
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey(
+        'users.id', ondelete='CASCADE'), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class EmailOutbox(Base):
+    """
+    Kolejka wiadomości email. Endpointy tylko dodają wiersze, a wysyłką
+    (z ponowieniami) zajmuje się wątek app.core.email_outbox.
+    """
+    __tablename__ = 'email_outbox'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    to_email = Column(Text, nullable=False)
+    subject = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, CheckConstraint(
+        "status IN ('pending', 'sent', 'failed')"), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        # Pobieranie wiadomości do wysłania (status = 'pending' AND next_attempt_at <= teraz)
+        Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+
 class AdminLog(Base):
     __tablename__ = 'admin_logs'
 
@@ -189,6 +320,36 @@ class AdminLog(Base):
     admin = relationship('User', back_populates='admin_logs')
 
 
+class ErrorIssue(Base):
+    """
+    Zgrupowane błędy o tym samym odcisku (typ + znormalizowany komunikat +
+    najbliższe ramki stosu). Pełne wystąpienia (ErrorLog) są zapisywane tylko
+    jako próbka.
+    """
+    __tablename__ = 'error_issues'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    fingerprint = Column(String(64), nullable=False, unique=True)  # sha256 hex
+    error_type = Column(String(100), nullable=False)
+    title = Column(Text, nullable=False)  # Znormalizowany komunikat (bez liczb, id, napisów)
+    endpoint = Column(Text)  # Endpoint pierwszego wystąpienia
+    method = Column(String(10))
+    status_code = Column(Integer)
+    occurrences = Column(BigInteger, nullable=False, default=0)
+    first_seen_at = Column(DateTime, nullable=False)
+    last_seen_at = Column(DateTime, nullable=False)
+    resolved = Column(Boolean, nullable=False, default=False)  # Ponowne wystąpienie otwiera problem na nowo
+    resolved_at = Column(DateTime, nullable=True)
+    resolved_by = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=True)
+
+    __table_args__ = (
+        # Lista problemów admina (keyset po last_seen_at, id)
+        Index('ix_error_issues_last_seen_at_id', 'last_seen_at', 'id'),
+    )
+
+    resolver = relationship('User', foreign_keys=[resolved_by])
+
+
 class ErrorLog(Base):
     __tablename__ = 'error_logs'
 
@@ -206,9 +367,17 @@ class ErrorLog(Base):
     resolved_at = Column(DateTime, nullable=True)
     resolved_by = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=True)  # Admin który rozwiązał
     created_at = Column(DateTime, default=datetime.utcnow)
+    fingerprint = Column(String(64), nullable=True)
+    issue_id = Column(UUID(as_uuid=True), ForeignKey('error_issues.id', ondelete='CASCADE'), nullable=True)
+
+    __table_args__ = (
+        # Próbka wystąpień problemu (keyset po created_at, id)
+        Index('ix_error_logs_issue_id_created_at_id', 'issue_id', 'created_at', 'id'),
+    )
 
     user = relationship('User', foreign_keys=[user_id])
     resolver = relationship('User', foreign_keys=[resolved_by])
+    issue = relationship('ErrorIssue')
 
 
 class Follow(Base):
@@ -230,7 +399,7 @@ class CampaignImage(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     campaign_id = Column(UUID(as_uuid=True), ForeignKey(
-        'campaigns.id', ondelete='CASCADE'), nullable=False)
+        'campaigns.id', ondelete='CASCADE'), nullable=False, index=True)
     image_url = Column(Text, nullable=False)  # URL do zdjęcia (może być lokalny lub zewnętrzny)
     order_index = Column(Integer, default=0)  # Kolejność wyświetlania
     alt_text = Column(Text)  # Tekst alternatywny dla dostępności
@@ -244,7 +413,7 @@ class CampaignRewardTier(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     campaign_id = Column(UUID(as_uuid=True), ForeignKey(
-        'campaigns.id', ondelete='CASCADE'), nullable=False)
+        'campaigns.id', ondelete='CASCADE'), nullable=False, index=True)
     title = Column(Text, nullable=False)  # Nazwa widełki (np. "Wsparcie podstawowe")
     description = Column(Text, nullable=False)  # Opis co inwestor otrzyma
     min_percentage = Column(Numeric(5, 2), nullable=False)  # Minimalny % celu (np. 0.5 = 0.5%)
@@ -284,6 +453,10 @@ class RegionState(Base):
     country = relationship('RegionCountry')
 
 
+# Tekstowa współrzędna jako double precision (NULL, jeśli nie jest liczbą)
+COORDINATE_SQL = "CASE WHEN {column} ~ '^ *-?[0-9]+([.][0-9]+)? *$' THEN {column}::double precision END"
+
+
 class RegionCity(Base):
     __tablename__ = 'region_cities'
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -293,6 +466,9 @@ class RegionCity(Base):
     alternatenames = Column(Text)
     latitude = Column(String)
     longitude = Column(String)
+    # Liczbowe współrzędne utrzymywane przez bazę (kolumny generowane z pól tekstowych)
+    lat = Column(Float, Computed(COORDINATE_SQL.format(column="latitude"), persisted=True))
+    lon = Column(Float, Computed(COORDINATE_SQL.format(column="longitude"), persisted=True))
     feature_class = Column(String)
     feature_code = Column(String)
     country_id = Column(UUID(as_uuid=True), ForeignKey(
@@ -311,6 +487,29 @@ class RegionCity(Base):
     state = relationship('RegionState')
     country = relationship('RegionCountry')
 
+    __table_args__ = (
+        # Wyszukiwanie w promieniu: prostokąt ograniczający po (lat, lon)
+        Index('ix_region_cities_lat_lon', 'lat', 'lon'),
+    )
+
+
+class ReferenceDataVersion(Base):
+    """Wersja zbioru danych referencyjnych (np. regionów) - podbijana przez skrypty seedujące."""
+    __tablename__ = 'reference_data_versions'
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow,
+                        onupdate=datetime.utcnow)
+
+
+class GusCompanyCache(Base):
+    """Wynik zapytania GUS BIR1 o firmę po NIP (data = None: brak firmy o tym NIP)."""
+    __tablename__ = 'gus_company_cache'
+    nip = Column(String(10), primary_key=True)
+    data = Column(JSONB, nullable=True)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
 
 class Company(Base):
     __tablename__ = 'companies'
@@ -1,12 +1,45 @@
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
-from app import models, schemas, utils
-from app.core.database import get_db
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from app import crud, models, schemas, utils
+from app.core.database import async_engine, engine, get_db
+from app.core.pagination import (estimate_count, paginate, set_next_cursor,
+                                 set_total_estimate)
+from app.core.email_outbox import email_outbox_sender
+from app.core.error_logging import error_log_writer
+from app.core.notification_stream import notification_broker
+from app.core.passwords import password_hasher
+from app.core.pool_metrics import async_pool_metrics, sync_pool_metrics
+from app.routes.campaign import load_campaigns_categories
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, selectinload
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+# Dozwolone klucze sortowania list admina - każdy ma indeks (kolumna, id):
+# nazwa -> (kolumna, konwerter wartości kursora)
+USER_SORT_KEYS = {
+    "created_at": (models.User.created_at, datetime.fromisoformat),
+    "email": (models.User.email, str),
+}
+CAMPAIGN_SORT_KEYS = {
+    "created_at": (models.Campaign.created_at, datetime.fromisoformat),
+    "deadline": (models.Campaign.deadline, datetime.fromisoformat),
+}
+INVESTMENT_SORT_KEYS = {
+    "created_at": (models.Investment.created_at, datetime.fromisoformat),
+}
+TRANSACTION_SORT_KEYS = {
+    "created_at": (models.Transaction.created_at, datetime.fromisoformat),
+}
+ERROR_ISSUE_SORT_KEYS = {
+    "last_seen_at": (models.ErrorIssue.last_seen_at, datetime.fromisoformat),
+}
+ERROR_OCCURRENCE_SORT_KEYS = {
+    "created_at": (models.ErrorLog.created_at, datetime.fromisoformat),
+}
+
 
 def admin_required(current_user: models.User = Depends(utils.get_current_user)):
     if current_user.role.name != "admin":
@@ -14,33 +47,299 @@ def admin_required(current_user: models.User = Depends(utils.get_current_user)):
     return current_user
 
 
+def apply_date_range(query, column, date_from: Optional[datetime], date_to: Optional[datetime]):
+    if date_from:
+        query = query.filter(column >= date_from)
+    if date_to:
+        query = query.filter(column < date_to)
+    return query
+
+
+def admin_page(db: Session, response: Response, query, id_column, sort_keys: dict,
+               sort: str, order: str, cursor: Optional[str], limit: Optional[int],
+               table_name: str, filtered: bool):
+    """Strona listy admina: keyset po (kolumna sortowania, id) + przybliżona liczba wszystkich wierszy."""
+    if sort not in sort_keys:
+        raise HTTPException(status_code=400, detail=f"Nieobsługiwany klucz sortowania: {sort}")
+    sort_column, converter = sort_keys[sort]
+    set_total_estimate(response, estimate_count(db, query, table_name, filtered))
+    rows, next_cursor = paginate(
+        query,
+        columns=(sort_column, id_column),
+        cursor=cursor,
+        limit=limit,
+        key=lambda row: (getattr(row, sort_column.key), row.id),
+        descending=order == "desc",
+        converters=(converter, UUID),
+    )
+    set_next_cursor(response, next_cursor)
+    return rows
+
+
 @router.get("/users", response_model=list[schemas.UserOut])
-async def list_users(db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+def list_users(
+    response: Response,
+    role: Optional[str] = Query(default=None, description="Nazwa roli"),
+    email_prefix: Optional[str] = Query(default=None, min_length=1, description="Początek adresu email"),
+    is_verified: Optional[bool] = Query(default=None),
+    date_from: Optional[datetime] = Query(default=None, description="Utworzeni od (włącznie)"),
+    date_to: Optional[datetime] = Query(default=None, description="Utworzeni do (wyłącznie)"),
+    sort: str = Query(default="created_at"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
     """
-    Zwraca listę wszystkich użytkowników (tylko admin).
+    Zwraca stronę użytkowników (tylko admin).
     """
-    return db.query(models.User).all()
+    query = db.query(models.User)
+    if role:
+        query = query.join(models.Role).filter(models.Role.name == role)
+    if email_prefix:
+        escaped = email_prefix.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+        query = query.filter(models.User.email.like(f"{escaped}%", escape="!"))
+    if is_verified is not None:
+        query = query.filter(models.User.is_verified == is_verified)
+    query = apply_date_range(query, models.User.created_at, date_from, date_to)
+    filtered = any(v is not None for v in (role, email_prefix, is_verified, date_from, date_to))
+    return admin_page(db, response, query, models.User.id, USER_SORT_KEYS, sort, order,
+                      cursor, limit, "users", filtered)
 
 
 @router.get("/campaigns", response_model=list[schemas.CampaignOut])
-async def list_campaigns(db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+def list_campaigns(
+    response: Response,
+    status: Optional[str] = Query(default=None, pattern="^(draft|active|successful|failed)$"),
+    date_from: Optional[datetime] = Query(default=None, description="Utworzone od (włącznie)"),
+    date_to: Optional[datetime] = Query(default=None, description="Utworzone do (wyłącznie)"),
+    sort: str = Query(default="created_at"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
     """
-    Zwraca listę wszystkich kampanii (tylko admin).
+    Zwraca stronę kampanii (tylko admin).
     """
-    return db.query(models.Campaign).all()
+    query = db.query(models.Campaign).options(
+        selectinload(models.Campaign.images),
+        selectinload(models.Campaign.reward_tiers),
+    )
+    if status:
+        query = query.filter(models.Campaign.status == status)
+    query = apply_date_range(query, models.Campaign.created_at, date_from, date_to)
+    filtered = any(v is not None for v in (status, date_from, date_to))
+    campaigns = admin_page(db, response, query, models.Campaign.id, CAMPAIGN_SORT_KEYS, sort,
+                           order, cursor, limit, "campaigns", filtered)
+    load_campaigns_categories(campaigns, db)
+    return campaigns
 
 
 @router.get("/investments", response_model=list[schemas.InvestmentOut])
-async def list_investments(db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+def list_investments(
+    response: Response,
+    status: Optional[schemas.InvestmentStatusEnum] = Query(default=None),
+    date_from: Optional[datetime] = Query(default=None, description="Utworzone od (włącznie)"),
+    date_to: Optional[datetime] = Query(default=None, description="Utworzone do (wyłącznie)"),
+    sort: str = Query(default="created_at"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Zwraca stronę inwestycji (tylko admin).
+    """
+    query = db.query(models.Investment)
+    if status:
+        query = query.filter(models.Investment.status == status.value)
+    query = apply_date_range(query, models.Investment.created_at, date_from, date_to)
+    filtered = any(v is not None for v in (status, date_from, date_to))
+    return admin_page(db, response, query, models.Investment.id, INVESTMENT_SORT_KEYS, sort,
+                      order, cursor, limit, "investments", filtered)
+
+
+@router.get("/transactions", response_model=list[schemas.TransactionList])
+def list_transactions(
+    response: Response,
+    status: Optional[schemas.TransactionStatusEnum] = Query(default=None),
+    type: Optional[schemas.TransactionTypeEnum] = Query(default=None),
+    date_from: Optional[datetime] = Query(default=None, description="Utworzone od (włącznie)"),
+    date_to: Optional[datetime] = Query(default=None, description="Utworzone do (wyłącznie)"),
+    sort: str = Query(default="created_at"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Zwraca stronę transakcji (tylko admin).
+    """
+    query = db.query(
+        models.Transaction.id,
+        models.Transaction.currency,
+        models.Transaction.amount,
+        models.Transaction.fee,
+        models.Transaction.type,
+        models.Transaction.status,
+        models.Transaction.stripe_transaction_id,
+        models.Transaction.status_description,
+        models.Transaction.created_at,
+        models.Investment.id.label("investment_id"),
+    ).outerjoin(models.Investment, models.Investment.transaction_id == models.Transaction.id)
+    if status:
+        query = query.filter(models.Transaction.status == status.value)
+    if type:
+        query = query.filter(models.Transaction.type == type.value)
+    query = apply_date_range(query, models.Transaction.created_at, date_from, date_to)
+    filtered = any(v is not None for v in (status, type, date_from, date_to))
+    rows = admin_page(db, response, query, models.Transaction.id, TRANSACTION_SORT_KEYS, sort,
+                      order, cursor, limit, "transactions", filtered)
+
+    return [
+        {
+            "id": str(row.id),
+            "currency": row.currency,
+            "amount": float(row.amount),
+            "fee": float(row.fee or 0),
+            "type": row.type,
+            "status": row.status,
+            "stripe_transaction_id": row.stripe_transaction_id,
+            "status_description": row.status_description,
+            "created_at": row.created_at,
+            "investment_id": row.investment_id,
+        }
+        for row in rows
+    ]
+
+
+@router.get("/error-issues", response_model=list[schemas.ErrorIssueOut])
+def list_error_issues(
+    response: Response,
+    resolved: Optional[bool] = Query(default=None),
+    error_type: Optional[str] = Query(default=None),
+    date_from: Optional[datetime] = Query(default=None, description="Ostatnie wystąpienie od (włącznie)"),
+    date_to: Optional[datetime] = Query(default=None, description="Ostatnie wystąpienie do (wyłącznie)"),
+    sort: str = Query(default="last_seen_at"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Zwraca stronę problemów (błędy zgrupowane po odcisku) z licznikami wystąpień (tylko admin).
+    """
+    query = db.query(models.ErrorIssue)
+    if resolved is not None:
+        query = query.filter(models.ErrorIssue.resolved == resolved)
+    if error_type:
+        query = query.filter(models.ErrorIssue.error_type == error_type)
+    query = apply_date_range(query, models.ErrorIssue.last_seen_at, date_from, date_to)
+    filtered = any(v is not None for v in (resolved, error_type, date_from, date_to))
+    return admin_page(db, response, query, models.ErrorIssue.id, ERROR_ISSUE_SORT_KEYS, sort,
+                      order, cursor, limit, "error_issues", filtered)
+
+
+@router.get("/error-issues/{issue_id}/occurrences", response_model=list[schemas.ErrorLogOut])
+def list_error_issue_occurrences(
+    issue_id: UUID,
+    response: Response,
+    sort: str = Query(default="created_at"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Zwraca stronę zapisanych (próbkowanych) wystąpień problemu ze szczegółami (tylko admin).
+    """
+    query = db.query(models.ErrorLog).filter(models.ErrorLog.issue_id == issue_id)
+    return admin_page(db, response, query, models.ErrorLog.id, ERROR_OCCURRENCE_SORT_KEYS, sort,
+                      order, cursor, limit, "error_logs", True)
+
+
+@router.patch("/error-issues/{issue_id}", response_model=schemas.ErrorIssueOut)
+def update_error_issue(
+    issue_id: UUID,
+    issue_update: schemas.ErrorIssueUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Oznacza problem jako rozwiązany lub otwiera go ponownie (tylko admin).
+    Kolejne wystąpienie rozwiązanego problemu otwiera go automatycznie.
+    """
+    issue = crud.update_error_issue(db, issue_id, issue_update.resolved, current_user.id)
+    if not issue:
+        raise HTTPException(status_code=404, detail="Error issue not found")
+    return issue
+
+
+@router.get("/db-pool")
+def db_pool_stats(
+    reset: bool = Query(default=False, description="Wyzeruj liczniki po odczycie"),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Telemetria pul połączeń (tylko admin): wypożyczone połączenia, overflow,
+    czas oczekiwania i histogram czasu pobrania połączenia z puli.
+    """
+    stats = {
+        "sync": sync_pool_metrics.snapshot(engine.pool),
+        "async": async_pool_metrics.snapshot(async_engine.sync_engine.pool),
+    }
+    if reset:
+        sync_pool_metrics.reset()
+        async_pool_metrics.reset()
+    return stats
+
+
+@router.get("/password-hashing")
+def password_hashing_stats(current_user: models.User = Depends(admin_required)):
+    """
+    Telemetria puli haszowania haseł (tylko admin): zadania w toku,
+    głębokość kolejki, odrzucenia i średnie czasy oczekiwania/liczenia.
+    """
+    return password_hasher.metrics.snapshot()
+
+
+@router.get("/email-outbox")
+def email_outbox_stats(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Stan kolejki email (tylko admin): liczba wiadomości wg statusu oraz
+    liczniki wysyłki tego procesu (wysłane, ponawiane, nieudane, średni czas).
+    """
+    return {
+        "queue": email_outbox_sender.queue_stats(db),
+        "delivery": email_outbox_sender.metrics.snapshot(),
+    }
+
+
+@router.get("/error-log-writer")
+def error_log_writer_stats(current_user: models.User = Depends(admin_required)):
     """
-    Zwraca listę wszystkich inwestycji (tylko admin).
+    Stan bufora logów błędów tego procesu (tylko admin): liczba wpisów
+    czekających na zapis, przyjętych, pominiętych przez próbkowanie,
+    zapisanych i utraconych przez błąd zapisu.
     """
-    return db.query(models.Investment).all()
+    return error_log_writer.snapshot()
 
 
-@router.get("/transactions", response_model=list[schemas.TransactionOut])
-async def list_transactions(db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+@router.get("/notification-stream")
+def notification_stream_stats(current_user: models.User = Depends(admin_required)):
     """
-    Zwraca listę wszystkich transakcji (tylko admin).
+    Stan strumienia powiadomień tego procesu (tylko admin): połączenie LISTEN,
+    liczba otwartych strumieni, odebrane zdarzenia, doręczone powiadomienia
+    i przepełnienia kolejek wolnych klientów.
     """
-    return db.query(models.Transaction).all()
+    return notification_broker.snapshot()
@@ -1,5 +1,4 @@
 import random
-import secrets
 import string
 from datetime import datetime, timedelta, timezone
 
@@ -11,16 +10,17 @@ from sqlalchemy.orm import Session
 from app import crud, models, schemas, utils
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.passwords import needs_rehash
 from app.core.email import send_email
 
 router = APIRouter()
 
 
-def send_verification_email(email: str, verification_code: str):
+def send_verification_email(email: str, verification_code: str, db: Session = None):
     subject = f'Weryfikacja konta w {settings.app_name}'
     message = f'Kod weryfikacyjny: {verification_code}'
 
-    send_email(subject=subject, body=message, to_email=email)
+    send_email(subject=subject, body=message, to_email=email, db=db)
 
 
 def generate_verification_code(length: int = 6):
@@ -28,7 +28,7 @@ def generate_verification_code(length: int = 6):
 
 
 @router.post("/register", response_model=schemas.UserOut)
-async def register_user(
+def register_user(
     email: str = Form(default=None),
     password: str = Form(default=None),
     role: str = Form(default=None),
@@ -89,8 +89,9 @@ async def register_user(
         db.refresh(company)
         
         try:
-            send_verification_email(new_user.email, verification_code)
+            send_verification_email(new_user.email, verification_code, db)
         except Exception as e:
+            db.rollback()
             db.delete(new_user)
             db.commit()
             raise HTTPException(
@@ -109,8 +110,9 @@ async def register_user(
         new_user = crud.create_user(db, user=schemas.UserCreate(
             email=email, password=password, role=role), verification_code=verification_code)
         try:
-            send_verification_email(new_user.email, verification_code)
+            send_verification_email(new_user.email, verification_code, db)
         except Exception as e:
+            db.rollback()
             db.delete(new_user)
             db.commit()
             raise HTTPException(
@@ -119,7 +121,7 @@ async def register_user(
 
 
 @router.get("/resend-verification-code")
-async def resend_verification_code(email: str, db: Session = Depends(get_db)):
+def resend_verification_code(email: str, db: Session = Depends(get_db)):
     user = crud.get_user_by_email(db, email=email)
 
     if not user:
@@ -133,7 +135,7 @@ async def resend_verification_code(email: str, db: Session = Depends(get_db)):
     crud.update_user(db, user=user)
 
     try:
-        send_verification_email(user.email, verification_code)
+        send_verification_email(user.email, verification_code, db)
         # crud.add_log(db, log=schemas.LogCreate(
         #     user_id=user.id,
         #     action=f"Resent verification code: {verification_code} to {user.email}",
@@ -147,7 +149,7 @@ async def resend_verification_code(email: str, db: Session = Depends(get_db)):
 
 
 @router.post("/login")
-async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     db_user = db.query(models.User).filter(
         models.User.email == form_data.username).first()
     if not db_user or not utils.verify_password(form_data.password, db_user.password_hash):
@@ -160,6 +162,11 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Sessi
             detail=f"Account not verified. Please verify your account at {db_user.email}"
         )
     
+    # Hash o innym koszcie niż bcrypt_rounds - przelicz go, skoro znamy hasło
+    if needs_rehash(db_user.password_hash):
+        db_user.password_hash = utils.get_password_hash(form_data.password)
+        db.commit()
+    
     access_token = utils.create_access_token(data={"sub": db_user.email, "role_id": db_user.role_id})
     
     # Zwróć token wraz z role_id
@@ -171,7 +178,7 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Sessi
 
 
 @router.post("/delete-user")
-async def delete_user(email: str, db: Session = Depends(get_db)):
+def delete_user(email: str, db: Session = Depends(get_db)):
     user = crud.get_user_by_email(db, email=email)
 
     if not user:
@@ -184,7 +191,7 @@ async def delete_user(email: str, db: Session = Depends(get_db)):
 
 
 @router.delete("/me")
-async def delete_my_account(
+def delete_my_account(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user)
 ):
@@ -208,7 +215,7 @@ async def delete_my_account(
 
 
 @router.put("/change-password")
-async def change_password(
+def change_password(
     password_data: schemas.PasswordChange,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user)
@@ -252,7 +259,7 @@ async def change_password(
 
 
 @router.post("/refresh")
-async def refresh_token(current_token: str = Depends(utils.oauth2_scheme), db: Session = Depends(get_db)):
+def refresh_token(current_token: str = Depends(utils.oauth2_scheme), db: Session = Depends(get_db)):
     """
     Endpoint do odświeżania tokena JWT (jeśli jest jeszcze ważny).
     """
@@ -260,7 +267,7 @@ async def refresh_token(current_token: str = Depends(utils.oauth2_scheme), db: S
 
 
 @router.get("/profile", response_model=schemas.ProfileOut)
-async def get_profile(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+def get_profile(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
     """
     Zwraca profil aktualnie zalogowanego użytkownika.
     """
@@ -284,7 +291,7 @@ async def get_profile(db: Session = Depends(get_db), current_user: models.User =
 
 
 @router.put("/profile", response_model=schemas.ProfileOut)
-async def update_profile(
+def update_profile(
     profile_update: schemas.ProfileCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user)
@@ -316,7 +323,7 @@ async def update_profile(
 
 
 @router.post("/verify")
-async def verify_user(data: dict, db: Session = Depends(get_db)):
+def verify_user(data: dict, db: Session = Depends(get_db)):
     email = data.get("email")
     code = data.get("code")
     user = crud.get_user_by_email(db, email=email)
@@ -334,7 +341,7 @@ async def verify_user(data: dict, db: Session = Depends(get_db)):
 
 
 @router.get("/permissions", response_model=list[schemas.PermissionOut])
-async def get_user_permissions(current_user: models.User = Depends(utils.get_current_user), db: Session = Depends(get_db)):
+def get_user_permissions(current_user: models.User = Depends(utils.get_current_user), db: Session = Depends(get_db)):
     role = db.query(models.Role).filter(
         models.Role.id == current_user.role_id).first()
     if not role:
@@ -343,7 +350,7 @@ async def get_user_permissions(current_user: models.User = Depends(utils.get_cur
 
 
 @router.get("/me", response_model=schemas.UserOut)
-async def get_current_user_info(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+def get_current_user_info(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
     """
     Zwraca informacje o aktualnie zalogowanym użytkowniku.
     """
@@ -368,7 +375,7 @@ async def get_current_user_info(db: Session = Depends(get_db), current_user: mod
 
 
 @router.get("/settings", response_model=schemas.UserSettingsOut)
-async def get_user_settings(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+def get_user_settings(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
     """
     Zwraca pełne informacje o użytkowniku dla ekranu Ustawień.
     Zawiera dane użytkownika, profil, dane firmy (dla przedsiębiorców) i informacje o regionie.
@@ -411,7 +418,7 @@ async def get_user_settings(db: Session = Depends(get_db), current_user: models.
 
 
 @router.put("/settings/user", response_model=schemas.UserOut)
-async def update_user_settings(
+def update_user_settings(
     user_update: schemas.UserUpdate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user)
@@ -441,7 +448,7 @@ async def update_user_settings(
 
 
 @router.put("/settings/company", response_model=schemas.CompanyOut)
-async def update_company_settings(
+def update_company_settings(
     company_update: schemas.CompanyUpdate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user)
@@ -487,23 +494,23 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 
-def send_reset_password_email(email: str, reset_token: str):
-    """Wysyła email z linkiem do resetowania hasła."""
+def send_reset_password_email(email: str, reset_token: str, db: Session = None):
+    """Kolejkuje email z linkiem do resetowania hasła."""
     reset_link = f"{settings.frontend_url}/reset-password?token={reset_token}"
     subject = f'Resetowanie hasła w {settings.app_name}'
     message = f"""
     Kliknij w poniższy link, aby zresetować hasło:
     {reset_link}
     
-    Link jest ważny przez 1 godzinę.
+    Link jest ważny przez {settings.password_reset_token_expire_minutes} minut.
     
     Jeśli nie prosiłeś o reset hasła, zignoruj ten email.
     """
-    send_email(subject=subject, body=message, to_email=email)
+    send_email(subject=subject, body=message, to_email=email, db=db)
 
 
 @router.post("/forgot-password")
-async def forgot_password(
+def forgot_password(
     request: ForgotPasswordRequest,
     db: Session = Depends(get_db)
 ):
@@ -514,21 +521,15 @@ async def forgot_password(
     user = crud.get_user_by_email(db, email=request.email)
     
     if user:
-        # Wygeneruj bezpieczny token
-        reset_token = secrets.token_urlsafe(32)
-        expires_at = datetime.utcnow() + timedelta(hours=1)
-        
-        # Zapisz token w bazie danych
-        # Używamy pola verification_code jako tymczasowego miejsca na token resetujący
-        # Zapisujemy token i czas wygaśnięcia w verification_code (format: token|expires_at)
-        user.verification_code = f"{reset_token}|{expires_at.isoformat()}"
-        db.commit()
+        # Token trafia do bazy jedynie jako skrót (tabela password_reset_tokens)
+        reset_token = crud.create_password_reset_token(db, user)
         
         try:
-            send_reset_password_email(user.email, reset_token)
+            send_reset_password_email(user.email, reset_token, db)
         except Exception as e:
-            # Jeśli nie udało się wysłać emaila, wyczyść token
-            user.verification_code = None
+            # Jeśli nie udało się zakolejkować emaila, usuń token
+            db.rollback()
+            crud.delete_password_reset_tokens(db, user.id)
             db.commit()
             # Nie ujawniaj błędu użytkownikowi
             pass
@@ -540,7 +541,7 @@ async def forgot_password(
 
 
 @router.post("/reset-password")
-async def reset_password(
+def reset_password(
     request: ResetPasswordRequest,
     db: Session = Depends(get_db)
 ):
@@ -554,33 +555,8 @@ async def reset_password(
             detail="Hasło musi mieć co najmniej 8 znaków"
         )
     
-    # Znajdź użytkownika z tym tokenem
-    users = db.query(models.User).all()
-    user_with_token = None
-    
-    for user in users:
-        if user.verification_code:
-            # Sprawdź format: token|expires_at
-            parts = user.verification_code.split('|')
-            if len(parts) == 2:
-                token, expires_at_str = parts
-                if token == request.token:
-                    try:
-                        expires_at = datetime.fromisoformat(expires_at_str.replace('Z', '+00:00'))
-                        if expires_at.tzinfo is None:
-                            expires_at = expires_at.replace(tzinfo=timezone.utc)
-                        
-                        # Sprawdź czy token nie wygasł
-                        if datetime.now(timezone.utc) < expires_at:
-                            user_with_token = user
-                            break
-                        else:
-                            # Token wygasł, wyczyść go
-                            user.verification_code = None
-                            db.commit()
-                    except (ValueError, AttributeError):
-                        # Nieprawidłowy format, kontynuuj
-                        continue
+    # Znajdź użytkownika z tym tokenem (wyszukiwanie po skrócie tokenu)
+    user_with_token = crud.get_user_by_reset_token(db, request.token)
     
     if not user_with_token:
         raise HTTPException(
@@ -596,7 +572,8 @@ async def reset_password(
     
     # Zaktualizuj hasło użytkownika
     user_with_token.password_hash = hashed_password
-    user_with_token.verification_code = None  # Wyczyść token po użyciu
+    # Wyczyść tokeny użytkownika po użyciu
+    crud.delete_password_reset_tokens(db, user_with_token.id)
     
     db.commit()
     
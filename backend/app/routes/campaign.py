@@ -1,16 +1,33 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
-from sqlalchemy import func
-from sqlalchemy.orm import Session
-
-from app import models, schemas, utils
-from app.core.database import get_db
+from fastapi import (APIRouter, Body, Depends, HTTPException, Query, Request,
+                     Response)
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import delete, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app import crud, models, schemas, utils
+from app.core.config import settings
+from app.core import geo
+from app.core.database import SessionLocal, get_async_db, get_db
+from app.core.pagination import clamp_limit, paginate_async, set_next_cursor
+from app.core.reference_data import (CATEGORIES_DATASET, ReferenceDataset,
+                                     snapshot_response)
+from app.core.region_index import REGIONS_DATASET
 
 router = APIRouter(prefix="/campaigns", tags=["campaigns"])
 
+# Maksymalna liczba słów frazy wyszukiwania przekazywanych do to_tsquery
+MAX_SEARCH_TERMS = 8
+
 
 def load_campaign_category(campaign: models.Campaign, db: Session):
     """
@@ -18,31 +35,58 @@ def load_campaign_category(campaign: models.Campaign, db: Session):
     Since category_id/category_rel relationship is commented out in the model,
     we manually load the Category object and set it as an attribute.
     """
-    if campaign.category:
-        # Find Category by name
-        category = (
-            db.query(models.Category)
-            .filter(models.Category.name == campaign.category)
-            .first()
-        )
-        if category:
-            # Manually set the category_rel attribute
-            campaign.category_rel = category
-        else:
-            campaign.category_rel = None
-    else:
-        campaign.category_rel = None
+    load_campaigns_categories([campaign], db)
+
+
+def load_campaigns_categories(campaigns: list[models.Campaign], db: Session):
+    """
+    Ustawia category_rel dla wielu kampanii naraz - jedno zapytanie
+    o wszystkie potrzebne kategorie zamiast jednego na kampanię.
+    """
+    names = {campaign.category for campaign in campaigns if campaign.category}
+    categories = {}
+    if names:
+        categories = {
+            category.name: category
+            for category in db.query(models.Category)
+            .filter(models.Category.name.in_(names))
+            .all()
+        }
+    for campaign in campaigns:
+        campaign.category_rel = categories.get(campaign.category)
+
+
+async def load_campaigns_categories_async(campaigns: list[models.Campaign], db: AsyncSession):
+    await db.run_sync(lambda session: load_campaigns_categories(campaigns, session))
+
+
+def campaigns_with_relations():
+    """select() kampanii ze zdjęciami i widełkami nagród (bez leniwego ładowania w AsyncSession)."""
+    return select(models.Campaign).options(
+        selectinload(models.Campaign.images),
+        selectinload(models.Campaign.reward_tiers),
+    )
+
+
+async def get_campaign_with_relations(db: AsyncSession, campaign_id) -> Optional[models.Campaign]:
+    result = await db.execute(
+        campaigns_with_relations()
+        .where(models.Campaign.id == campaign_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
 
 
 @router.post("/", response_model=schemas.CampaignOut)
 async def create_campaign(
     campaign: schemas.CampaignCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Tworzy nową kampanię crowdfundingową z możliwością dodania zdjęć i widełek nagród.
-    Region powinien być ID miasta (UUID) - zostanie przekonwertowany na nazwę miasta.
+    Region powinien być ID miasta (UUID) - zostanie przekonwertowany na nazwę miasta,
+    a kampania powiązana z miastem (city_id).
     """
     campaign_data = campaign.dict(exclude={"images", "reward_tiers"})
 
@@ -55,13 +99,11 @@ async def create_campaign(
 
             city_uuid = uuid_lib.UUID(region_value)
             # Znajdź miasto po ID
-            city = (
-                db.query(models.RegionCity)
-                .filter(models.RegionCity.id == city_uuid)
-                .first()
-            )
+            city = await db.get(models.RegionCity, city_uuid)
             if city:
                 campaign_data["region"] = city.name
+                # Relacja z miastem - po niej szuka /campaigns/nearby
+                campaign_data["city_id"] = campaign_data.get("city_id") or city.id
         except (ValueError, TypeError):
             # Jeśli nie jest UUID, użyj jako tekst (kompatybilność wsteczna)
             pass
@@ -72,9 +114,7 @@ async def create_campaign(
 
     if category_id:
         # Sprawdź czy kategoria istnieje
-        category = (
-            db.query(models.Category).filter(models.Category.id == category_id).first()
-        )
+        category = await db.get(models.Category, category_id)
         if not category:
             raise HTTPException(
                 status_code=400, detail="Kategoria nie została znaleziona"
@@ -83,11 +123,9 @@ async def create_campaign(
         campaign_data["category"] = category.name
     elif category_text:
         # Jeśli podano tekst kategorii, użyj go bezpośrednio
-        category = (
-            db.query(models.Category)
-            .filter(models.Category.name == category_text)
-            .first()
-        )
+        category = (await db.execute(
+            select(models.Category).where(models.Category.name == category_text)
+        )).scalars().first()
         if category:
             campaign_data["category"] = category.name
         else:
@@ -96,7 +134,7 @@ async def create_campaign(
 
     db_campaign = models.Campaign(**campaign_data, entrepreneur_id=current_user.id)
     db.add(db_campaign)
-    db.flush()  # Flush żeby dostać ID kampanii
+    await db.flush()  # Flush żeby dostać ID kampanii
 
     # Dodaj zdjęcia jeśli są
     if campaign.images:
@@ -128,11 +166,11 @@ async def create_campaign(
             )
             db.add(db_tier)
 
-    db.commit()
-    db.refresh(db_campaign)
+    await db.commit()
 
-    # Załaduj kategorię
-    load_campaign_category(db_campaign, db)
+    # Załaduj zdjęcia, widełki i kategorię
+    db_campaign = await get_campaign_with_relations(db, db_campaign.id)
+    await load_campaigns_categories_async([db_campaign], db)
 
     # Konwertuj UUID na stringi
     db_campaign.id = str(db_campaign.id)
@@ -142,25 +180,43 @@ async def create_campaign(
 
 
 @router.get("/", response_model=list[schemas.CampaignOut])
-async def list_campaigns(db: Session = Depends(get_db)):
+async def list_campaigns(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    limit: Optional[int] = Query(default=None, ge=1, description="Rozmiar strony"),
+    cursor: Optional[str] = Query(
+        default=None, description="Kursor z nagłówka X-Next-Cursor poprzedniej strony"
+    ),
+):
     """
-    Zwraca listę wszystkich kampanii.
+    Zwraca stronę kampanii posortowanych po (created_at, id).
+    Kursor kolejnej strony jest zwracany w nagłówku X-Next-Cursor.
     """
-    campaigns = db.query(models.Campaign).all()
+    campaigns, next_cursor = await paginate_async(
+        db,
+        campaigns_with_relations(),
+        columns=(models.Campaign.created_at, models.Campaign.id),
+        cursor=cursor,
+        limit=limit,
+        key=lambda c: (c.created_at, c.id),
+        scalars=True,
+    )
+    set_next_cursor(response, next_cursor)
 
-    # Konwertuj UUID na stringi i załaduj kategorie
+    await load_campaigns_categories_async(campaigns, db)
+
+    # Konwertuj UUID na stringi
     for campaign in campaigns:
         campaign.id = str(campaign.id)
         campaign.entrepreneur_id = str(campaign.entrepreneur_id)
-        load_campaign_category(campaign, db)
 
     return campaigns
 
 
 @router.get("/my", response_model=list[schemas.CampaignOut])
 async def my_campaigns(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Zwraca kampanie zalogowanego przedsiębiorcy.
@@ -170,61 +226,92 @@ async def my_campaigns(
             status_code=403, detail="Tylko przedsiębiorca może mieć własne kampanie."
         )
 
-    campaigns = (
-        db.query(models.Campaign)
-        .filter(models.Campaign.entrepreneur_id == current_user.id)
-        .all()
-    )
+    campaigns = (await db.execute(
+        campaigns_with_relations().where(models.Campaign.entrepreneur_id == current_user.id)
+    )).scalars().all()
+    await load_campaigns_categories_async(campaigns, db)
 
-    # Konwertuj UUID na stringi i załaduj relacje
+    # Konwertuj UUID na stringi
     for campaign in campaigns:
         campaign.id = str(campaign.id)
         campaign.entrepreneur_id = str(campaign.entrepreneur_id)
-        # Załaduj zdjęcia, widełki i kategorię
-        _ = campaign.images
-        _ = campaign.reward_tiers
-        load_campaign_category(campaign, db)
 
     return campaigns
 
 
+def build_search_tsquery(q: str) -> Optional[str]:
+    """
+    Zamienia frazę użytkownika na zapytanie to_tsquery z dopasowaniem
+    prefiksowym każdego słowa ("kaw war" -> "kaw:* & war:*"), co obsługuje
+    autouzupełnianie w trakcie pisania. Zwraca None, gdy fraza nie zawiera słów.
+    """
+    terms = re.findall(r"\w+", q.lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+
 @router.get("/feed", response_model=list[schemas.CampaignOut])
 async def campaigns_feed(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
     q: Optional[str] = Query(
         default=None, description="Fraza do wyszukiwania w kampaniach"
     ),
     region: Optional[str] = Query(default=None, description="Region kampanii"),
+    limit: Optional[int] = Query(default=None, ge=1, description="Maksymalna liczba wyników"),
 ):
     """
-    Zwraca kampanie globalnie: jeśli jest fraza q, filtruje po tytule, opisie, kategorii; jeśli nie ma frazy, zwraca 5 najnowszych kampanii. Można filtrować po regionie.
+    Zwraca kampanie globalnie: jeśli jest fraza q, wyszukuje pełnotekstowo po tytule, kategorii i opisie
+    (wyniki sortowane po trafności ważonej świeżością); jeśli nie ma frazy, zwraca 5 najnowszych kampanii.
+    Można filtrować po regionie.
     """
     try:
-        query = db.query(models.Campaign)
-        if q:
-            q_like = f"%{q.lower()}%"
-            query = query.filter(
-                func.lower(models.Campaign.title).like(q_like)
-                | func.lower(models.Campaign.description).like(q_like)
-                | func.lower(models.Campaign.category).like(q_like)
-            )
+        query = campaigns_with_relations()
         if region:
             query = query.filter(func.lower(models.Campaign.region) == region.lower())
-        campaigns = query.order_by(models.Campaign.created_at.desc())
-        if not q and not region:
-            campaigns = campaigns.limit(5)
 
-        result = campaigns.all()
+        tsquery_text = build_search_tsquery(q) if q else None
+        if q and tsquery_text is None:
+            return []
 
-        # Konwertuj UUID na stringi i załaduj relacje
+        if tsquery_text:
+            ts_query = func.to_tsquery(
+                literal_column(f"'{models.CAMPAIGN_SEARCH_CONFIG}'::regconfig"),
+                tsquery_text,
+            )
+            age_days = (
+                func.extract(
+                    "epoch",
+                    func.timezone("utc", func.now()) - models.Campaign.created_at,
+                )
+                / 86400
+            )
+            recency = func.power(
+                0.5, age_days / settings.search_recency_half_life_days
+            )
+            score = func.ts_rank_cd(models.Campaign.search_vector, ts_query) * (
+                1 + recency
+            )
+            campaigns = (
+                query.filter(models.Campaign.search_vector.op("@@")(ts_query))
+                .order_by(score.desc(), models.Campaign.created_at.desc())
+                .limit(clamp_limit(limit))
+            )
+        else:
+            campaigns = query.order_by(models.Campaign.created_at.desc())
+            if not region:
+                campaigns = campaigns.limit(5)
+            elif limit:
+                campaigns = campaigns.limit(clamp_limit(limit))
+
+        result = (await db.execute(campaigns)).scalars().all()
+        await load_campaigns_categories_async(result, db)
+
+        # Konwertuj UUID na stringi
         for campaign in result:
             campaign.id = str(campaign.id)
             campaign.entrepreneur_id = str(campaign.entrepreneur_id)
-            # Załaduj zdjęcia, widełki i kategorię
-            _ = campaign.images
-            _ = campaign.reward_tiers
-            load_campaign_category(campaign, db)
 
         return result
     except Exception as e:
@@ -234,67 +321,188 @@ async def campaigns_feed(
         )
 
 
+@router.get("/nearby", response_model=list[schemas.CampaignNearbyOut])
+async def campaigns_nearby(
+    lat: float = Query(..., ge=-90, le=90, description="Szerokość geograficzna (stopnie)"),
+    lon: float = Query(..., ge=-180, le=180, description="Długość geograficzna (stopnie)"),
+    radius_km: float = Query(default=25, gt=0, description="Promień wyszukiwania (km)"),
+    limit: Optional[int] = Query(default=None, ge=1, description="Maksymalna liczba wyników"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Zwraca aktywne kampanie z miast w promieniu ``radius_km`` od punktu,
+    posortowane od najbliższej. Promień jest ograniczony do
+    ``nearby_max_radius_km``, a liczba wyników do rozmiaru strony.
+    """
+    radius_km = min(radius_km, settings.nearby_max_radius_km)
+    lat_min, lat_max, lon_ranges = geo.bounding_box(lat, lon, radius_km)
+    city = models.RegionCity
+    distance = geo.haversine_km(lat, lon, city.lat, city.lon).label("distance_km")
+
+    query = (
+        campaigns_with_relations()
+        .add_columns(distance)
+        .join(city, city.id == models.Campaign.city_id)
+        .where(
+            models.Campaign.status == "active",
+            city.lat.between(lat_min, lat_max),
+            or_(*(city.lon.between(lon_min, lon_max) for lon_min, lon_max in lon_ranges)),
+            distance <= radius_km,
+        )
+        .order_by(distance, models.Campaign.id)
+        .limit(clamp_limit(limit))
+    )
+    rows = (await db.execute(query)).all()
+    campaigns = [campaign for campaign, _ in rows]
+    await load_campaigns_categories_async(campaigns, db)
+
+    for campaign, distance_km in rows:
+        campaign.distance_km = round(distance_km, 3)
+        # Konwertuj UUID na stringi
+        campaign.id = str(campaign.id)
+        campaign.entrepreneur_id = str(campaign.entrepreneur_id)
+
+    return campaigns
+
+
+CAMPAIGN_REGIONS = [
+    "Zduńska Wola",
+    "Powiat Skierniewicki",
+    "Województwo Małopolskie",
+    "Warszawa",
+    "Kraków",
+    "Województwo Mazowieckie",
+    "Województwo Śląskie",
+    "Powiat Łódzki Wschodni",
+    "Poznań",
+    "Gdańsk",
+    "Wrocław",
+    "Inny region",
+]
+
+
+def load_categories_snapshot(db: Session) -> dict:
+    rows = db.query(
+        models.Category.id,
+        models.Category.name,
+        models.Category.description,
+        models.Category.icon,
+        models.Category.created_at,
+    ).order_by(models.Category.name).all()
+    return {
+        "categories": [
+            {
+                "name": row.name,
+                "description": row.description,
+                "icon": row.icon,
+                "id": str(row.id),
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+            }
+            for row in rows
+        ]
+    }
+
+
+def load_all_regions_snapshot(db: Session) -> dict:
+    """Wiersze w formacie schematów RegionCountry/RegionState/RegionCity, bez obiektów ORM i Pydantic."""
+    countries = db.query(models.RegionCountry.id, models.RegionCountry.name).order_by(
+        models.RegionCountry.id).all()
+    states = db.query(
+        models.RegionState.id, models.RegionState.name, models.RegionState.country_id
+    ).order_by(models.RegionState.id).all()
+    cities = db.query(
+        models.RegionCity.id,
+        models.RegionCity.name,
+        models.RegionCity.state_id,
+        models.RegionCity.country_id,
+    ).order_by(models.RegionCity.id).all()
+    return {
+        "countries": [
+            {"id": str(c.id), "name": c.name, "code": None} for c in countries
+        ],
+        "states": [
+            {"id": str(s.id), "name": s.name, "code": None, "country_id": str(s.country_id)}
+            for s in states
+        ],
+        "cities": [
+            {
+                "id": str(c.id),
+                "name": c.name,
+                "state_id": str(c.state_id) if c.state_id else None,
+                "country_id": str(c.country_id),
+            }
+            for c in cities
+        ],
+    }
+
+
+categories_snapshot = ReferenceDataset(
+    "categories",
+    loader=load_categories_snapshot,
+    render=lambda sections: sections["categories"],
+    version_key=CATEGORIES_DATASET,
+)
+campaign_regions_snapshot = ReferenceDataset(
+    "campaign_regions",
+    loader=lambda db: {},
+    render=lambda sections: CAMPAIGN_REGIONS,
+)
+all_regions_snapshot = ReferenceDataset(
+    "all_regions",
+    loader=load_all_regions_snapshot,
+    render=lambda sections: sections,
+    version_key=REGIONS_DATASET,
+)
+
+
 @router.get("/categories", response_model=list[schemas.CategoryOut])
-async def get_campaign_categories(db: Session = Depends(get_db)):
+def get_campaign_categories(
+    request: Request,
+    since_version: Optional[int] = Query(
+        default=None, description="Wersja snapshotu posiadana przez klienta (tryb delta)"
+    ),
+    db: Session = Depends(get_db),
+):
     """
-    Zwraca listę dostępnych kategorii kampanii z bazy danych.
+    Zwraca listę dostępnych kategorii kampanii (snapshot z pamięci, ETag + Cache-Control).
     """
-    categories = db.query(models.Category).order_by(models.Category.name).all()
-    return categories
+    return snapshot_response(request, categories_snapshot, db, since_version)
 
 
 @router.get("/regions", response_class=JSONResponse)
-async def get_campaign_regions():
+def get_campaign_regions(request: Request, db: Session = Depends(get_db)):
     """
     Zwraca listę dostępnych regionów kampanii (przykładowe miasta, powiaty, województwa).
     """
-    regions = [
-        "Zduńska Wola",
-        "Powiat Skierniewicki",
-        "Województwo Małopolskie",
-        "Warszawa",
-        "Kraków",
-        "Województwo Mazowieckie",
-        "Województwo Śląskie",
-        "Powiat Łódzki Wschodni",
-        "Poznań",
-        "Gdańsk",
-        "Wrocław",
-        "Inny region",
-    ]
-    return regions
+    return snapshot_response(request, campaign_regions_snapshot, db)
 
 
 @router.get("/all-regions", response_model=dict)
-async def get_all_regions(db: Session = Depends(get_db)):
+def get_all_regions(
+    request: Request,
+    since_version: Optional[int] = Query(
+        default=None, description="Wersja snapshotu posiadana przez klienta (tryb delta)"
+    ),
+    db: Session = Depends(get_db),
+):
     """
     Zwraca wszystkie regiony: kraje, stany/województwa, miasta.
+    Z parametrem since_version zwraca tylko zmiany od tej wersji (jeśli jest dostępna).
     """
-    countries = db.query(models.RegionCountry).all()
-    states = db.query(models.RegionState).all()
-    cities = db.query(models.RegionCity).all()
-    return {
-        "countries": [schemas.RegionCountry.from_orm(c) for c in countries],
-        "states": [schemas.RegionState.from_orm(s) for s in states],
-        "cities": [schemas.RegionCity.from_orm(c) for c in cities],
-    }
+    return snapshot_response(request, all_regions_snapshot, db, since_version)
 
 
 @router.get("/{campaign_id}", response_model=schemas.CampaignOut)
-async def get_campaign(campaign_id: UUID, db: Session = Depends(get_db)):
+async def get_campaign(campaign_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """
     Zwraca szczegóły kampanii po ID z zdjęciami i widełkami nagród.
     """
-    campaign = (
-        db.query(models.Campaign).filter(models.Campaign.id == campaign_id).first()
-    )
+    campaign = await get_campaign_with_relations(db, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    # Załaduj zdjęcia, widełki i kategorię
-    _ = campaign.images
-    _ = campaign.reward_tiers
-    load_campaign_category(campaign, db)
+    # Załaduj kategorię
+    await load_campaigns_categories_async([campaign], db)
 
     # Konwertuj UUID na stringi
     campaign.id = str(campaign.id)
@@ -307,16 +515,14 @@ async def get_campaign(campaign_id: UUID, db: Session = Depends(get_db)):
 async def update_campaign(
     campaign_id: UUID,
     campaign_update: schemas.CampaignCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Aktualizuje kampanię (tylko właściciel lub admin).
     Obsługuje aktualizację zdjęć i widełek nagród.
     """
-    campaign = (
-        db.query(models.Campaign).filter(models.Campaign.id == campaign_id).first()
-    )
+    campaign = await db.get(models.Campaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     if campaign.entrepreneur_id != current_user.id and not getattr(
@@ -333,13 +539,10 @@ async def update_campaign(
             import uuid as uuid_lib
 
             city_uuid = uuid_lib.UUID(region_value)
-            city = (
-                db.query(models.RegionCity)
-                .filter(models.RegionCity.id == city_uuid)
-                .first()
-            )
+            city = await db.get(models.RegionCity, city_uuid)
             if city:
                 campaign_data["region"] = city.name
+                campaign_data["city_id"] = campaign_data.get("city_id") or city.id
         except (ValueError, TypeError):
             pass
 
@@ -348,9 +551,7 @@ async def update_campaign(
     category_text = campaign_data.pop("category", None)
 
     if category_id:
-        category = (
-            db.query(models.Category).filter(models.Category.id == category_id).first()
-        )
+        category = await db.get(models.Category, category_id)
         if not category:
             raise HTTPException(
                 status_code=400, detail="Kategoria nie została znaleziona"
@@ -358,11 +559,9 @@ async def update_campaign(
         # Używamy tylko nazwy kategorii, ponieważ model Campaign ma tylko pole 'category' jako Text
         campaign_data["category"] = category.name
     elif category_text:
-        category = (
-            db.query(models.Category)
-            .filter(models.Category.name == category_text)
-            .first()
-        )
+        category = (await db.execute(
+            select(models.Category).where(models.Category.name == category_text)
+        )).scalars().first()
         if category:
             campaign_data["category"] = category.name
         else:
@@ -373,12 +572,12 @@ async def update_campaign(
         setattr(campaign, field, value)
 
     # Usuń stare zdjęcia i widełki
-    db.query(models.CampaignImage).filter(
+    await db.execute(delete(models.CampaignImage).where(
         models.CampaignImage.campaign_id == campaign_id
-    ).delete()
-    db.query(models.CampaignRewardTier).filter(
+    ))
+    await db.execute(delete(models.CampaignRewardTier).where(
         models.CampaignRewardTier.campaign_id == campaign_id
-    ).delete()
+    ))
 
     # Dodaj nowe zdjęcia jeśli są
     if campaign_update.images:
@@ -410,13 +609,11 @@ async def update_campaign(
             )
             db.add(db_tier)
 
-    db.commit()
-    db.refresh(campaign)
+    await db.commit()
 
     # Załaduj relacje
-    _ = campaign.images
-    _ = campaign.reward_tiers
-    load_campaign_category(campaign, db)
+    campaign = await get_campaign_with_relations(db, campaign_id)
+    await load_campaigns_categories_async([campaign], db)
 
     # Konwertuj UUID na stringi
     campaign.id = str(campaign.id)
@@ -428,16 +625,14 @@ async def update_campaign(
 @router.delete("/{campaign_id}")
 async def delete_campaign(
     campaign_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Usuwa kampanię (tylko właściciel lub admin).
     Można usunąć tylko kampanie ze statusem 'draft'.
     """
-    campaign = (
-        db.query(models.Campaign).filter(models.Campaign.id == campaign_id).first()
-    )
+    campaign = await db.get(models.Campaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     if campaign.entrepreneur_id != current_user.id and not getattr(
@@ -452,8 +647,8 @@ async def delete_campaign(
             detail="Można usunąć tylko kampanie ze statusem 'szkic'. Opublikowane kampanie nie mogą być usunięte.",
         )
 
-    db.delete(campaign)
-    db.commit()
+    await db.delete(campaign)
+    await db.commit()
     return {"message": "Campaign deleted successfully"}
 
 
@@ -464,15 +659,13 @@ async def update_campaign_status(
         embed=True,
         description="Nowy status kampanii ('draft', 'active', 'successful', 'failed')",
     ),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Pozwala właścicielowi kampanii (lub adminowi) zmienić status kampanii.
     """
-    campaign = (
-        db.query(models.Campaign).filter(models.Campaign.id == campaign_id).first()
-    )
+    campaign = await db.get(models.Campaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     if campaign.entrepreneur_id != current_user.id and not getattr(
@@ -482,9 +675,8 @@ async def update_campaign_status(
     if status not in ["draft", "active", "successful", "failed"]:
         raise HTTPException(status_code=400, detail="Invalid status")
     campaign.status = status
-    db.commit()
-    db.refresh(campaign)
-    return campaign
+    await db.commit()
+    return await get_campaign_with_relations(db, campaign_id)
 
 
 @router.get("/{campaign_id}/stats")
@@ -493,15 +685,13 @@ async def get_campaign_stats(
     investments_status: Optional[schemas.InvestmentStatusEnum] = Query(
         None, description="Filter by investments status"
     ),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Zwraca statystyki kampanii (liczba inwestorów, łączna kwota).
     """
-    campaign = (
-        db.query(models.Campaign).filter(models.Campaign.id == campaign_id).first()
-    )
+    campaign = await db.get(models.Campaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
@@ -511,42 +701,74 @@ async def get_campaign_stats(
     ):
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Zawsze liczymy tylko approved płatności (successful transactions)
-    # Pending płatności nie liczą się do postępu kampanii
-    filters = [
-        models.Investment.campaign_id == campaign_id,
-        models.Transaction.status == "successful",  # Tylko approved płatności
-        models.Investment.status == "completed",
-    ]
-
-    # Jeśli podano investments_status, dodaj dodatkowy filtr
-    # Ale nadal wymagamy successful transaction
-    if investments_status:
-        filters.append(models.Investment.status == investments_status.value)
-
-    investments = (
-        db.query(models.Investment).join(models.Transaction).filter(*filters).all()
+    # Agregaty obejmują tylko completed inwestycje z approved płatnościami
+    # (successful transactions) - pending płatności nie liczą się do postępu kampanii.
+    # Filtr investments_status innego niż completed nie może więc niczego zwrócić.
+    if investments_status and investments_status != schemas.InvestmentStatusEnum.COMPLETED:
+        return {"investor_count": 0, "total_invested": 0.0, "investment_count": 0}
+
+    return await db.run_sync(crud.get_campaign_funding_stats, campaign_id)
+
+
+# Kolumny sortowania listy inwestorów: (kolumna, konwerter wartości kursora)
+INVESTOR_SORT_KEYS = {
+    "created_at": (models.Investment.created_at, datetime.fromisoformat),
+    "amount": (models.Investment.amount, Decimal),
+}
+INVESTOR_EXPORT_FIELDS = ["id", "email", "amount", "status", "created_at"]
+INVESTOR_EXPORT_BATCH_SIZE = 1000
+
+
+def campaign_investors_query(campaign_id: UUID):
+    """
+    Inwestorzy kampanii jednym zapytaniem (JOIN users) - tylko completed
+    inwestycje z approved płatnościami; pending nie liczą się.
+    """
+    return (
+        select(
+            models.Investment.id.label("investment_id"),
+            models.User.id.label("user_id"),
+            models.User.email,
+            models.Investment.amount,
+            models.Investment.status,
+            models.Investment.created_at,
+        )
+        .join(models.User, models.User.id == models.Investment.investor_id)
+        .join(models.Transaction, models.Transaction.id == models.Investment.transaction_id)
+        .filter(
+            models.Investment.campaign_id == campaign_id,
+            models.Investment.status == "completed",
+            models.Transaction.status == "successful",
+        )
     )
 
+
+def investor_row(row) -> dict:
     return {
-        "investor_count": len(set(inv.investor_id for inv in investments)),
-        "total_invested": sum(float(inv.amount) for inv in investments),
-        "investment_count": len(investments),
+        "id": str(row.user_id),
+        "email": row.email,
+        "amount": float(row.amount),
+        "status": row.status,
+        "created_at": row.created_at,
     }
 
 
 @router.get("/{campaign_id}/investors")
 async def get_campaign_investors(
     campaign_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    response: Response,
+    sort: str = Query(default="created_at", pattern="^(created_at|amount)$"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(default=None, ge=1, description="Rozmiar strony"),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
-    Zwraca listę inwestorów w kampanii.
+    Zwraca stronę inwestorów w kampanii, sortowaną po dacie lub kwocie inwestycji.
+    Kursor kolejnej strony jest zwracany w nagłówku X-Next-Cursor.
     """
-    campaign = (
-        db.query(models.Campaign).filter(models.Campaign.id == campaign_id).first()
-    )
+    campaign = await db.get(models.Campaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
@@ -556,47 +778,90 @@ async def get_campaign_investors(
     ):
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Tylko completed inwestycje (approved płatności) - pending nie liczą się
-    investments = (
-        db.query(models.Investment)
-        .join(models.Transaction)
-        .filter(
-            models.Investment.campaign_id == campaign_id,
-            models.Investment.status == "completed",
-            models.Transaction.status == "successful",
-        )
-        .all()
+    sort_column, sort_converter = INVESTOR_SORT_KEYS[sort]
+    rows, next_cursor = await paginate_async(
+        db,
+        campaign_investors_query(campaign_id),
+        columns=(sort_column, models.Investment.id),
+        cursor=cursor,
+        limit=limit,
+        key=lambda row: (getattr(row, sort), row.investment_id),
+        descending=order == "desc",
+        converters=(sort_converter, UUID),
     )
+    set_next_cursor(response, next_cursor)
 
-    result = []
-    for inv in investments:
-        user = db.query(models.User).filter(models.User.id == inv.investor_id).first()
-        if user:
-            result.append(
-                {
-                    "id": str(user.id),
-                    "email": user.email,
-                    "amount": float(inv.amount),
-                    "status": inv.status,
-                    "created_at": inv.created_at,
-                }
-            )
+    return [investor_row(row) for row in rows]
 
-    return result
+
+@router.get("/{campaign_id}/investors/export")
+async def export_campaign_investors(
+    campaign_id: UUID,
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
+):
+    """
+    Eksportuje pełną listę inwestorów kampanii jako CSV lub NDJSON.
+    Wiersze są strumieniowane z kursora po stronie serwera, więc zużycie
+    pamięci nie zależy od liczby inwestorów.
+    """
+    campaign = await db.get(models.Campaign, campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    # Sprawdź uprawnienia - tylko właściciel kampanii lub admin
+    if campaign.entrepreneur_id != current_user.id and not getattr(
+        current_user, "is_admin", False
+    ):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    def stream_rows():
+        # Własna sesja - sesja z zależności może zostać zamknięta przed końcem strumienia
+        export_db = SessionLocal()
+        try:
+            query = export_db.execute(
+                campaign_investors_query(campaign_id)
+                .order_by(models.Investment.created_at, models.Investment.id)
+                .execution_options(yield_per=INVESTOR_EXPORT_BATCH_SIZE)
+            )
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if format == "csv":
+                writer.writerow(INVESTOR_EXPORT_FIELDS)
+            for count, row in enumerate(query, start=1):
+                item = investor_row(row)
+                if format == "csv":
+                    writer.writerow([item[field] for field in INVESTOR_EXPORT_FIELDS])
+                else:
+                    buffer.write(json.dumps(item, default=str, ensure_ascii=False) + "\n")
+                if count % INVESTOR_EXPORT_BATCH_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        finally:
+            export_db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"investors-{campaign_id}.{format}"
+    return StreamingResponse(
+        stream_rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @router.post("/{campaign_id}/close")
 async def close_campaign(
     campaign_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Zamyka kampanię (tylko właściciel lub admin).
     """
-    campaign = (
-        db.query(models.Campaign).filter(models.Campaign.id == campaign_id).first()
-    )
+    campaign = await db.get(models.Campaign, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     if campaign.entrepreneur_id != current_user.id and not getattr(
@@ -605,7 +870,6 @@ async def close_campaign(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     campaign.status = "failed"  # Zamykamy jako nieudaną
-    db.commit()
-    db.refresh(campaign)
+    await db.commit()
     return {"message": "Campaign closed successfully"}
     return {"message": "Campaign closed successfully"}
@@ -1,11 +1,14 @@
+from datetime import datetime
 from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
 from app import models, schemas, utils
-from app.core.database import get_db
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from app.core.database import get_async_db
+from app.core.pagination import paginate_async, set_next_cursor
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/investments", tags=["investments"])
 
@@ -13,17 +16,13 @@ router = APIRouter(prefix="/investments", tags=["investments"])
 @router.post("/", response_model=schemas.InvestmentOut)
 async def create_investment(
     investment: schemas.InvestmentCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Tworzy nową inwestycję w kampanię.
     """
-    campaign = (
-        db.query(models.Campaign)
-        .filter(models.Campaign.id == investment.campaign_id)
-        .first()
-    )
+    campaign = await db.get(models.Campaign, investment.campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     if campaign.status != "active":
@@ -37,8 +36,8 @@ async def create_investment(
     db.add(db_investment)
     # NIE aktualizujemy current_amount tutaj - będzie aktualizowane tylko gdy płatność zostanie approved
     # current_amount jest aktualizowane w webhooku Stripe gdy płatność zostanie zatwierdzona
-    db.commit()
-    db.refresh(db_investment)
+    await db.commit()
+    await db.refresh(db_investment)
 
     # Konwertuj UUID na stringi
     db_investment.id = str(db_investment.id)
@@ -50,17 +49,15 @@ async def create_investment(
 
 @router.get("/", response_model=list[schemas.InvestmentOut])
 async def list_investments(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Zwraca listę inwestycji zalogowanego użytkownika.
     """
-    investments = (
-        db.query(models.Investment)
-        .filter(models.Investment.investor_id == current_user.id)
-        .all()
-    )
+    investments = (await db.execute(
+        select(models.Investment).where(models.Investment.investor_id == current_user.id)
+    )).scalars().all()
 
     # Konwertuj UUID na stringi
     for inv in investments:
@@ -73,8 +70,8 @@ async def list_investments(
 
 @router.get("/stats")
 async def get_investment_stats(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Zwraca statystyki inwestycji użytkownika (liczba i suma).
@@ -84,19 +81,18 @@ async def get_investment_stats(
 
     # Tylko completed inwestycje (approved płatności)
     # JOIN przez transaction_id aby upewnić się że relacja istnieje
-    investments = (
-        db.query(models.Investment)
+    investments = (await db.execute(
+        select(models.Investment)
         .join(
             models.Transaction,
             models.Investment.transaction_id == models.Transaction.id,
         )
-        .filter(
+        .where(
             models.Investment.investor_id == current_user.id,
             models.Investment.status == "completed",
             models.Transaction.status == "successful",
         )
-        .all()
-    )
+    )).scalars().all()
 
     # Zlicz unikalne kampanie (liczba projektów, nie wszystkich inwestycji)
     unique_campaigns = set(inv.campaign_id for inv in investments)
@@ -107,16 +103,14 @@ async def get_investment_stats(
 
 
 @router.get("/campaign/{campaign_id}", response_model=list[schemas.InvestmentOut])
-async def list_campaign_investments(campaign_id: UUID, db: Session = Depends(get_db)):
+async def list_campaign_investments(campaign_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """
     Zwraca listę inwestycji dla danej kampanii.
     Zwraca wszystkie inwestycje (również pending), ale frontend powinien filtrować do wyświetlenia.
     """
-    investments = (
-        db.query(models.Investment)
-        .filter(models.Investment.campaign_id == campaign_id)
-        .all()
-    )
+    investments = (await db.execute(
+        select(models.Investment).where(models.Investment.campaign_id == campaign_id)
+    )).scalars().all()
 
     # Konwertuj UUID na stringi
     for inv in investments:
@@ -129,64 +123,76 @@ async def list_campaign_investments(campaign_id: UUID, db: Session = Depends(get
 
 @router.get("/history", response_model=list[schemas.InvestmentHistoryOut])
 async def investment_history(
+    response: Response,
     limit: Optional[int] = Query(default=None, description="Limit wyników"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    status: Optional[schemas.InvestmentStatusEnum] = Query(default=None, description="Status inwestycji"),
+    date_from: Optional[datetime] = Query(default=None, description="Od daty (włącznie)"),
+    date_to: Optional[datetime] = Query(default=None, description="Do daty (wyłącznie)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
-    print(
-        f"[DEBUG] /investments/history: current_user={getattr(current_user, 'id', None)}, email={getattr(current_user, 'email', None)}"
+    """
+    Zwraca historię inwestycji użytkownika od najnowszych, razem z danymi kampanii.
+    Jedno zapytanie (projekcja z JOIN campaigns); kursor kolejnej strony w nagłówku X-Next-Cursor.
+    """
+    query = (
+        select(
+            models.Investment.id,
+            models.Investment.amount,
+            models.Investment.status,
+            models.Investment.created_at,
+            models.Investment.transaction_id,
+            models.Campaign.id.label("campaign_id"),
+            models.Campaign.title.label("campaign_title"),
+            models.Campaign.status.label("campaign_status"),
+        )
+        .outerjoin(models.Campaign, models.Campaign.id == models.Investment.campaign_id)
+        .filter(models.Investment.investor_id == current_user.id)
     )
-    query = db.query(models.Investment).filter(
-        models.Investment.investor_id == current_user.id
+    if status:
+        query = query.filter(models.Investment.status == status.value)
+    if date_from:
+        query = query.filter(models.Investment.created_at >= date_from)
+    if date_to:
+        query = query.filter(models.Investment.created_at < date_to)
+
+    rows, next_cursor = await paginate_async(
+        db,
+        query,
+        columns=(models.Investment.created_at, models.Investment.id),
+        cursor=cursor,
+        limit=limit,
+        key=lambda row: (row.created_at, row.id),
+        descending=True,
     )
-
-    if limit:
-        query = query.limit(limit)
-
-    investments = query.all()
-    print(f"[DEBUG] /investments/history: investments_count={len(investments)}")
-    result = []
-    for inv in investments:
-        campaign = (
-            db.query(models.Campaign)
-            .filter(models.Campaign.id == inv.campaign_id)
-            .first()
-        )
-        print(
-            f"[DEBUG] /investments/history: inv_id={inv.id}, campaign_id={getattr(campaign, 'id', None)}"
-        )
-        result.append(
-            {
-                "id": inv.id,
-                "amount": float(inv.amount),
-                "status": inv.status,
-                "created_at": inv.created_at,
-                "campaign_id": str(campaign.id) if campaign else None,
-                "campaign_title": campaign.title if campaign else None,
-                "campaign_status": campaign.status if campaign else None,
-                "transaction_id": (
-                    str(inv.transaction_id) if inv.transaction_id else None
-                ),
-            }
-        )
-    print(f"[DEBUG] /investments/history: result_count={len(result)}")
-    return result
+    set_next_cursor(response, next_cursor)
+
+    return [
+        {
+            "id": row.id,
+            "amount": float(row.amount),
+            "status": row.status,
+            "created_at": row.created_at,
+            "campaign_id": row.campaign_id,
+            "campaign_title": row.campaign_title,
+            "campaign_status": row.campaign_status,
+            "transaction_id": row.transaction_id,
+        }
+        for row in rows
+    ]
 
 
 @router.get("/{investment_id}", response_model=schemas.InvestmentOut)
 async def get_investment(
     investment_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
 ):
     """
     Zwraca szczegóły inwestycji (tylko właściciel lub admin).
     """
-    investment = (
-        db.query(models.Investment)
-        .filter(models.Investment.id == investment_id)
-        .first()
-    )
+    investment = await db.get(models.Investment, investment_id)
     if not investment:
         raise HTTPException(status_code=404, detail="Investment not found")
     if investment.investor_id != current_user.id and not current_user.is_admin:
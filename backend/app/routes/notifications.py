@@ -1,28 +1,129 @@
+from typing import Optional
 from uuid import UUID
 
-from app import models, schemas, utils
-from app.core.database import get_db
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from app import crud, models, schemas, utils
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_async_db
+from app.core.notification_stream import event_stream
+from app.core.pagination import (CREATED_AT_ID, decode_cursor, paginate_async,
+                                 set_next_cursor)
+from fastapi import (APIRouter, Depends, Header, HTTPException, Query, Request,
+                     Response)
+from fastapi.responses import StreamingResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from jose import jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 
 @router.get("/", response_model=list[schemas.NotificationOut])
-async def get_notifications(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+async def get_notifications(
+    response: Response,
+    unread_only: bool = Query(default=False, description="Tylko nieprzeczytane"),
+    limit: Optional[int] = Query(default=None, ge=1, description="Rozmiar strony"),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
+):
     """
-    Zwraca powiadomienia użytkownika.
+    Zwraca stronę powiadomień użytkownika od najnowszych.
+    Kursor kolejnej strony jest zwracany w nagłówku X-Next-Cursor.
     """
-    return db.query(models.Notification).filter(models.Notification.user_id == current_user.id).order_by(models.Notification.created_at.desc()).all()
+    query = select(models.Notification).where(models.Notification.user_id == current_user.id)
+    if unread_only:
+        query = query.where(crud.unread_notifications_filter())
+    notifications, next_cursor = await paginate_async(
+        db,
+        query,
+        columns=(models.Notification.created_at, models.Notification.id),
+        cursor=cursor,
+        limit=limit,
+        key=lambda n: (n.created_at, n.id),
+        descending=True,
+        scalars=True,
+    )
+    set_next_cursor(response, next_cursor)
+    return notifications
+
+
+@router.get("/unread-count", response_model=schemas.NotificationUnreadCount)
+async def get_unread_count(db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(utils.get_current_user_async)):
+    """
+    Liczba nieprzeczytanych powiadomień (licznik na ikonce) - odczyt jednego wiersza.
+    """
+    user_id = current_user.id
+    unread_count = await db.run_sync(lambda session: crud.get_unread_notification_count(session, user_id))
+    return {"unread_count": unread_count}
+
+
+@router.post("/mark-read")
+async def mark_notifications_read(
+    mark: schemas.NotificationMarkRead,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
+):
+    """
+    Oznacza powiadomienia jako przeczytane jednym zapytaniem: podane ``ids``
+    albo powiadomienie na pozycji ``before_cursor`` i wszystkie starsze
+    (kursor z X-Next-Cursor lub id zdarzenia strumienia). Powiadomienia
+    nowsze od kursora - także te, które przyszły po pobraniu listy - zostają
+    nieprzeczytane.
+    """
+    if (mark.ids is None) == (mark.before_cursor is None):
+        raise HTTPException(status_code=400, detail="Podaj ids albo before_cursor")
+    up_to = tuple(decode_cursor(mark.before_cursor, CREATED_AT_ID)) if mark.before_cursor else None
+    user_id = current_user.id
+    marked = await db.run_sync(
+        lambda session: crud.mark_notifications_read(session, user_id, ids=mark.ids, up_to=up_to))
+    unread_count = await db.run_sync(lambda session: crud.get_unread_notification_count(session, user_id))
+    return {"marked_read": marked, "unread_count": unread_count}
+
+
+async def _stream_user_id(token: str):
+    """Uwierzytelnia token strumienia; sesja bazy jest zamykana od razu, nie trzyma połączenia przez cały strumień."""
+    async with AsyncSessionLocal() as db:
+        return (await utils.get_current_user_async(token, db)).id
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    access_token: Optional[str] = Query(default=None, description="JWT, gdy klient (EventSource) nie może wysłać nagłówka Authorization"),
+    last_event_id: Optional[str] = Header(default=None, description="Kursor ostatniego odebranego powiadomienia"),
+):
+    """
+    Strumień powiadomień na żywo (Server-Sent Events): zdarzenia
+    ``notification``, ``unread_count``, ``resync`` (klient przeładowuje listę)
+    i ``token_expired`` (klient odświeża token i łączy się ponownie).
+    Po wznowieniu z nagłówkiem Last-Event-ID wysyłane są najpierw
+    powiadomienia, których klient nie odebrał.
+    """
+    if not settings.notification_stream_enabled:
+        raise HTTPException(status_code=503, detail="Strumień powiadomień jest wyłączony")
+    scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+    if scheme.lower() != "bearer" or not token:
+        token = access_token
+    if not token:
+        raise utils.credentials_exception
+    user_id = await _stream_user_id(token)
+    token_expires_at = jwt.get_unverified_claims(token).get("exp")
+    after = tuple(decode_cursor(last_event_id, CREATED_AT_ID)) if last_event_id else None
+
+    return StreamingResponse(
+        event_stream(user_id, after, token_expires_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{notification_id}", response_model=schemas.NotificationOut)
-async def get_notification(notification_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+async def get_notification(notification_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(utils.get_current_user_async)):
     """
     Zwraca szczegóły powiadomienia (tylko właściciel).
     """
-    notification = db.query(models.Notification).filter(
-        models.Notification.id == notification_id).first()
+    notification = await db.get(models.Notification, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     if notification.user_id != current_user.id:
@@ -31,18 +132,16 @@ async def get_notification(notification_id: UUID, db: Session = Depends(get_db),
 
 
 @router.patch("/{notification_id}/read")
-async def mark_notification_read(notification_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+async def mark_notification_read(notification_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(utils.get_current_user_async)):
     """
     Oznacza powiadomienie jako przeczytane.
     """
-    notification = db.query(models.Notification).filter(
-        models.Notification.id == notification_id).first()
+    notification = await db.get(models.Notification, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     if notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    notification.read = True
-    db.commit()
-    db.refresh(notification)
+    user_id = current_user.id
+    await db.run_sync(lambda session: crud.mark_notifications_read(session, user_id, ids=[notification_id]))
     return {"message": "Notification marked as read"}
@@ -1,19 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from uuid import UUID
 
-from app import models, schemas, utils
+from app import crud, models, schemas, utils
 from app.core.database import get_db
-from app.core.email import send_email
+from app.core.email import enqueue_emails, send_email
 from app.routes.admin import admin_required
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import and_
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/payouts", tags=["payouts"])
 
 
 @router.post("/", response_model=schemas.PayoutOut)
-async def create_payout(
+def create_payout(
     payout: schemas.PayoutCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(admin_required)
@@ -44,13 +43,14 @@ async def create_payout(
     send_email(
         subject="Crowdoo: Zlecono wypłatę środków",
         body=f"Twoja wypłata za kampanię '{campaign.title}' została zlecona. Kwota: {db_payout.payout_amount} PLN.",
-        to_email=entrepreneur.email
+        to_email=entrepreneur.email,
+        db=db
     )
     return db_payout
 
 
 @router.get("/", response_model=list[schemas.PayoutOut])
-async def list_payouts(db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+def list_payouts(db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
     """
     Zwraca listę wszystkich payoutów (tylko admin).
     """
@@ -58,7 +58,7 @@ async def list_payouts(db: Session = Depends(get_db), current_user: models.User
 
 
 @router.get("/my", response_model=list[schemas.PayoutOut])
-async def list_my_payouts(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+def list_my_payouts(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
     """
     Zwraca listę payoutów zalogowanego przedsiębiorcy (właściciela kampanii).
     """
@@ -66,7 +66,7 @@ async def list_my_payouts(db: Session = Depends(get_db), current_user: models.Us
 
 
 @router.get("/campaign/{campaign_id}", response_model=list[schemas.PayoutOut])
-async def list_campaign_payouts(campaign_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+def list_campaign_payouts(campaign_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
     """
     Zwraca listę payoutów dla danej kampanii (tylko admin).
     """
@@ -74,7 +74,7 @@ async def list_campaign_payouts(campaign_id: UUID, db: Session = Depends(get_db)
 
 
 @router.put("/{payout_id}", response_model=schemas.PayoutOut)
-async def update_payout_status(
+def update_payout_status(
     payout_id: UUID,
     status: str,
     db: Session = Depends(get_db),
@@ -98,67 +98,37 @@ async def update_payout_status(
             send_email(
                 subject="Crowdoo: Wypłata zrealizowana",
                 body=f"Twoja wypłata za kampanię została zrealizowana. Kwota: {payout.payout_amount} PLN.",
-                to_email=entrepreneur.email
+                to_email=entrepreneur.email,
+                db=db
             )
         elif status == "failed":
             send_email(
                 subject="Crowdoo: Błąd wypłaty",
                 body=f"Niestety wypłata za kampanię nie powiodła się. Skontaktuj się z obsługą.",
-                to_email=entrepreneur.email
+                to_email=entrepreneur.email,
+                db=db
             )
     return payout
 
 
 @router.post("/auto-generate", response_model=list[schemas.PayoutOut])
-async def auto_generate_payouts(db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
+def auto_generate_payouts(db: Session = Depends(get_db), current_user: models.User = Depends(admin_required)):
     """
     Automatycznie generuje payouty dla kampanii zakończonych, które nie mają jeszcze wypłaty, na 10 dzień następnego miesiąca po zakończeniu.
+    Payouty są tworzone jednym zapytaniem, a powiadomienia email trafiają do kolejki jednym INSERT-em
+    w tej samej transakcji.
     """
-    now = datetime.utcnow()
-    payouts_created = []
-    # Szukaj kampanii zakończonych (status 'successful', deadline < teraz)
-    campaigns = db.query(models.Campaign).filter(
-        and_(models.Campaign.status == 'successful',
-             models.Campaign.deadline < now)
-    ).all()
-    for campaign in campaigns:
-        # Sprawdź, czy już istnieje payout dla tej kampanii
-        existing_payout = db.query(models.Payout).filter(
-            models.Payout.campaign_id == campaign.id).first()
-        if existing_payout:
-            continue
-        # Wyznacz datę wypłaty: 10 dzień następnego miesiąca po deadline
-        deadline = campaign.deadline
-        if deadline.month == 12:
-            payout_month = 1
-            payout_year = deadline.year + 1
-        else:
-            payout_month = deadline.month + 1
-            payout_year = deadline.year
-        payout_date = datetime(payout_year, payout_month, 10)
-        # Kwota do wypłaty = current_amount
-        payout_amount = float(campaign.current_amount or 0)
-        if payout_amount <= 0:
-            continue
-        db_payout = models.Payout(
-            campaign_id=campaign.id,
-            entrepreneur_id=campaign.entrepreneur_id,
-            total_raised=payout_amount,
-            payout_amount=payout_amount,
-            payout_date=payout_date,
-            status="pending"
-        )
-        db.add(db_payout)
-        db.commit()
-        db.refresh(db_payout)
-        # Powiadomienie email do przedsiębiorcy
-        entrepreneur = db.query(models.User).filter(
-            models.User.id == campaign.entrepreneur_id).first()
-        if entrepreneur:
-            send_email(
-                subject="Crowdoo: Automatyczna wypłata środków",
-                body=f"Twoja kampania '{campaign.title}' została zakończona. Wypłata {payout_amount} PLN zostanie zrealizowana 10 dnia następnego miesiąca.",
-                to_email=entrepreneur.email
-            )
-        payouts_created.append(db_payout)
+    payouts_created = crud.generate_campaign_payouts(db, now=datetime.utcnow())
+
+    # Powiadomienia email do przedsiębiorców
+    enqueue_emails(db, [
+        {
+            "subject": "Crowdoo: Automatyczna wypłata środków",
+            "body": f"Twoja kampania '{payout.campaign_title}' została zakończona. Wypłata {payout.payout_amount} PLN zostanie zrealizowana 10 dnia następnego miesiąca.",
+            "to_email": payout.entrepreneur_email,
+        }
+        for payout in payouts_created
+        if payout.entrepreneur_email
+    ])
+    db.commit()
     return payouts_created
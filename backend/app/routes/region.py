@@ -1,53 +1,42 @@
-import os
-import xml.etree.ElementTree as ET
 from typing import Optional
 
-import zeep
-import zeep.helpers
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
-from zeep import xsd
 
 from app import models
 from app.core.database import get_db
+from app.core.geo_index import city_locator
+from app.core.gus import gus_client, normalize_nip
+from app.core.region_index import region_index
 
 router = APIRouter(prefix="/regions", tags=["regions"])
 
-GUS_BIR1_WSDL = "https://wyszukiwarkaregontest.stat.gov.pl/wsBIR/wsdl/UslugaBIRzewnPubl.xsd"
-GUS_BIR1_SERVICE_URL = "https://wyszukiwarkaregontest.stat.gov.pl/wsBIR/UslugaBIRzewnPubl.svc"
-GUS_BIR1_USER_KEY = os.environ.get(
-    "GUS_BIR1_USER_KEY", "abcde12345abcde12345")  # testowy klucz
-
-
 @router.get("/search")
 def search_regions(q: str = Query(default=..., min_length=2), type: str = Query(default='all'), country_id: Optional[str] = Query(default=None), db: Session = Depends(get_db)):
-    q_like = f"%{q.lower()}%"
+    # Wyszukiwanie w indeksie w pamięci (bez diakrytyków, prefiksowe i podciągowe, wg populacji)
+    region_index.ensure_fresh(db)
     results = []
     if type in ('all', 'city'):
-        city_query = db.query(models.RegionCity).filter(
-            func.lower(models.RegionCity.name).like(q_like))
-        if country_id:
-            city_query = city_query.filter(
-                models.RegionCity.country_id == country_id)
-        cities = city_query.limit(10).all()
-        results += [{"id": str(city.id), "name": city.name,
-                     "type": "city"} for city in cities]
+        results += region_index.search(q, 'city', limit=10, country_id=country_id)
     if type in ('all', 'state'):
-        states = db.query(models.RegionState).filter(func.lower(
-            models.RegionState.name).like(q_like)).limit(5).all()
-        results += [{"id": str(state.id), "name": state.name,
-                     "type": "state"} for state in states]
+        results += region_index.search(q, 'state', limit=5)
     if type in ('all', 'country'):
-        countries = db.query(models.RegionCountry).filter(
-            func.lower(models.RegionCountry.name).like(q_like)).limit(5).all()
-        results += [{"id": str(country.id), "name": country.name,
-                     "type": "country"} for country in countries]
-        
-    print ("regions searchbox results", results);
+        results += region_index.search(q, 'country', limit=5)
     return results
 
 
+@router.get("/reverse")
+def reverse_geocode(
+    lat: float = Query(..., ge=-90, le=90, description="Szerokość geograficzna (stopnie)"),
+    lon: float = Query(..., ge=-180, le=180, description="Długość geograficzna (stopnie)"),
+    limit: int = Query(default=5, ge=1, le=20, description="Liczba najbliższych miast"),
+    db: Session = Depends(get_db),
+):
+    # Najbliższe miasta (z województwem i krajem) z drzewa k-d w pamięci
+    city_locator.ensure_fresh(db)
+    return city_locator.nearest(lat, lon, limit)
+
+
 @router.get("/city/{city_id}")
 def get_city_details(city_id: str, db: Session = Depends(get_db)):
     city = db.query(models.RegionCity).filter(
@@ -63,76 +52,20 @@ def get_city_details(city_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/gus/company/{nip}")
-def get_company_from_gus(nip: str):
-    print("[GUS] Start zapytania o firmę po NIP (zeep)")
-    sid = None
+def get_company_from_gus(nip: str, db: Session = Depends(get_db)):
+    """
+    Zwraca dane firmy z GUS BIR1 po NIP (z cache, jeśli były już pobierane).
+    """
+    normalized_nip = normalize_nip(nip)
+    if normalized_nip is None:
+        raise HTTPException(status_code=400, detail="Nieprawidłowy numer NIP")
     try:
-        print("[GUS] Tworzenie klienta SOAP...")
-        client = zeep.Client(wsdl=GUS_BIR1_WSDL)
-        # client.transport.session.headers["Content-Type"] = "application/soap+xml; charset=utf-8"
-        # client.transport.session.headers["Accept"] = "application/soap+xml"
-        client.service._binding_options["address"] = GUS_BIR1_SERVICE_URL
-        print("[GUS] Logowanie do BIR1...")
-        sid = client.service.Zaloguj(GUS_BIR1_USER_KEY)
-        print(f"[GUS] Otrzymano SID: {sid}")
-        # SID jako nagłówek HTTP (zgodnie z instrukcją GUS BIR1)
-        client.transport.session.headers["sid"] = sid
-        print("[GUS] Wysyłanie zapytania DaneSzukaj...")
-        search_params = {
-            "Nip": nip,
-            "Regon": None,
-            "Krs": None,
-        }
-        print("[GUS] Parametry wyszukiwania:", search_params)
-        result = client.service.DaneSzukaj(search_params)
-        print(f"[GUS] Wynik DaneSzukaj: {result}")
-        # Jeśli result to string (XML), parsujemy ręcznie
-        if isinstance(result, str):
-            print("[GUS] Parsowanie XML z odpowiedzi DaneSzukaj...")
-            root = ET.fromstring(result)
-            dane_elem = root.find('dane')
-            if dane_elem is None:
-                print("[GUS] Brak elementu <dane> w odpowiedzi XML")
-                raise HTTPException(
-                    status_code=404, detail="Nie znaleziono firmy o podanym NIP")
-            dane = {child.tag: child.text for child in dane_elem}
-            print(f"[GUS] Dane firmy (XML): {dane}")
-        else:
-            # fallback: serializacja jak poprzednio
-            result_dict = zeep.helpers.serialize_object(result)
-            print(f"[GUS] Wynik DaneSzukaj (dict): {result_dict}")
-            dane_list = result_dict.get('dane') or result_dict.get('Dane')
-            if not dane_list:
-                print("[GUS] Brak danych dla podanego NIP (po serializacji)")
-                raise HTTPException(
-                    status_code=404, detail="Nie znaleziono firmy o podanym NIP")
-            dane = dane_list[0] if isinstance(dane_list, list) else dane_list
-            print(f"[GUS] Dane firmy (dict): {dane}")
-        return {
-            "company_name": dane.get("Nazwa", ""),
-            "street": dane.get("Ulica", ""),
-            "building_number": dane.get("NrNieruchomosci", ""),
-            "apartment_number": dane.get("NrLokalu", ""),
-            "postal_code": dane.get("KodPocztowy", ""),
-            "city": dane.get("Miejscowosc", ""),
-            "nip": dane.get("Nip", nip),
-            "regon": dane.get("Regon", ""),
-            "krs": dane.get("Krs", ""),
-            "country": "Polska"
-        }
+        company = gus_client.get_company(db, normalized_nip)
     except Exception as e:
         print(f"[GUS] Błąd: {e}")
         raise HTTPException(
             status_code=500, detail=f"Błąd pobierania danych z GUS BIR1: {e}")
-    finally:
-        if sid:
-            try:
-                print(f"[GUS] Wylogowywanie SID: {sid}")
-                logout_result = client.service.Wyloguj(sid)
-                if logout_result:
-                    print("[GUS] Wylogowanie zakończone sukcesem")
-                else:
-                    print("[GUS] Wylogowanie nie powiodło się")
-            except Exception as e:
-                print(f"[GUS] Błąd podczas wylogowania: {e}")
-                print(f"[GUS] Błąd podczas wylogowania: {e}")
+    if company is None:
+        raise HTTPException(
+            status_code=404, detail="Nie znaleziono firmy o podanym NIP")
+    return company
@@ -1,3 +1,66 @@
-from fastapi import APIRouter
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.core.database import get_db
+from app.routes.admin import admin_required
 
 router = APIRouter()
+
+
+@router.post("/recompute-funding-stats")
+def recompute_funding_stats(
+    campaign_id: Optional[UUID] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Naprawa agregatów finansowania kampanii - przelicza je od zera z inwestycji
+    (wszystkie kampanie lub jedna, jeśli podano campaign_id).
+    """
+    recomputed = crud.recompute_campaign_funding_stats(db, campaign_id=campaign_id)
+    return {"recomputed_campaigns": recomputed}
+
+
+@router.post("/reconcile-campaign-amounts")
+def reconcile_campaign_amounts(
+    campaign_id: Optional[UUID] = None,
+    fix: bool = False,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Sprawdza zgodność zebranej kwoty kampanii (current_amount) z sumą
+    zatwierdzonych inwestycji; z fix=true poprawia rozbieżności.
+    Poprawka jest jednorazowa - nie zmienia sposobu, w jaki webhook płatności
+    aktualizuje current_amount.
+    """
+    mismatches = crud.reconcile_campaign_amounts(db, campaign_id=campaign_id, fix=fix)
+    return {"mismatches": mismatches, "fixed": len(mismatches) if fix else 0}
+
+
+@router.post("/recompute-notification-counters")
+def recompute_notification_counters(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Naprawa liczników nieprzeczytanych powiadomień - przelicza je od zera z tabeli notifications.
+    """
+    recomputed = crud.recompute_notification_counters(db)
+    return {"recomputed_users": recomputed}
+
+
+@router.post("/purge-password-reset-tokens")
+def purge_password_reset_tokens(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(admin_required),
+):
+    """
+    Usuwa wygasłe tokeny resetowania hasła (jedno zapytanie DELETE po indeksie expires_at).
+    """
+    purged = crud.purge_expired_password_reset_tokens(db)
+    return {"purged_tokens": purged}
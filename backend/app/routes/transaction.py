@@ -1,10 +1,15 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas, utils
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.pagination import paginate_async, set_next_cursor
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
@@ -12,15 +17,14 @@ router = APIRouter(prefix="/transactions", tags=["transactions"])
 @router.post("/", response_model=schemas.TransactionOut)
 async def create_transaction(
     transaction: schemas.TransactionCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(utils.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async)
 ):
     """
     Tworzy nową transakcję (np. po udanej płatności Stripe).
     Uwaga: Ten endpoint może nie być używany - transakcje są tworzone przez /payments/
     """
-    investment = db.query(models.Investment).filter(
-        models.Investment.id == transaction.investment_id).first()
+    investment = await db.get(models.Investment, transaction.investment_id)
     if not investment:
         raise HTTPException(status_code=404, detail="Investment not found")
     
@@ -30,7 +34,6 @@ async def create_transaction(
     
     # Transaction nie ma investment_id - relacja jest odwrotna (Investment ma transaction_id)
     # Utwórz transakcję
-    from decimal import Decimal
     db_transaction = models.Transaction(
         stripe_transaction_id=None,  # Będzie ustawione później przez payments
         amount=Decimal(str(transaction.amount)),
@@ -40,12 +43,12 @@ async def create_transaction(
         status=transaction.status or schemas.TransactionStatusEnum.PENDING.value,
     )
     db.add(db_transaction)
-    db.flush()  # Flush żeby dostać ID transakcji
+    await db.flush()  # Flush żeby dostać ID transakcji
     
     # Zaktualizuj investment z transaction_id
     investment.transaction_id = db_transaction.id
-    db.commit()
-    db.refresh(db_transaction)
+    await db.commit()
+    await db.refresh(db_transaction)
     
     # Zwróć w formacie TransactionOut (wymaga payment_url, ale tego nie mamy tutaj)
     # To może być problem - endpoint może nie być używany
@@ -53,61 +56,97 @@ async def create_transaction(
 
 
 @router.get("/", response_model=list[schemas.TransactionList])
-async def list_transactions(db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+async def list_transactions(
+    response: Response,
+    status: Optional[schemas.TransactionStatusEnum] = Query(default=None, description="Status transakcji"),
+    type: Optional[schemas.TransactionTypeEnum] = Query(default=None, description="Typ transakcji"),
+    currency: Optional[str] = Query(default=None, min_length=3, max_length=3, description="Waluta (np. PLN)"),
+    date_from: Optional[datetime] = Query(default=None, description="Od daty (włącznie)"),
+    date_to: Optional[datetime] = Query(default=None, description="Do daty (wyłącznie)"),
+    limit: Optional[int] = Query(default=None, ge=1, description="Rozmiar strony"),
+    cursor: Optional[str] = Query(default=None, description="Kursor z nagłówka X-Next-Cursor"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(utils.get_current_user_async),
+):
     """
-    Zwraca listę transakcji użytkownika (po inwestycjach).
+    Zwraca stronę transakcji użytkownika (po inwestycjach), od najnowszych.
+    Jedno zapytanie z JOIN investments; kursor kolejnej strony w nagłówku X-Next-Cursor.
+    Każdy wiersz ma running_total - narastającą w obrębie strony sumę udanych transakcji.
     """
-    # Investment ma transaction_id, więc pobieramy transakcje przez inwestycje
-    investments = db.query(models.Investment).filter(
-        models.Investment.investor_id == current_user.id
-    ).all()
-    
-    # Stwórz mapę transaction_id -> investment_id
-    transaction_to_investment = {inv.transaction_id: inv.id for inv in investments if inv.transaction_id is not None}
-    
-    if not transaction_to_investment:
-        return []
-    
-    # Pobierz transakcje
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.id.in_(list(transaction_to_investment.keys()))
-    ).all()
-    
-    # Zbuduj odpowiedź z investment_id
+    # Investment ma transaction_id, więc łączymy transakcje z inwestycjami użytkownika
+    query = (
+        select(
+            models.Transaction.id,
+            models.Transaction.currency,
+            models.Transaction.amount,
+            models.Transaction.fee,
+            models.Transaction.type,
+            models.Transaction.status,
+            models.Transaction.stripe_transaction_id,
+            models.Transaction.status_description,
+            models.Transaction.created_at,
+            models.Investment.id.label("investment_id"),
+        )
+        .join(models.Investment, models.Investment.transaction_id == models.Transaction.id)
+        .filter(models.Investment.investor_id == current_user.id)
+    )
+    if status:
+        query = query.filter(models.Transaction.status == status.value)
+    if type:
+        query = query.filter(models.Transaction.type == type.value)
+    if currency:
+        query = query.filter(func.lower(models.Transaction.currency) == currency.lower())
+    if date_from:
+        query = query.filter(models.Transaction.created_at >= date_from)
+    if date_to:
+        query = query.filter(models.Transaction.created_at < date_to)
+
+    rows, next_cursor = await paginate_async(
+        db,
+        query,
+        columns=(models.Transaction.created_at, models.Transaction.id),
+        cursor=cursor,
+        limit=limit,
+        key=lambda row: (row.created_at, row.id),
+        descending=True,
+    )
+    set_next_cursor(response, next_cursor)
+
     result = []
-    for transaction in transactions:
-        # Konwertuj UUID na string dla id
-        transaction_dict = {
-            "id": str(transaction.id),
-            "currency": transaction.currency,
-            "amount": float(transaction.amount),
-            "fee": float(transaction.fee),
-            "type": transaction.type,
-            "status": transaction.status,
-            "stripe_transaction_id": transaction.stripe_transaction_id,
-            "status_description": transaction.status_description,
-            "created_at": transaction.created_at,
-            "investment_id": transaction_to_investment.get(transaction.id)
-        }
-        result.append(transaction_dict)
-    
+    running_total = Decimal("0")
+    for row in rows:
+        if row.status == schemas.TransactionStatusEnum.ACCEPTED.value:
+            running_total += row.amount
+        result.append({
+            "id": str(row.id),
+            "currency": row.currency,
+            "amount": float(row.amount),
+            "fee": float(row.fee or 0),
+            "type": row.type,
+            "status": row.status,
+            "stripe_transaction_id": row.stripe_transaction_id,
+            "status_description": row.status_description,
+            "created_at": row.created_at,
+            "investment_id": row.investment_id,
+            "running_total": float(running_total),
+        })
+
     return result
 
 
 @router.get("/{transaction_id}", response_model=schemas.TransactionOut)
-async def get_transaction(transaction_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(utils.get_current_user)):
+async def get_transaction(transaction_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(utils.get_current_user_async)):
     """
     Zwraca szczegóły transakcji (tylko właściciel inwestycji lub admin).
     """
-    transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id).first()
+    transaction = await db.get(models.Transaction, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
     # Znajdź inwestycję powiązaną z tą transakcją (Investment ma transaction_id)
-    investment = db.query(models.Investment).filter(
-        models.Investment.transaction_id == transaction_id
-    ).first()
+    investment = (await db.execute(
+        select(models.Investment).where(models.Investment.transaction_id == transaction_id)
+    )).scalars().first()
     
     if not investment or (investment.investor_id != current_user.id and not getattr(current_user, 'is_admin', False)):
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -21,7 +21,7 @@ def get_user(user_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.post("/follow/{entrepreneur_id}", response_model=schemas.FollowOut)
-async def follow_entrepreneur(
+def follow_entrepreneur(
     entrepreneur_id: UUID,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user),
@@ -46,7 +46,7 @@ async def follow_entrepreneur(
 
 
 @router.delete("/unfollow/{entrepreneur_id}")
-async def unfollow_entrepreneur(
+def unfollow_entrepreneur(
     entrepreneur_id: UUID,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user),
@@ -66,7 +66,7 @@ async def unfollow_entrepreneur(
 
 
 @router.get("/following", response_model=list[schemas.FollowOut])
-async def list_following(
+def list_following(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user),
 ):
@@ -74,7 +74,7 @@ async def list_following(
 
 
 @router.get("/me/profile", response_model=schemas.ProfileOut)
-async def get_my_profile(
+def get_my_profile(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user),
 ):
@@ -97,7 +97,7 @@ async def get_my_profile(
 
 
 @router.put("/me/profile", response_model=schemas.ProfileOut)
-async def update_my_profile(
+def update_my_profile(
     profile_update: schemas.ProfileCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(utils.get_current_user),
@@ -124,7 +124,7 @@ async def update_my_profile(
 
 
 @router.get("/{user_id}/profile", response_model=schemas.ProfileOut)
-async def get_user_profile(user_id: UUID, db: Session = Depends(get_db)):
+def get_user_profile(user_id: UUID, db: Session = Depends(get_db)):
     """
     Zwraca profil użytkownika (publiczny).
     """
@@ -105,6 +105,10 @@ class CampaignOut(CampaignBase):
     model_config = {"from_attributes": True}
 
 
+class CampaignNearbyOut(CampaignOut):
+    distance_km: float
+
+
 # Campaign Image Schemas
 class CampaignImageBase(BaseModel):
     image_url: str
@@ -241,6 +245,7 @@ class TransactionList(BaseModel):
     status_description: Optional[str] = None
     created_at: datetime
     investment_id: Optional[uuid.UUID] = None  # Opcjonalne, bo pobieramy przez relację
+    running_total: Optional[float] = None  # Narastająca suma udanych transakcji w obrębie strony
 
     model_config = {"from_attributes": True}
 
@@ -303,6 +308,16 @@ class NotificationOut(NotificationBase):
     model_config = {"from_attributes": True}
 
 
+class NotificationMarkRead(BaseModel):
+    # Dokładnie jedno z pól: konkretne powiadomienia albo pozycja kursora i wszystkie starsze
+    ids: Optional[List[uuid.UUID]] = Field(default=None, max_length=500)
+    before_cursor: Optional[str] = None
+
+
+class NotificationUnreadCount(BaseModel):
+    unread_count: int
+
+
 # --- ADMIN LOG ---
 class AdminLogBase(BaseModel):
     action: str
@@ -349,6 +364,30 @@ class ErrorLogOut(ErrorLogBase):
     resolved_at: Optional[datetime] = None
     resolved_by: Optional[uuid.UUID] = None
     created_at: datetime
+    fingerprint: Optional[str] = None
+    issue_id: Optional[uuid.UUID] = None
+
+    model_config = {"from_attributes": True}
+
+
+class ErrorIssueUpdate(BaseModel):
+    resolved: bool
+
+
+class ErrorIssueOut(BaseModel):
+    id: uuid.UUID
+    fingerprint: str
+    error_type: str
+    title: str
+    endpoint: Optional[str] = None
+    method: Optional[str] = None
+    status_code: Optional[int] = None
+    occurrences: int
+    first_seen_at: datetime
+    last_seen_at: datetime
+    resolved: bool
+    resolved_at: Optional[datetime] = None
+    resolved_by: Optional[uuid.UUID] = None
 
     model_config = {"from_attributes": True}
 
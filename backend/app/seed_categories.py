@@ -8,7 +8,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.core.database import SessionLocal
-from app import models
+from app.core.reference_data import CATEGORIES_DATASET
+from app import crud, models
 
 def seed_categories():
     db = SessionLocal()
@@ -75,6 +76,8 @@ def seed_categories():
                 print(f"Kategoria już istnieje: {cat_data['name']}")
 
         db.commit()
+        # Sygnał dla snapshotu kategorii w działających procesach API
+        crud.bump_reference_data_version(db, CATEGORIES_DATASET)
         print("Seedowanie kategorii zakończone pomyślnie!")
     except Exception as e:
         db.rollback()
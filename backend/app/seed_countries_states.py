@@ -4,7 +4,9 @@ Uruchom ten skrypt PRZED seed_geonames.py
 """
 import uuid
 
+from app import crud
 from app.core.database import SessionLocal
+from app.core.region_index import REGIONS_DATASET
 from app.models import RegionCountry, RegionState
 
 # Podstawowe dane dla Polski
@@ -78,6 +80,8 @@ def seed_countries_states():
                 added_states += 1
         
         db.commit()
+        # Sygnał dla indeksu regionów w działających procesach API
+        crud.bump_reference_data_version(db, REGIONS_DATASET)
         print(f"✓ Dodano {added_states} województw")
         print("Seed countries and states completed successfully!")
         
@@ -1,16 +1,35 @@
+"""
+Import miast z pliku GeoNames (np. cities500.txt, allCountries.txt) do region_cities.
+
+Uruchomienie (bez okien dialogowych):
+
+    python -m app.seed_geonames PLIK [--country PL] [--delimiter ';'] [--workers N]
+
+Plik jest czytany strumieniowo paczkami linii, które są parsowane i
+filtrowane równolegle w ``--workers`` procesach (kraj, słowa kluczowe
+nie-miast, cc2, województwo). Wynik każdej paczki trafia od razu przez
+``COPY`` do tymczasowej tabeli, a na końcu jedno ``INSERT ... ON CONFLICT
+(geonameid)`` dodaje nowe miasta i aktualizuje zmienione. Całość to jedna
+transakcja. Uruchom PO seed_countries_states.py.
+"""
+import argparse
 import csv
+import io
 import os
-import sys
+import re
 import time
-import unicodedata
-import uuid
+from collections import Counter
+from multiprocessing import Pool
+from typing import Optional
 
-import requests
+from sqlalchemy import text
 
+from app import crud
 from app.core.database import SessionLocal
-from app.models import RegionCity
+from app.core.region_index import REGIONS_DATASET
+from app.models import RegionCountry
 
-KRAJ = "PL"  # Kod kraju do importu (np. 'PL')
+KRAJ = "PL"  # Domyślny kod kraju do importu (np. 'PL')
 
 COLS = [
     "geonameid",
@@ -34,8 +53,6 @@ COLS = [
     "modification_date",
 ]
 
-KRAJ = "PL"
-
 # Mapowanie kodów admin1_code z GeoNames na kody ISO używane w bazie
 GEONAMES_TO_ISO_ADMIN1 = {
     "75": "PL.06",  # Lubelskie
@@ -58,455 +75,518 @@ GEONAMES_TO_ISO_ADMIN1 = {
     "00": None,  # Nieznany kod - pomiń
 }
 
-try:
-    import tkinter as tk
-    from tkinter import filedialog
-except ImportError:
-    tk = None
-    filedialog = None
-
-
-# def is_location_valid(name, country_code):
-#     """
-#     Sprawdza, czy lokalizacja istnieje w bazie GeoNames przez API.
-#     Zwraca True jeśli lokalizacja istnieje, False w przeciwnym wypadku.
-#     """
-#     try:
-#         url = "http://api.geonames.org/searchJSON"
-#         params = {
-#             "q": name,
-#             "country": country_code,
-#             "maxRows": 1,
-#             "username": "demo"  # Zmień na swój login GeoNames!
-#         }
-#         resp = requests.get(url, params=params, timeout=5)
-#         if resp.status_code == 200:
-#             data = resp.json()
-#             return data.get("totalResultsCount", 0) > 0
-#         return False
-#     except requests.RequestException as e:
-#         print(f"Błąd podczas sprawdzania lokalizacji {name}: {e}")
-#         return False
-
-
-def select_file_dialog(title):
-    if tk is None or filedialog is None:
-        raise RuntimeError(
-            "Tkinter is not available. Zainstaluj tkinter lub podaj ścieżki jako argumenty."
-        )
-    root = tk.Tk()
-    root.withdraw()
-    file_path = filedialog.askopenfilename(title=title)
-    root.destroy()
-    if not file_path:
-        raise RuntimeError("Nie wybrano pliku.")
-    return file_path
-
-
-def main():
-    if tk is None or filedialog is None:
-        print("Podaj ścieżkę do pliku GeoNames jako argument lub zainstaluj tkinter.")
-        sys.exit(1)
-    if len(sys.argv) < 2:
-        print("Nie podano ścieżki do pliku. Otwieram okno wyboru pliku...")
-        geonames_file = select_file_dialog(
-            "Wybierz plik GeoNames (np. cities500.txt lub geonames.csv)"
+# Nazwy zawierające któreś z tych słów nie są miastami
+SKIP_KEYWORDS = (
+    "Powiat",
+    "Województwo",
+    "Kanał",
+    "Jezioro",
+    "Gmina",
+    "Rzeka",
+    "Park",
+    "Rezerwat",
+    "Zatoka",
+    "Zamek",
+    "Muzeum",
+    "Pomnik",
+    "Cmentarz",
+    "Wieża",
+    "Most",
+    "Ulica",
+    "Plac",
+    "Osiedle",
+    "Dzielnica",
+    "Osada",
+    "Wzgórze",
+    "Góra",
+    "Wodospad",
+    "Port",
+    "Terminal",
+    "Lotnisko",
+    "Stacja",
+    "Przystanek",
+    "Szkoła",
+    "Uniwersytet",
+    "Szpital",
+    "Kościół",
+    "Synagoga",
+    "Meczet",
+    "Kaplica",
+    "Cerkiew",
+    "Klasztor",
+    "Ratusz",
+    "Biblioteka",
+    "Galeria",
+    "Teatr",
+    "Opera",
+    "Filharmonia",
+    "Kino",
+    "Centrum",
+    "Ogród",
+    "Plaża",
+    "Skwer",
+    "Targowisko",
+    "Hala",
+    "Stadion",
+    "Boisko",
+    "Plac zabaw",
+    "Zespół szkół",
+    "Szkoła podstawowa",
+    "Liceum",
+    "Technikum",
+    "Szkoła zawodowa",
+    "Przedszkole",
+    "Żłobek",
+    "Dom kultury",
+    "Centrum kultury",
+    "Centrum sportu",
+    "Centrum rekreacji",
+    "Centrum handlowe",
+    "Galeria handlowa",
+    "Supermarket",
+    "Sklep spożywczy",
+    "Apteka",
+    "Kawiarnia",
+    "Restauracja",
+    "Bar",
+    "Pub",
+    "Klub nocny",
+    "Hotel",
+    "Motel",
+    "Pensjonat",
+    "Hostel",
+    "Camping",
+    "Pole namiotowe",
+    "Stacja benzynowa",
+    "Warsztat",
+    "Serwis",
+    "Salon samochodowy",
+    # Rozszerzone wg Twojej listy:
+    "Struga",
+    "Potok",
+    "Przylądek",
+    "Przełęcz",
+    "Wyspa",
+    "Półwysep",
+    "Obszar",
+    "Zbiornik",
+    "Zalew",
+    "Staw",
+    "Tunel",
+    "Elektrownia",
+    "Kopalnia",
+    "Zakład",
+    "Farma",
+    "Kolonia",
+    "Przystań",
+    "Przysiółek",
+    "Wieś",
+    "Obwód",
+    "Region",
+    "Oblast",
+    "Kraj",
+    "Province",
+    "District",
+    "County",
+    "Area",
+    "Zone",
+    "Field",
+    "Estate",
+    "Settlement",
+    "Village",
+    "Hamlet",
+    "Farm",
+    "Colony",
+    "Camp",
+    "Barracks",
+    "Refuge",
+    "Shelter",
+    "Ruins",
+    "Fort",
+    "Castle",
+    "Palace",
+    "Tower",
+    "Chapel",
+    "Church",
+    "Monastery",
+    "Sanctuary",
+    "Shrine",
+    "Temple",
+    "Mosque",
+    "Synagogue",
+    "Cathedral",
+    "Basilica",
+    "Abbey",
+    "Convent",
+    "Hermitage",
+    "Cloister",
+    "Oratory",
+    "Tabernacle",
+    "Pagoda",
+    "Stupa",
+    "Mausoleum",
+    "Cemetery",
+    "Graveyard",
+    "Tomb",
+    "Crypt",
+    "Vault",
+    "Sepulchre",
+    "Necropolis",
+    "Memorial",
+    "Monument",
+    "Statue",
+    "Obelisk",
+    "Column",
+    "Pillar",
+    "Stele",
+    "Stone",
+    "Rock",
+    "Boulder",
+    "Cairn",
+    "Dolmen",
+    "Menhir",
+    "Stone circle",
+    "Stone row",
+    "Stone alignment",
+    "Stone avenue",
+    "Stone setting",
+    "Stone slab",
+    "Stone table",
+    "Stone seat",
+    "Stone bench",
+    "Stone cross",
+    "Stone pillar",
+    "Stone monument",
+    "Stone sculpture",
+    "Stone carving",
+    "Stone relief",
+    "Stone inscription",
+    "Stone tablet",
+    "Stone plaque",
+    "Stone marker",
+    "Stone boundary marker",
+    "Stone milestone",
+    "Stone waymarker",
+    "Stone signpost",
+    "Stone guidepost",
+    "Stone direction post",
+    "Stone fingerpost",
+    "Stone sign",
+    "Stone noticeboard",
+    "Stone information board",
+    "Stone map",
+    "Stone plan",
+    "Stone diagram",
+    "Stone chart",
+    "Stone graph",
+    "Stone list",
+    "Stone register",
+    "Stone record",
+    "Stone log",
+    "Stone journal",
+    "Stone diary",
+    "Stone chronicle",
+    "Stone annals",
+    "Stone history",
+    "Stone story",
+    "Stone legend",
+    "Stone myth",
+    "Stone tale",
+    "Stone fable",
+    "Stone parable",
+    "Stone allegory",
+    "Stone metaphor",
+    "Stone simile",
+    "Stone analogy",
+    "Stone comparison",
+    "Stone contrast",
+    "Stone opposition",
+    "Stone contradiction",
+    "Stone paradox",
+    "Stone irony",
+    "Stone satire",
+    "Stone sarcasm",
+    "Stone wit",
+    "Stone humour",
+    "Stone joke",
+    "Stone pun",
+    "Stone riddle",
+    "Stone puzzle",
+    "Stone enigma",
+    "Stone mystery",
+    "Stone secret",
+    "Stone code",
+    "Stone cipher",
+    "Stone cryptogram",
+    "Stone anagram",
+    "Stone palindrome",
+    "Stone acrostic",
+    "Stone crossword",
+    "Stone wordsearch",
+    "Stone sudoku",
+    "Stone puzzle box",
+    "Stone puzzle ball",
+    "Stone puzzle cube",
+    "Stone puzzle ring",
+    "Stone puzzle lock",
+    "Stone puzzle key",
+    "Stone puzzle piece",
+    "Stone puzzle part",
+    "Stone puzzle element",
+    "Stone puzzle component",
+    "Stone puzzle section",
+    "Stone puzzle segment",
+    "Stone puzzle fragment",
+    "Stone puzzle bit",
+    "Stone puzzle chip",
+    "Stone puzzle shard",
+    "Stone puzzle splinter",
+    "Stone puzzle sliver",
+    "Stone puzzle splint",
+)
+
+# Kolumny region_cities wypełniane z pliku (poza id, country_id, state_id)
+CITY_COLUMNS = (
+    "geonameid",
+    "name",
+    "asciiname",
+    "alternatenames",
+    "latitude",
+    "longitude",
+    "feature_class",
+    "feature_code",
+    "admin1_code",
+    "admin2_code",
+    "admin3_code",
+    "admin4_code",
+    "population",
+    "elevation",
+    "dem",
+    "timezone",
+    "modification_date",
+)
+STAGING_COLUMNS = CITY_COLUMNS + ("country_id", "state_id")
+
+# Liczba linii pliku w jednej paczce przekazywanej do procesu parsującego
+CHUNK_LINES = 20000
+
+
+def compile_keyword_matcher(keywords) -> re.Pattern:
+    """
+    Jedno wyrażenie regularne równoważne ``any(k in name for k in keywords)``.
+    Słowa zawierające inne słowo z listy (np. "Stone cross" przy "Stone") są
+    pomijane - nie zmieniają wyniku.
+    """
+    unique = sorted(set(keywords), key=len)
+    minimal = []
+    for keyword in unique:
+        if not any(shorter in keyword for shorter in minimal):
+            minimal.append(keyword)
+    return re.compile("|".join(re.escape(keyword) for keyword in minimal))
+
+
+def build_state_map(db, country_code: str) -> dict:
+    """Kod admin1 z GeoNames -> id województwa (jedno zapytanie zamiast zapytania na miasto)."""
+    state_ids = {
+        admin1_code: state_id
+        for admin1_code, state_id in db.execute(
+            text("SELECT admin1_code, id FROM region_states WHERE admin1_code IS NOT NULL")
         )
-    else:
-        geonames_file = sys.argv[1]
-    db = SessionLocal()
-    # Pobierz istniejące admin1_code (województwa) z bazy
-    from sqlalchemy import text
-
-    existing_admin1_codes = set(
-        row[0]
-        for row in db.execute(text("SELECT admin1_code FROM region_states")).fetchall()
+    }
+    state_map = {}
+    for admin1_code, state_id in state_ids.items():
+        # Kody w bazie mają postać "<kraj>.<kod>"
+        prefix, _, code = admin1_code.partition(".")
+        if prefix == country_code and code:
+            state_map[code] = state_id
+    if country_code == KRAJ:
+        for geonames_code, iso_code in GEONAMES_TO_ISO_ADMIN1.items():
+            state_map[geonames_code] = state_ids.get(iso_code) if iso_code else None
+    return {code: str(state_id) for code, state_id in state_map.items() if state_id}
+
+
+# Kolumny, w których pusta wartość z pliku oznacza NULL (pozostałe zachowują pusty napis)
+NULL_IF_EMPTY = frozenset({"population"})
+
+
+def _copy_value(value: Optional[str]) -> str:
+    """Wartość w formacie tekstowym COPY (None -> NULL)."""
+    if value is None:
+        return "\\N"
+    return (value.replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+# Stan procesu parsującego (ustawiany raz przez initializer puli)
+_parser_config: dict = {}
+
+
+def _init_parser(country_code: str, country_id: str, state_map: dict, delimiter: str) -> None:
+    _parser_config.update(
+        country_code=country_code,
+        country_id=country_id,
+        state_map=state_map,
+        delimiter=delimiter,
+        skip_matcher=compile_keyword_matcher(SKIP_KEYWORDS),
     )
 
-    # Pobierz istniejące geonameid z bazy aby uniknąć duplikatów
-    existing_geonameids = set(
-        row[0]
-        for row in db.execute(text("SELECT geonameid FROM region_cities")).fetchall()
-    )
 
-    # Pobierz ID Polski z bazy
-    from app.models import RegionCountry
-
-    poland = db.query(RegionCountry).filter(RegionCountry.country_code == KRAJ).first()
-
-    if not poland:
-        print(
-            f"Błąd: Kraj {KRAJ} nie został znaleziony w bazie! Najpierw uruchom seed_countries_states.py"
-        )
-        db.close()
-        return
-
-    # --- Import tylko miast ---
-    with open(geonames_file, encoding="utf-8") as f:
-        reader = csv.DictReader(f, fieldnames=COLS, delimiter=";")
-        rows = [row for row in reader if row["country_code"] == KRAJ]
-    if not rows:
-        print(f"Brak rekordów dla kraju {KRAJ}")
-        return
-    city_count = 0
-    # Lista słów kluczowych do pomijania (rozszerzona)
-    skip_keywords = [
-        "Powiat",
-        "Województwo",
-        "Kanał",
-        "Jezioro",
-        "Gmina",
-        "Rzeka",
-        "Park",
-        "Rezerwat",
-        "Zatoka",
-        "Zamek",
-        "Muzeum",
-        "Pomnik",
-        "Cmentarz",
-        "Wieża",
-        "Most",
-        "Ulica",
-        "Plac",
-        "Osiedle",
-        "Dzielnica",
-        "Osada",
-        "Wzgórze",
-        "Góra",
-        "Wodospad",
-        "Port",
-        "Terminal",
-        "Lotnisko",
-        "Stacja",
-        "Przystanek",
-        "Szkoła",
-        "Uniwersytet",
-        "Szpital",
-        "Kościół",
-        "Synagoga",
-        "Meczet",
-        "Kaplica",
-        "Cerkiew",
-        "Klasztor",
-        "Ratusz",
-        "Biblioteka",
-        "Galeria",
-        "Teatr",
-        "Opera",
-        "Filharmonia",
-        "Kino",
-        "Centrum",
-        "Ogród",
-        "Plaża",
-        "Skwer",
-        "Targowisko",
-        "Hala",
-        "Stadion",
-        "Boisko",
-        "Plac zabaw",
-        "Zespół szkół",
-        "Szkoła podstawowa",
-        "Liceum",
-        "Technikum",
-        "Szkoła zawodowa",
-        "Przedszkole",
-        "Żłobek",
-        "Dom kultury",
-        "Centrum kultury",
-        "Centrum sportu",
-        "Centrum rekreacji",
-        "Centrum handlowe",
-        "Galeria handlowa",
-        "Supermarket",
-        "Sklep spożywczy",
-        "Apteka",
-        "Kawiarnia",
-        "Restauracja",
-        "Bar",
-        "Pub",
-        "Klub nocny",
-        "Hotel",
-        "Motel",
-        "Pensjonat",
-        "Hostel",
-        "Camping",
-        "Pole namiotowe",
-        "Stacja benzynowa",
-        "Warsztat",
-        "Serwis",
-        "Salon samochodowy",
-        # Rozszerzone wg Twojej listy:
-        "Struga",
-        "Potok",
-        "Przylądek",
-        "Przełęcz",
-        "Wyspa",
-        "Półwysep",
-        "Obszar",
-        "Zbiornik",
-        "Zalew",
-        "Staw",
-        "Tunel",
-        "Elektrownia",
-        "Kopalnia",
-        "Zakład",
-        "Farma",
-        "Kolonia",
-        "Przystań",
-        "Przysiółek",
-        "Wieś",
-        "Obwód",
-        "Region",
-        "Oblast",
-        "Kraj",
-        "Province",
-        "District",
-        "County",
-        "Area",
-        "Zone",
-        "Field",
-        "Estate",
-        "Settlement",
-        "Village",
-        "Hamlet",
-        "Farm",
-        "Colony",
-        "Camp",
-        "Barracks",
-        "Refuge",
-        "Shelter",
-        "Ruins",
-        "Fort",
-        "Castle",
-        "Palace",
-        "Tower",
-        "Chapel",
-        "Church",
-        "Monastery",
-        "Sanctuary",
-        "Shrine",
-        "Temple",
-        "Mosque",
-        "Synagogue",
-        "Cathedral",
-        "Basilica",
-        "Abbey",
-        "Convent",
-        "Hermitage",
-        "Cloister",
-        "Oratory",
-        "Tabernacle",
-        "Pagoda",
-        "Stupa",
-        "Mausoleum",
-        "Cemetery",
-        "Graveyard",
-        "Tomb",
-        "Crypt",
-        "Vault",
-        "Sepulchre",
-        "Necropolis",
-        "Memorial",
-        "Monument",
-        "Statue",
-        "Obelisk",
-        "Column",
-        "Pillar",
-        "Stele",
-        "Stone",
-        "Rock",
-        "Boulder",
-        "Cairn",
-        "Dolmen",
-        "Menhir",
-        "Stone circle",
-        "Stone row",
-        "Stone alignment",
-        "Stone avenue",
-        "Stone setting",
-        "Stone slab",
-        "Stone table",
-        "Stone seat",
-        "Stone bench",
-        "Stone cross",
-        "Stone pillar",
-        "Stone monument",
-        "Stone sculpture",
-        "Stone carving",
-        "Stone relief",
-        "Stone inscription",
-        "Stone tablet",
-        "Stone plaque",
-        "Stone marker",
-        "Stone boundary marker",
-        "Stone milestone",
-        "Stone waymarker",
-        "Stone signpost",
-        "Stone guidepost",
-        "Stone direction post",
-        "Stone fingerpost",
-        "Stone sign",
-        "Stone noticeboard",
-        "Stone information board",
-        "Stone map",
-        "Stone plan",
-        "Stone diagram",
-        "Stone chart",
-        "Stone graph",
-        "Stone list",
-        "Stone register",
-        "Stone record",
-        "Stone log",
-        "Stone journal",
-        "Stone diary",
-        "Stone chronicle",
-        "Stone annals",
-        "Stone history",
-        "Stone story",
-        "Stone legend",
-        "Stone myth",
-        "Stone tale",
-        "Stone fable",
-        "Stone parable",
-        "Stone allegory",
-        "Stone metaphor",
-        "Stone simile",
-        "Stone analogy",
-        "Stone comparison",
-        "Stone contrast",
-        "Stone opposition",
-        "Stone contradiction",
-        "Stone paradox",
-        "Stone irony",
-        "Stone satire",
-        "Stone sarcasm",
-        "Stone wit",
-        "Stone humour",
-        "Stone joke",
-        "Stone pun",
-        "Stone riddle",
-        "Stone puzzle",
-        "Stone enigma",
-        "Stone mystery",
-        "Stone secret",
-        "Stone code",
-        "Stone cipher",
-        "Stone cryptogram",
-        "Stone anagram",
-        "Stone palindrome",
-        "Stone acrostic",
-        "Stone crossword",
-        "Stone wordsearch",
-        "Stone sudoku",
-        "Stone puzzle box",
-        "Stone puzzle ball",
-        "Stone puzzle cube",
-        "Stone puzzle ring",
-        "Stone puzzle lock",
-        "Stone puzzle key",
-        "Stone puzzle piece",
-        "Stone puzzle part",
-        "Stone puzzle element",
-        "Stone puzzle component",
-        "Stone puzzle section",
-        "Stone puzzle segment",
-        "Stone puzzle fragment",
-        "Stone puzzle bit",
-        "Stone puzzle chip",
-        "Stone puzzle shard",
-        "Stone puzzle splinter",
-        "Stone puzzle sliver",
-        "Stone puzzle splint",
-    ]
-    skipped_duplicates = 0
-    for row in rows:
-        geonameid = row["geonameid"]
-
-        # Sprawdź czy rekord już istnieje w bazie
-        if geonameid in existing_geonameids:
-            skipped_duplicates += 1
+def _parse_chunk(lines: list) -> tuple:
+    """Filtruje paczkę linii; zwraca (dane w formacie COPY, liczniki)."""
+    config = _parser_config
+    country_code = config["country_code"]
+    country_id = config["country_id"]
+    state_map = config["state_map"]
+    skip_matcher = config["skip_matcher"]
+    quoting = csv.QUOTE_NONE if config["delimiter"] == "\t" else csv.QUOTE_MINIMAL
+    stats = Counter()
+    out = io.StringIO()
+    for values in csv.reader(lines, delimiter=config["delimiter"], quoting=quoting):
+        stats["rows"] += 1
+        if len(values) < len(COLS):
+            stats["malformed"] += 1
             continue
-
-        name = row["name"]
-        if any(x in name for x in skip_keywords):
-            continue  # pomijamy nie-miasta wg listy
-        cc2 = row.get("cc2")
-        if cc2 != "" and cc2 is not None:
+        row = dict(zip(COLS, values))
+        if row["country_code"] != country_code:
             continue
-
-        # Konwertuj kod GeoNames na kod ISO
-        geonames_admin1 = row["admin1_code"]
-        iso_admin1_code = GEONAMES_TO_ISO_ADMIN1.get(geonames_admin1)
-
-        if not iso_admin1_code:
-            continue  # pomijamy miasta z nieznanym kodem województwa
-
-        # Sprawdź czy admin1_code istnieje w województwach
-        if iso_admin1_code not in existing_admin1_codes:
-            continue  # pomijamy miasta bez powiązanego województwa
-
-        state_id = db.execute(
-            text("SELECT id FROM region_states WHERE admin1_code = :admin1_code"),
-            {"admin1_code": iso_admin1_code},  # Użyj kodu ISO zamiast GeoNames
-        ).scalar()
-
-        if not state_id:
-            print(
-                f"Brak województwa dla admin1_code: {iso_admin1_code} (GeoNames: {geonames_admin1})"
-            )
+        if skip_matcher.search(row["name"]):
+            stats["skipped_keyword"] += 1  # pomijamy nie-miasta wg listy
             continue
-
-        city = RegionCity(
-            id=uuid.uuid4(),
-            geonameid=row["geonameid"],
-            name=name,
-            asciiname=row["asciiname"],
-            alternatenames=row["alternatenames"],
-            latitude=row["latitude"],
-            longitude=row["longitude"],
-            feature_class=row["feature_class"],
-            feature_code=row["feature_code"],
-            country_id=poland.id,  # Użyj dynamicznego ID zamiast zahardkodowanego
-            state_id=state_id,
-            admin1_code=row["admin1_code"],  # Zostaw oryginalny kod GeoNames
-            admin2_code=row["admin2_code"],
-            admin3_code=row["admin3_code"],
-            admin4_code=row["admin4_code"],
-            population=row["population"] or None,
-            elevation=row["elevation"],
-            dem=row["dem"],
-            timezone=row["timezone"],
-            modification_date=row["modification_date"],
+        if row["cc2"]:
+            stats["skipped_cc2"] += 1
+            continue
+        state_id = state_map.get(row["admin1_code"])
+        if state_id is None:
+            stats["skipped_state"] += 1  # nieznany kod lub brak województwa w bazie
+            continue
+        out.write("\t".join(
+            [_copy_value(None if column in NULL_IF_EMPTY and not row[column] else row[column])
+             for column in CITY_COLUMNS] + [country_id, state_id]))
+        out.write("\n")
+        stats["accepted"] += 1
+    return out.getvalue(), stats
+
+
+def _read_chunks(path: str):
+    with open(path, encoding="utf-8", newline="") as f:
+        chunk = []
+        for line in f:
+            chunk.append(line)
+            if len(chunk) >= CHUNK_LINES:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class _CopyStream(io.TextIOBase):
+    """Plikopodobny strumień dla ``copy_expert`` z kolejnych paczek danych COPY."""
+
+    def __init__(self, parsed_chunks, stats: Counter):
+        self._chunks = parsed_chunks
+        self._stats = stats
+        self._buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while self._buffer == "" or (size >= 0 and len(self._buffer) < size):
+            try:
+                data, chunk_stats = next(self._chunks)
+            except StopIteration:
+                break
+            self._stats.update(chunk_stats)
+            self._buffer += data
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        return self.read(size)
+
+
+MERGE_SQL = """
+WITH merged AS (
+    INSERT INTO region_cities (id, {columns})
+    SELECT DISTINCT ON (geonameid) gen_random_uuid(), {columns}
+    FROM region_cities_staging
+    ORDER BY geonameid
+    ON CONFLICT (geonameid) DO UPDATE SET {updates}
+    WHERE ({target_columns}) IS DISTINCT FROM ({excluded_columns})
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+""".format(
+    columns=", ".join(STAGING_COLUMNS),
+    updates=", ".join(f"{column} = excluded.{column}" for column in STAGING_COLUMNS),
+    target_columns=", ".join(f"region_cities.{column}" for column in STAGING_COLUMNS),
+    excluded_columns=", ".join(f"excluded.{column}" for column in STAGING_COLUMNS),
+)
+
+
+def import_cities(db, path: str, country_code: str, delimiter: str, workers: int) -> Counter:
+    # Silnik aplikacji ustawia statement_timeout na każdym połączeniu; COPY i
+    # MERGE pełnego zrzutu trwają dłużej, więc limit jest zdjęty dla tej transakcji
+    db.execute(text("SET LOCAL statement_timeout = 0"))
+    country = db.query(RegionCountry).filter(RegionCountry.country_code == country_code).first()
+    if not country:
+        raise RuntimeError(
+            f"Kraj {country_code} nie został znaleziony w bazie! Najpierw uruchom seed_countries_states.py"
         )
-        db.add(city)
-        city_count += 1
-        if city_count % 1000 == 0:
-            db.commit()
-            print(f"Zaimportowano {city_count} miast...")
+    state_map = build_state_map(db, country_code)
+    init_args = (country_code, str(country.id), state_map, delimiter)
+
+    # Tabela tymczasowa z typami kolumn region_cities, bez ograniczeń i indeksów
+    db.execute(text(
+        f"CREATE TEMP TABLE region_cities_staging ON COMMIT DROP AS "
+        f"SELECT {', '.join(STAGING_COLUMNS)} FROM region_cities WITH NO DATA"
+    ))
+    cursor = db.connection().connection.cursor()
+    stats = Counter()
+    copy_sql = f"COPY region_cities_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN"
+    if workers > 1:
+        with Pool(processes=workers, initializer=_init_parser, initargs=init_args) as pool:
+            parsed = pool.imap(_parse_chunk, _read_chunks(path))
+            cursor.copy_expert(copy_sql, _CopyStream(parsed, stats))
+    else:
+        _init_parser(*init_args)
+        cursor.copy_expert(copy_sql, _CopyStream(map(_parse_chunk, _read_chunks(path)), stats))
+
+    inserted, updated = db.execute(text(MERGE_SQL)).one()
     db.commit()
-    print(f"Dodano miast: {city_count}")
-    if skipped_duplicates > 0:
-        print(f"Pominięto duplikatów: {skipped_duplicates}")
-    db.close()
+    stats["inserted"] = inserted
+    stats["updated"] = updated
+    return stats
+
 
+def main():
+    parser = argparse.ArgumentParser(description="Import miast z pliku GeoNames do region_cities.")
+    parser.add_argument("geonames_file", help="Plik GeoNames (np. cities500.txt, allCountries.txt)")
+    parser.add_argument("--country", default=KRAJ, help="Kod kraju do importu (domyślnie PL)")
+    parser.add_argument("--delimiter", default=";",
+                        help="Separator kolumn (';' - eksport CSV, '\\t' - zrzut GeoNames)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Liczba procesów parsujących (1 = bez puli procesów)")
+    args = parser.parse_args()
+    delimiter = "\t" if args.delimiter in ("\\t", "tab") else args.delimiter
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        stats = import_cities(db, args.geonames_file, args.country, delimiter, max(args.workers, 1))
+        if stats["inserted"] or stats["updated"]:
+            # Sygnał dla indeksu regionów w działających procesach API
+            crud.bump_reference_data_version(db, REGIONS_DATASET)
+    finally:
+        db.close()
 
-# --- Zakomentowana logika importu krajów i województw ---
-# def load_admin1_map(...):
-#     ...
-#
-# ...pozostała zakomentowana logika...
+    print(f"Przeczytano wierszy: {stats['rows']} w {time.perf_counter() - started:.1f} s")
+    print(f"Dodano miast: {stats['inserted']}, zaktualizowano: {stats['updated']}")
+    print(f"Pominięto: słowa kluczowe {stats['skipped_keyword']}, cc2 {stats['skipped_cc2']}, "
+          f"brak województwa {stats['skipped_state']}, błędne wiersze {stats['malformed']}")
 
 
 if __name__ == "__main__":
     main()
-
-# prosty load test 100 requestów - example
-import requests, time
-url = "http://localhost:8000/campaigns"
-times=[]
-for i in range(100):
-    t0=time.time()
-    r=requests.get(url, timeout=10)
-    t=time.time()-t0
-    times.append(t*1000)
-print("Śr. [ms]:", sum(times)/len(times), "Min:", min(times), "Max:", max(times))
\ No newline at end of file
@@ -1,14 +1,19 @@
+import time
 from datetime import datetime, timedelta
+from typing import Optional
 
-import bcrypt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from jose import ExpiredSignatureError, JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
-from app import crud
+from app import crud, models
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
+from app.core.passwords import password_hasher
+from app.core.principal_cache import principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -19,41 +24,16 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
 # Funkcja do haszowania haseł
 def hash_password(password: str) -> str:
-    """Hashuje hasło używając bcrypt."""
-    # Konwertuj hasło na bytes jeśli jest stringiem
-    if isinstance(password, str):
-        password = password.encode('utf-8')
-    
-    # Generuj salt i hashuj hasło
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password, salt)
-    
-    # Zwróć jako string
-    return hashed.decode('utf-8')
+    """Hashuje hasło używając bcrypt (na puli wątków haszowania)."""
+    return password_hasher.hash(password)
 
 # Funkcja do weryfikacji hasła
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Weryfikuje hasło przeciwko hashowi."""
+    """Weryfikuje hasło przeciwko hashowi (na puli wątków haszowania)."""
     try:
-        # Konwertuj hasło na bytes
-        if isinstance(plain_password, str):
-            plain_password_bytes = plain_password.encode('utf-8')
-        else:
-            plain_password_bytes = plain_password
-        
-        # Hash bcrypt jest przechowywany jako string w bazie
-        # Musimy go przekonwertować na bytes - bcrypt.checkpw oczekuje bytes
-        if isinstance(hashed_password, str):
-            # Usuń ewentualne białe znaki z hasha
-            hashed_password = hashed_password.strip()
-            # Hash bcrypt jako string można bezpiecznie zakodować jako utf-8
-            # ponieważ zawiera tylko znaki ASCII ($, 0-9, a-z, A-Z, /, .)
-            hashed_password_bytes = hashed_password.encode('utf-8')
-        else:
-            hashed_password_bytes = hashed_password
-        
-        # Zweryfikuj hasło używając bcrypt
-        return bcrypt.checkpw(plain_password_bytes, hashed_password_bytes)
+        return password_hasher.verify(plain_password, hashed_password)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] verify_password exception: {e}")
         raise
@@ -84,42 +64,87 @@ credentials_exception = HTTPException(
     headers={"WWW-Authenticate": "Bearer"},
 )
 
+token_expired_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Token expired",
+    headers={"WWW-Authenticate": 'Bearer error="invalid_token", error_description="The access token expired"'},
+)
+
+TOKEN_REFRESH_HEADER = "X-Token-Refresh"
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+
+def set_token_refresh_hint(response: Optional[Response], token_expires_at: Optional[float]):
+    """Podpowiada klientowi (nagłówek X-Token-Refresh) odświeżenie tokenu przez /auth/refresh."""
+    if response is not None and token_expires_at is not None \
+            and token_expires_at - time.time() < settings.token_refresh_hint_seconds:
+        response.headers[TOKEN_REFRESH_HEADER] = "true"
+
+
+def _token_subject(token: str):
+    """Email użytkownika ("sub") i "exp" z tokenu; wyjątek HTTP 401 dla złego lub wygasłego tokenu."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        user = crud.get_user_by_email(db=db, email=username)
-        if user is None:
-            raise credentials_exception
-        return user
+    except ExpiredSignatureError:
+        # Wygasłego tokenu nie odświeżamy tutaj - klient powinien zalogować się ponownie
+        raise token_expired_exception
     except JWTError as e:
         print(f"[ERROR] get_current_user: JWTError: {e}")
-        # Spróbuj odświeżyć token jeśli wygasł
-        from fastapi import Request
-        from fastapi.encoders import jsonable_encoder
-        try:
-            # Spróbuj odświeżyć token przez funkcję refresh_token
-            new_token = refresh_token(token, db)
-            # Spróbuj ponownie pobrać użytkownika z nowym tokenem
-            payload = jwt.decode(new_token, SECRET_KEY, algorithms=[ALGORITHM])
-            username: str = payload.get("sub")
-            if username is None:
-                raise credentials_exception
-            user = crud.get_user_by_email(db=db, email=username)
-            if user is None:
-                raise credentials_exception
-            # Możesz zwrócić user i nowy token, jeśli chcesz obsłużyć to na froncie
-            return user
-        except Exception as e2:
-            print(f"[ERROR] get_current_user: Token refresh failed: {e2}")
-            raise credentials_exception
-    except Exception as e:
-        print(f"[ERROR] get_current_user: Unexpected error: {e}")
         raise credentials_exception
 
+    username: str = payload.get("sub")
+    if username is None:
+        raise credentials_exception
+    return username, payload.get("exp")
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db),
+                     response: Response = None):
+    user = principal_cache.get(token, db)
+    if user is not None:
+        set_token_refresh_hint(response, principal_cache.token_expires_at(token))
+        return user
+
+    username, token_expires_at = _token_subject(token)
+    user = (
+        db.query(models.User)
+        .options(joinedload(models.User.role))
+        .filter(models.User.email == username)
+        .first()
+    )
+    if user is None:
+        raise credentials_exception
+
+    principal_cache.put(token, user, token_expires_at)
+    set_token_refresh_hint(response, token_expires_at)
+    return user
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db),
+                                 response: Response = None):
+    """
+    Odpowiednik get_current_user dla endpointów async def: korzysta z tej
+    samej sesji AsyncSession co endpoint, więc żądanie nie zajmuje drugiego
+    połączenia z puli (sesji synchronicznej) do swojego końca.
+    """
+    user = await principal_cache.get_async(token, db)
+    if user is not None:
+        set_token_refresh_hint(response, principal_cache.token_expires_at(token))
+        return user
+
+    username, token_expires_at = _token_subject(token)
+    result = await db.execute(
+        select(models.User)
+        .options(joinedload(models.User.role))
+        .filter(models.User.email == username)
+    )
+    user = result.scalars().first()
+    if user is None:
+        raise credentials_exception
+
+    principal_cache.put(token, user, token_expires_at)
+    set_token_refresh_hint(response, token_expires_at)
+    return user
+
 
 def refresh_token(current_token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """
@@ -0,0 +1,349 @@
+"""
+Testy klienta GUS BIR1 (app.core.gus) na lokalnej atrapie usługi SOAP.
+
+Atrapa to serwer HTTP w wątku, który udostępnia WSDL z operacjami BIR1
+(Zaloguj, Wyloguj, DaneSzukaj, GetValue) i odpowiada na nie jak GUS:
+sesja (SID) jest przekazywana nagłówkiem ``sid``, a zapytanie w nieważnej
+sesji zwraca pusty wynik i ``StatusSesji`` = 0. Cache wyników w bazie
+zastępuje prosta sesja w pamięci (tylko ``get``/``execute``/``commit``).
+"""
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from xml.sax.saxutils import escape
+
+import pytest
+
+from app.core.config import settings
+from app.core.gus import GusBir1Client, normalize_nip
+
+NAMESPACE = "http://CIS/BIR/PUBL/2014/07"
+SOAP_ENVELOPE = "http://schemas.xmlsoap.org/soap/envelope/"
+
+VALID_NIP = "5261040828"  # poprawna suma kontrolna
+MISSING_NIP = "1234563218"  # poprawna suma kontrolna, brak w atrapie
+
+# operacja -> (parametr wejściowy, typ parametru, wynik, typ wyniku)
+OPERATIONS = {
+    "Zaloguj": ("pKluczUzytkownika", "xsd:string", "ZalogujResult", "xsd:string"),
+    "Wyloguj": ("pIdentyfikatorSesji", "xsd:string", "WylogujResult", "xsd:boolean"),
+    "DaneSzukaj": ("pParametryWyszukiwania", "tns:ParametryWyszukiwania", "DaneSzukajResult", "xsd:string"),
+    "GetValue": ("pNazwaParametru", "xsd:string", "GetValueResult", "xsd:string"),
+}
+
+
+def build_wsdl(address: str) -> str:
+    elements, messages, port_operations, binding_operations = [], [], [], []
+    for name, (param, param_type, result, result_type) in OPERATIONS.items():
+        elements.append(f"""
+      <xsd:element name="{name}"><xsd:complexType><xsd:sequence>
+        <xsd:element name="{param}" type="{param_type}" minOccurs="0" nillable="true"/>
+      </xsd:sequence></xsd:complexType></xsd:element>
+      <xsd:element name="{name}Response"><xsd:complexType><xsd:sequence>
+        <xsd:element name="{result}" type="{result_type}" minOccurs="0" nillable="true"/>
+      </xsd:sequence></xsd:complexType></xsd:element>""")
+        messages.append(f"""
+  <message name="{name}In"><part name="parameters" element="tns:{name}"/></message>
+  <message name="{name}Out"><part name="parameters" element="tns:{name}Response"/></message>""")
+        port_operations.append(f"""
+    <operation name="{name}"><input message="tns:{name}In"/><output message="tns:{name}Out"/></operation>""")
+        binding_operations.append(f"""
+    <operation name="{name}">
+      <soap:operation soapAction="{NAMESPACE}/IUslugaBIRzewnPubl/{name}" style="document"/>
+      <input><soap:body use="literal"/></input>
+      <output><soap:body use="literal"/></output>
+    </operation>""")
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/"
+             xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+             xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+             xmlns:tns="{NAMESPACE}"
+             targetNamespace="{NAMESPACE}">
+  <types>
+    <xsd:schema targetNamespace="{NAMESPACE}" elementFormDefault="qualified">
+      <xsd:complexType name="ParametryWyszukiwania"><xsd:sequence>
+        <xsd:element name="Krs" type="xsd:string" minOccurs="0" nillable="true"/>
+        <xsd:element name="Nip" type="xsd:string" minOccurs="0" nillable="true"/>
+        <xsd:element name="Regon" type="xsd:string" minOccurs="0" nillable="true"/>
+      </xsd:sequence></xsd:complexType>{"".join(elements)}
+    </xsd:schema>
+  </types>{"".join(messages)}
+  <portType name="IUslugaBIRzewnPubl">{"".join(port_operations)}
+  </portType>
+  <binding name="BasicHttpBinding" type="tns:IUslugaBIRzewnPubl">
+    <soap:binding style="document" transport="http://schemas.xmlsoap.org/soap/http"/>{"".join(binding_operations)}
+  </binding>
+  <service name="UslugaBIRzewnPubl">
+    <port name="BasicHttpBinding" binding="tns:BasicHttpBinding"><soap:address location="{address}"/></port>
+  </service>
+</definitions>"""
+
+
+def company_xml(nip: str) -> str:
+    return (
+        "<root><dane>"
+        f"<Regon>012345678</Regon><Nip>{nip}</Nip><Nazwa>TESTOWA SPÓŁKA Z O.O.</Nazwa>"
+        "<Miejscowosc>Warszawa</Miejscowosc><KodPocztowy>00-001</KodPocztowy>"
+        "<Ulica>ul. Testowa</Ulica><NrNieruchomosci>1</NrNieruchomosci><NrLokalu></NrLokalu>"
+        "</dane></root>"
+    )
+
+
+NOT_FOUND_XML = (
+    "<root><dane><ErrorCode>4</ErrorCode>"
+    "<ErrorMessagePl>Nie znaleziono podmiotu dla podanych kryteriów wyszukiwania.</ErrorMessagePl>"
+    "</dane></root>"
+)
+
+
+class FakeBir1:
+    """Stan atrapy: ważne sesje, firmy i zarejestrowane wywołania."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.companies = {VALID_NIP: company_xml(VALID_NIP)}
+        self.sessions = set()
+        self.calls = []  # (operacja, SID z nagłówka)
+        self.search_gate = threading.Event()
+        self.search_gate.set()
+        self._next_sid = 0
+
+    def count(self, operation: str) -> int:
+        with self.lock:
+            return sum(1 for name, _sid in self.calls if name == operation)
+
+    def expire_sessions(self) -> None:
+        """GUS kończy sesje po swojej stronie (np. po 60 min bezczynności)."""
+        with self.lock:
+            self.sessions.clear()
+
+    def handle(self, operation: str, params: dict, sid) -> str:
+        with self.lock:
+            self.calls.append((operation, sid))
+            session_valid = sid in self.sessions
+        if operation == "Zaloguj":
+            with self.lock:
+                self._next_sid += 1
+                new_sid = f"sid{self._next_sid:016d}"
+                self.sessions.add(new_sid)
+            return new_sid
+        if operation == "Wyloguj":
+            with self.lock:
+                self.sessions.discard(params.get("pIdentyfikatorSesji"))
+            return "true"
+        if operation == "GetValue":
+            if params.get("pNazwaParametru") == "StatusSesji":
+                return "1" if session_valid else "0"
+            return ""
+        if operation == "DaneSzukaj":
+            self.search_gate.wait(timeout=10)
+            if not session_valid:
+                return ""
+            return self.companies.get(params.get("Nip"), NOT_FOUND_XML)
+        raise ValueError(operation)
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+class Bir1Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._reply(build_wsdl(self.server.address), "text/xml; charset=utf-8")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        envelope = ET.fromstring(body)
+        request = next(iter(envelope.find(f"{{{SOAP_ENVELOPE}}}Body")))
+        operation = local_name(request.tag)
+        params = {}
+        for element in request.iter():
+            if element is not request and len(element) == 0:
+                params[local_name(element.tag)] = element.text
+        result = self.server.bir1.handle(operation, params, self.headers.get("sid"))
+        result_name = OPERATIONS[operation][2]
+        self._reply(
+            f'<s:Envelope xmlns:s="{SOAP_ENVELOPE}"><s:Body>'
+            f'<{operation}Response xmlns="{NAMESPACE}"><{result_name}>{escape(result)}</{result_name}>'
+            f'</{operation}Response></s:Body></s:Envelope>',
+            "text/xml; charset=utf-8",
+        )
+
+    def _reply(self, text: str, content_type: str):
+        payload = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MemoryCacheSession:
+    """Sesja bazy z tabelą gus_company_cache w pamięci (wspólny słownik wierszy)."""
+
+    def __init__(self, rows: dict):
+        self.rows = rows
+
+    def get(self, model, nip):
+        return self.rows.get(nip)
+
+    def execute(self, stmt):
+        values = stmt.compile().params
+        self.rows[values["nip"]] = SimpleNamespace(
+            nip=values["nip"], data=values["data"],
+            fetched_at=values["fetched_at"], expires_at=values["expires_at"],
+        )
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def bir1(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Bir1Handler)
+    server.daemon_threads = True
+    server.address = f"http://127.0.0.1:{server.server_address[1]}/UslugaBIRzewnPubl.svc"
+    server.bir1 = FakeBir1()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "gus_bir1_wsdl", f"http://127.0.0.1:{server.server_address[1]}/wsdl")
+    monkeypatch.setattr(settings, "gus_bir1_service_url", server.address)
+    monkeypatch.setattr(settings, "gus_wsdl_cache_path", str(tmp_path / "zeep-cache.db"))
+    monkeypatch.setattr(settings, "gus_request_timeout_seconds", 5)
+    yield server.bir1
+    server.bir1.search_gate.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(bir1):
+    gus = GusBir1Client()
+    yield gus
+    gus.close()
+
+
+@pytest.fixture
+def cache_rows():
+    return {}
+
+
+def test_normalize_nip_accepts_formatted_numbers():
+    assert normalize_nip("526-104-08-28") == VALID_NIP
+    assert normalize_nip(" PL 526 104 08 28 ") == VALID_NIP
+
+
+@pytest.mark.parametrize("nip", ["5261040829", "1234567890", "526104082", "52610408280", "526104082A", ""])
+def test_normalize_nip_rejects_bad_checksum_and_format(nip):
+    assert normalize_nip(nip) is None
+
+
+def test_search_reuses_session(bir1, client):
+    assert client.search_nip(VALID_NIP)["company_name"] == "TESTOWA SPÓŁKA Z O.O."
+    assert client.search_nip(VALID_NIP) is not None
+
+    assert bir1.count("Zaloguj") == 1
+    search_sids = {sid for name, sid in bir1.calls if name == "DaneSzukaj"}
+    assert len(search_sids) == 1 and None not in search_sids
+
+
+def test_session_renewed_after_idle_time(bir1, client, monkeypatch):
+    client.search_nip(VALID_NIP)
+    monkeypatch.setattr(settings, "gus_session_renew_seconds", 1)
+    client._sid_used_at -= 2
+
+    assert client.search_nip(VALID_NIP) is not None
+    assert bir1.count("Zaloguj") == 2
+    assert bir1.count("Wyloguj") == 1
+    first_sid, second_sid = [sid for name, sid in bir1.calls if name == "DaneSzukaj"]
+    assert first_sid != second_sid
+
+
+def test_session_renewed_when_gus_reports_it_invalid(bir1, client):
+    client.search_nip(VALID_NIP)
+    bir1.expire_sessions()
+
+    assert client.search_nip(VALID_NIP)["nip"] == VALID_NIP
+    assert bir1.count("GetValue") == 1
+    assert bir1.count("Zaloguj") == 2
+    assert bir1.count("DaneSzukaj") == 3  # udane, puste w wygasłej sesji, ponowione
+
+
+def test_not_found_returns_none_without_renewing_session(bir1, client):
+    assert client.search_nip(MISSING_NIP) is None
+    assert bir1.count("Zaloguj") == 1
+
+
+def test_concurrent_requests_for_one_nip_query_gus_once(bir1, client, cache_rows):
+    bir1.search_gate.clear()
+    workers = 8
+    barrier = threading.Barrier(workers)
+    results, errors = [], []
+
+    def lookup():
+        barrier.wait()
+        try:
+            results.append(client.get_company(MemoryCacheSession(cache_rows), VALID_NIP))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=lookup) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while bir1.count("DaneSzukaj") == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)  # pozostałe wątki czekają na wynik lidera
+    bir1.search_gate.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert not errors
+    assert len(results) == workers
+    assert all(result["nip"] == VALID_NIP for result in results)
+    assert bir1.count("DaneSzukaj") == 1
+    assert VALID_NIP in cache_rows
+
+
+def test_found_company_cached_for_company_ttl(bir1, client, cache_rows, monkeypatch):
+    monkeypatch.setattr(settings, "gus_company_cache_ttl_seconds", 3600)
+    db = MemoryCacheSession(cache_rows)
+
+    company = client.get_company(db, VALID_NIP)
+    assert client.get_company(db, VALID_NIP) == company
+    assert bir1.count("DaneSzukaj") == 1
+
+    row = cache_rows[VALID_NIP]
+    assert row.data == company
+    assert row.expires_at - row.fetched_at == timedelta(seconds=3600)
+
+    row.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    assert client.get_company(db, VALID_NIP) == company
+    assert bir1.count("DaneSzukaj") == 2
+
+
+def test_not_found_cached_for_not_found_ttl(bir1, client, cache_rows, monkeypatch):
+    monkeypatch.setattr(settings, "gus_company_cache_ttl_seconds", 3600)
+    monkeypatch.setattr(settings, "gus_not_found_cache_ttl_seconds", 60)
+    db = MemoryCacheSession(cache_rows)
+
+    assert client.get_company(db, MISSING_NIP) is None
+    assert client.get_company(db, MISSING_NIP) is None
+    assert bir1.count("DaneSzukaj") == 1
+
+    row = cache_rows[MISSING_NIP]
+    assert row.data is None
+    assert row.expires_at - row.fetched_at == timedelta(seconds=60)
+
+    row.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    assert client.get_company(db, MISSING_NIP) is None
+    assert bir1.count("DaneSzukaj") == 2